@@ -0,0 +1,112 @@
+import warnings
+import numpy as np
+
+# Percentiles reported alongside min/max/mean/std (P50 = background level)
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+def null_mask(values: np.ndarray, null_value: float = None) -> np.ndarray:
+    """True where a sample is missing (NaN or the well's NULL value)"""
+    missing = np.isnan(values)
+    if null_value is not None:
+        missing |= values == null_value
+    return missing
+
+def describe(depths: np.ndarray, columns: dict, null_value: float = None, percentiles: tuple = ()) -> dict:
+    """Stats, peak depth and percentiles for every curve in one vectorized pass.
+
+    The curves are stacked into one (curves, rows) grid with NULLs set to NaN,
+    so each statistic is a single NumPy reduction across all of them.
+    Returns {curve: {count, min, max, max_at, mean, std, p<q>...}} at full
+    precision; curves without a valid sample are left out.
+    """
+    names = list(columns)
+    if not names or not len(depths):
+        return {}
+
+    grid = np.vstack([columns[c] for c in names]).astype(np.float64)
+    grid[null_mask(grid, null_value)] = np.nan
+    missing = np.isnan(grid)
+    counts = (~missing).sum(axis=1)
+
+    with warnings.catch_warnings():
+        # All-NULL curves produce NaN here and are dropped below
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mins = np.nanmin(grid, axis=1)
+        means = np.nanmean(grid, axis=1)
+        stds = np.nanstd(grid, axis=1)
+        i_max = np.argmax(np.where(missing, -np.inf, grid), axis=1)
+        pcts = np.nanpercentile(grid, percentiles, axis=1) if percentiles else []
+
+    result = {}
+    for k, name in enumerate(names):
+        if not counts[k]:
+            continue
+        result[name] = {
+            "count": int(counts[k]),
+            "min": float(mins[k]),
+            "max": float(grid[k, i_max[k]]),
+            "max_at": float(depths[i_max[k]]),
+            "mean": float(means[k]),
+            "std": float(stds[k]),
+            **{f"p{q}": float(row[k]) for q, row in zip(percentiles, pcts)}
+        }
+    return result
+
+def top_anomalies(depths: np.ndarray, values: np.ndarray, null_value: float = None,
+                  top_n: int = 5, min_gap: int = 10) -> list:
+    """The top_n highest z-score samples, at least min_gap rows apart.
+
+    The gap keeps one broad spike from filling every slot with its neighbours.
+    """
+    valid = ~null_mask(values, null_value)
+    if valid.sum() < 2:
+        return []
+    vals = values[valid]
+    mean, std = vals.mean(), vals.std()
+    if not std:
+        return []
+
+    positions = np.flatnonzero(valid)
+    z = (vals - mean) / std
+    picked = []
+    # Candidates in descending z order; only the head is needed for top_n picks
+    for i in np.argsort(-z, kind="stable")[:top_n * (2 * min_gap + 1)]:
+        if z[i] <= 0 or len(picked) == top_n:
+            break
+        if all(abs(positions[i] - positions[j]) >= min_gap for j in picked):
+            picked.append(i)
+
+    return [
+        {"depth": float(depths[positions[i]]), "value": float(vals[i]), "zscore": float(z[i])}
+        for i in picked
+    ]
+
+def gas_ratios(stats: dict) -> dict:
+    """Wetness / balance from the HC1-HC3 means, when light hydrocarbons are present"""
+    if not all(k in stats for k in ["HC1", "HC2", "HC3"]):
+        return {}
+    c1 = stats["HC1"]["mean"]
+    c2 = stats["HC2"]["mean"]
+    c3 = stats["HC3"]["mean"]
+    if c1 <= 0:
+        return {}
+
+    wetness = ((c2 + c3) / (c1 + c2 + c3)) * 100
+    balance = c1 / (c2 + c3) if (c2 + c3) > 0 else 0
+    return {
+        "gas_wetness": f"{round(wetness, 2)}%",
+        "balance_index": round(balance, 2),
+        "interpretation_hint": "Gas" if wetness < 5 else "Condensate/Oil"
+    }
+
+def round_stats(stats: dict, digits: int, keys: tuple = None) -> dict:
+    """Round (and optionally select) stat fields; depths and counts keep their own precision"""
+    rounded = {}
+    for curve, s in stats.items():
+        if not s:
+            continue
+        rounded[curve] = {
+            k: v if k == "count" else round(v, 1 if k == "max_at" else digits)
+            for k, v in s.items() if keys is None or k in keys
+        }
+    return rounded
@@ -1,8 +1,10 @@
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import Base, engine
-from . import wells, interpret, chat
+from .database import Base, engine, pool_metrics
+from .storage import storage_service
+from .chartcache import chart_cache
+from . import wells, interpret, chat, chatcontext, llm
 
 app = FastAPI(title="OneGeo API")
 
@@ -25,6 +27,31 @@ def root():
 def health():
     return {"status": "healthy"}
 
+@app.get("/check/pool")
+def pool_health():
+    """Database connection pool usage"""
+    return pool_metrics()
+
+@app.get("/check/storage")
+def storage_health():
+    """Local file cache: hits, misses, S3 fetches, evictions and size"""
+    return storage_service.cache.metrics()
+
+@app.get("/check/chart-cache")
+def chart_cache_health():
+    """Chart response cache: hits, misses, 304s, evictions and bytes held"""
+    return chart_cache.metrics()
+
+@app.get("/check/llm")
+def llm_health():
+    """LLM gateway: calls, retries, timeouts, refusals, calls in flight and breaker state"""
+    return llm.metrics()
+
+@app.get("/check/chat-context")
+def chat_context_health():
+    """Chat prompts: system prompt cache hits/misses and rolling summaries written"""
+    return chatcontext.metrics()
+
 app.include_router(wells.router)
 app.include_router(interpret.router)
 app.include_router(chat.router)
@@ -0,0 +1,196 @@
+import os
+import time
+import hashlib
+import zipfile
+import multiprocessing
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from sqlalchemy.orm import Session
+from .models import Well
+from .parser import parse_las_file
+from .columnar import CHUNK_ROWS, chunk_rows, forget_well
+from .bulkload import bulk_load
+from .ingest import create_well, discard_well, find_ingested, link_duplicate
+from .storage import storage_service
+from .grounding import store_grounding_summary
+from .wellfile import store_well_file
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+FLUSH_BYTES = 64 * 1024 * 1024  # tile bytes buffered before one COPY per table
+
+# ===== INPUTS =====
+
+def iter_zip(fileobj: BinaryIO) -> Iterator[tuple]:
+    """(name, bytes) for every .las member of a zip archive, read one at a time"""
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            if not info.is_dir() and info.filename.lower().endswith(".las"):
+                yield Path(info.filename).name, archive.read(info)
+
+def iter_directory(path: str) -> Iterator[tuple]:
+    """(name, bytes) for every .las file under a directory"""
+    for file in sorted(Path(path).rglob("*")):
+        if file.is_file() and file.suffix.lower() == ".las":
+            yield file.name, file.read_bytes()
+
+# ===== WORKER =====
+
+def prepare_file(content: bytes) -> tuple:
+    """Worker process: parse one file and build all of its tile rows.
+
+    Rows carry well_id=None; the parent fills it in once the well exists.
+    """
+    well_info = parse_las_file(content)
+    data = well_info.pop("data")
+    curves = well_info.get("curves", [])
+    rows = {}
+    for chunk_index, start in enumerate(range(0, len(data), CHUNK_ROWS)):
+        batch = data[start:start + CHUNK_ROWS]
+        for model, model_rows in chunk_rows(None, chunk_index, curves, batch, well_info.get("null_value")).items():
+            rows.setdefault(model, []).extend(model_rows)
+    return well_info, rows
+
+# ===== PIPELINE =====
+
+class _Pending:
+    """Wells whose tile rows are buffered for the next combined bulk load"""
+
+    def __init__(self):
+        self.items = []  # (result, well, well_info, content, content_hash)
+        self.rows = {}
+        self.size = 0
+
+    def add(self, result: dict, well: Well, well_info: dict, content: bytes, content_hash: str, rows: dict):
+        self.items.append((result, well, well_info, content, content_hash))
+        for model, model_rows in rows.items():
+            for row in model_rows:
+                row["well_id"] = well.id
+                self.size += len(row.get("data", b""))
+            self.rows.setdefault(model, []).extend(model_rows)
+
+def _flush(db: Session, pending: _Pending):
+    """One bulk load per table for every buffered well, then storage and summaries.
+
+    The content hash is committed with the rows, so a well whose file or
+    summary fails to store is still found (and deduplicated) by content.
+    """
+    if not pending.items:
+        return
+    try:
+        for model, rows in pending.rows.items():
+            bulk_load(db, model, rows)
+        for result, well, well_info, content, content_hash in pending.items:
+            well.row_count = well_info["row_count"]
+            well.content_hash = content_hash
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        for result, well, well_info, content, content_hash in pending.items:
+            discard_well(db, well.id)
+            result.update(status="failed", well_id=None, error=str(e))
+        return
+
+    for result, well, well_info, content, content_hash in pending.items:
+        forget_well(well.id)
+        try:
+            storage_result = storage_service.store_file(well.filename, content, content_hash)
+            well.s3_key = storage_result.get("s3_key")
+            db.commit()
+            store_grounding_summary(db, well.id)
+            store_well_file(db, well.id, well.content_hash)
+            result.update(status="ok", rows=well.row_count)
+        except Exception as e:
+            db.rollback()
+            result.update(status="ok", rows=well.row_count, error=f"Stored without file/summary: {e}")
+
+def ingest_batch(db: Session, files: Iterable[tuple], workers: int = None) -> dict:
+    """Ingest many LAS files: parsing fans out across a process pool while the
+    parent creates the wells and merges their rows into combined bulk loads.
+
+    files yields (name, bytes); at most 2 x workers files are in flight.
+    Returns per-file results in input order plus overall throughput.
+    """
+    workers = workers or BATCH_WORKERS
+    started = time.perf_counter()
+    results = []
+    pending = _Pending()
+    files = iter(files)
+    hashes = set()  # content in this batch, for duplicates of files not committed yet
+    repeats = []    # (result, content, hash) linked once the batch is loaded
+
+    def link(result: dict, content: bytes, source: Well):
+        try:
+            well = link_duplicate(db, [content], result["filename"], source)["well"]
+            result.update(status="ok", well_id=well.id, well_name=well.well_name,
+                          rows=well.row_count, deduplicated_from=source.id)
+        except Exception as e:
+            db.rollback()
+            result.update(status="failed", error=str(e))
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        in_flight = {}
+
+        def fill():
+            while len(in_flight) < 2 * workers:
+                item = next(files, None)
+                if item is None:
+                    return
+                name, content = item
+                result = {"filename": name, "status": "queued", "well_id": None, "well_name": None,
+                          "rows": 0, "error": None}
+                results.append(result)
+                # Files ingested before (by content) are linked, not parsed again
+                content_hash = hashlib.sha256(content).hexdigest()
+                if content_hash in hashes:
+                    repeats.append((result, content, content_hash))
+                    continue
+                hashes.add(content_hash)
+                source = find_ingested(db, content_hash)
+                if source is not None:
+                    link(result, content, source)
+                    continue
+                in_flight[pool.submit(prepare_file, content)] = (result, content, content_hash)
+
+        fill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result, content, content_hash = in_flight.pop(future)
+                try:
+                    well_info, rows = future.result()
+                    well = create_well(db, well_info, result["filename"])
+                except Exception as e:
+                    db.rollback()
+                    result.update(status="failed", error=str(e))
+                    continue
+                result.update(well_id=well.id, well_name=well.well_name)
+                pending.add(result, well, well_info, content, content_hash, rows)
+                if pending.size >= FLUSH_BYTES:
+                    _flush(db, pending)
+                    pending = _Pending()
+            fill()
+        _flush(db, pending)
+
+    for result, content, content_hash in repeats:
+        source = find_ingested(db, content_hash)
+        if source is None:
+            result.update(status="failed", error="Identical file in this batch failed to ingest")
+        else:
+            link(result, content, source)
+
+    elapsed = time.perf_counter() - started
+    rows = sum(r["rows"] for r in results)
+    succeeded = sum(r["status"] == "ok" for r in results)
+    print(f"INFO: Batch ingest: {succeeded}/{len(results)} files, {rows} rows in {elapsed:.2f}s "
+          f"({workers} workers)")
+    return {
+        "files": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed) if elapsed else 0,
+        "workers": workers,
+        "results": results
+    }
@@ -0,0 +1,99 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# Rendered /wells/{id}/data bodies, so toggling curves or windows back and forth
+# doesn't re-read tiles, re-merge stats and re-encode lists every time
+CHART_CACHE_MB = int(os.getenv("CHART_CACHE_MB", "256"))  # 0 = off
+# Bump when the rendered body changes for the same request, so old ETags stop matching
+CHART_FORMAT_VERSION = 1
+
+def chart_key(content_hash: str, curves: Optional[str], depth_from: float, depth_to: float,
+              max_points: Optional[int], step: int, binary: bool) -> tuple:
+    """Cache key of a chart response.
+
+    The well's version is its content hash: stored data is derived from the
+    file content alone, so a re-ingest or an id reused after a delete gets a
+    new key and deduplicated wells share entries. Wells still loading have no
+    hash yet and aren't cached.
+    """
+    return (content_hash, curves, depth_from, depth_to, max_points, step, binary)
+
+def chart_etag(key: tuple) -> str:
+    """Strong ETag for the body of a key (the body is a pure function of it)"""
+    digest = hashlib.sha256(repr((CHART_FORMAT_VERSION,) + key).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+class ChartCache:
+    """Memory-budgeted LRU of rendered chart bodies: key -> (body, media type, etag)"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "stores": 0, "evictions": 0,
+                      "invalidations": 0}
+
+    def count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, key: tuple) -> Optional[tuple]:
+        if not self.max_bytes:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, key: tuple, body: bytes, media_type: str, etag: str):
+        # One huge window shouldn't flush everything else
+        if not self.max_bytes or len(body) > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (body, media_type, etag)
+            self._bytes += len(body)
+            self.stats["stores"] += 1
+            while self._bytes > self.max_bytes:
+                _, (evicted, _, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.stats["evictions"] += 1
+
+    def forget(self, content_hash: str):
+        """Drop every entry of a well's data (call when the last well with the content is deleted)"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == content_hash]:
+                self._bytes -= len(self._entries.pop(key)[0])
+                self.stats["invalidations"] += 1
+
+    def metrics(self) -> dict:
+        """Hit/miss counters and memory held (this process)"""
+        with self._lock:
+            stats = dict(self.stats)
+            entries, held = len(self._entries), self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            **stats,
+            "hit_rate": round(stats["hits"] / lookups, 3) if lookups else None,
+            "entries": entries,
+            "bytes": held,
+            "max_bytes": self.max_bytes or None
+        }
+
+chart_cache = ChartCache(CHART_CACHE_MB * 1024 * 1024)
@@ -1,102 +1,46 @@
-import os
-import json
-from groq import Groq
-from fastapi import APIRouter, HTTPException
-from .database import SessionLocal
-from .models import Well, WellData, ChatMessage
+import anyio
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from starlette.background import BackgroundTask
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import get_async_db, AsyncSessionLocal
+from .models import Well, ChatMessage, ChatSummary
+from .chatcontext import build_context, update_summary
+from .llm import sse, sse_response, configured, complete, stream_completion
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-def get_client():
-    api_key = os.getenv("API_KEY")
-    if not api_key:
-        return None
-    return Groq(api_key=api_key.strip())
+MAX_TOKENS = 1024
+TEMPERATURE = 0.0
+NO_KEY_REPLY = "Geo-AI Assistant: API Key not configured. I'm ready to discuss your well data once configured."
 
 @router.post("")
-def chat(request: dict):
+async def chat(request: dict, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
     """Send chat message"""
-    db = SessionLocal()
-    
     try:
         well_id_raw = request.get("well_id")
         message = request.get("message")
         
         if not well_id_raw or not message:
-            db.close()
             raise HTTPException(status_code=400, detail="well_id and message are required")
 
         well_id = int(well_id_raw)
-        well = db.query(Well).filter(Well.id == well_id).first()
-        
-        # --- DATA GROUNDING ENGINE ---
-        # Fetch a snapshot of stats to give GeoBot 'vision' of the data
-        curves_to_check = ["TOTAL_GAS", "HC1", "HC2", "HC3", "ROP", "CO2"]
-        data_summary = {}
-        
-        # Get overall stats for the whole well
-        query = db.query(WellData).filter(WellData.well_id == well_id)
-        all_data = query.all()
+        well = await db.get(Well, well_id)
         
-        if all_data:
-            for c in curves_to_check:
-                vals = [d.curve_values.get(c) for d in all_data 
-                       if d.curve_values.get(c) is not None and d.curve_values.get(c) > -900]
-                if vals:
-                    max_val = max(vals)
-                    max_depth = [d.depth for d in all_data if d.curve_values.get(c) == max_val][0]
-                    data_summary[c] = {
-                        "avg": round(sum(vals)/len(vals), 2),
-                        "max": round(max_val, 2),
-                        "peak_at": round(max_depth, 1)
-                    }
-
         # Save user message
         user_msg = ChatMessage(well_id=well_id, role="user", content=message)
         db.add(user_msg)
-        db.commit()
-        
-        # Get recent history for context
-        # We fetch more than 10 to ensure we can filter and still have enough
-        history = db.query(ChatMessage).filter(ChatMessage.well_id == well_id).order_by(ChatMessage.created_at.desc()).limit(20).all()
-        history = history[::-1] # back to chronological
+        await db.commit()
         
-        client = get_client()
-        if not client:
-            reply = "Geo-AI Assistant: API Key not configured. I'm ready to discuss your well data once configured."
+        if not configured():
+            reply = NO_KEY_REPLY
         else:
-            # Build history list for AI - MUST alternate user/assistant
-            messages_payload = []
-            
-            # OpenAI system prompt is part of messages
-            system_prompt = f"""
-                You are GeoBot, an expert geological AI. You are analyzing well '{well.well_name if well else 'Unknown'}'.
-
-                REAL-TIME DATA SUMMARY for this well:
-                {json.dumps(data_summary, indent=2)}
-
-                MISSION:
-                Use the numbers above to answer questions. 
-                - Reference 'max' and 'peak_at' for spikes.
-                - Technical focus: Hydrocarbon ratios, gas units.
-                - Don't hallucinate numbers. Use only the summary.
-                """
-            messages_payload.append({"role": "system", "content": system_prompt})
-            
-            # History
-            for m in history[:-1]: # everything except the current user message (added below)
-                messages_payload.append({"role": m.role, "content": m.content})
-            
-            # Current message
-            messages_payload.append({"role": "user", "content": message})
-
-            response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=messages_payload,
-                max_tokens=1024,
-                temperature=0.0
-            )
-            reply = response.choices[0].message.content
+            # --- DATA GROUNDING ENGINE ---
+            # Grounded summary + rolling summary + latest turns, within a token budget
+            messages_payload = await build_context(db, well_id, well, message, user_msg.id)
+            reply = await complete(messages_payload, MAX_TOKENS, TEMPERATURE)
+            # Older turns are folded into the summary after the reply has gone out
+            background_tasks.add_task(update_summary, well_id, well.well_name if well else "Unknown")
             
     except Exception as e:
         print(f"❌ Groq Chat Error: {type(e).__name__}: {str(e)}")
@@ -104,28 +48,74 @@ def chat(request: dict):
     finally:
         asst_msg = ChatMessage(well_id=well_id, role="assistant", content=reply)
         db.add(asst_msg)
-        db.commit()
-        db.close()
+        await db.commit()
     
     return {"role": "assistant", "reply": reply}
 
+@router.post("/stream")
+async def chat_stream(request: dict, db: AsyncSession = Depends(get_async_db)):
+    """Send chat message; the reply streams back as server-sent events (see llm.py).
+
+    The reply is saved when the stream ends, also if the client goes away mid-way.
+    """
+    well_id_raw = request.get("well_id")
+    message = request.get("message")
+    if not well_id_raw or not message:
+        raise HTTPException(status_code=400, detail="well_id and message are required")
+
+    well_id = int(well_id_raw)
+    well = await db.get(Well, well_id)
+
+    user_msg = ChatMessage(well_id=well_id, role="user", content=message)
+    db.add(user_msg)
+    await db.commit()
+    messages_payload = await build_context(db, well_id, well, message, user_msg.id) if configured() else None
+
+    async def events():
+        reply = ""
+        yield sse("start", {"role": "assistant"})
+        try:
+            if not configured():
+                reply = NO_KEY_REPLY
+                yield sse("delta", {"text": reply})
+            else:
+                async for delta in stream_completion(messages_payload, MAX_TOKENS, TEMPERATURE):
+                    reply += delta
+                    yield sse("delta", {"text": delta})
+        except Exception as e:
+            print(f"❌ Groq Chat Error: {type(e).__name__}: {str(e)}")
+            if not reply:
+                reply = f"Error: {str(e)}"
+                yield sse("delta", {"text": reply})
+            else:
+                yield sse("error", {"detail": str(e)})
+        finally:
+            # Shielded: a disconnect cancels the stream, the reply so far is still kept
+            with anyio.CancelScope(shield=True):
+                async with AsyncSessionLocal() as session:
+                    session.add(ChatMessage(well_id=well_id, role="assistant", content=reply))
+                    await session.commit()
+        yield sse("done", {"role": "assistant", "reply": reply})
+
+    # Older turns are folded into the summary once the reply has been sent
+    return sse_response(events(), background=BackgroundTask(update_summary, well_id, well.well_name if well else "Unknown"))
+
 @router.get("/wells/{well_id}/chat/history")
-def get_chat_history(well_id: int):
+async def get_chat_history(well_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get chat history"""
-    db = SessionLocal()
-    messages = db.query(ChatMessage).filter(ChatMessage.well_id == well_id).order_by(ChatMessage.created_at).all()
-    db.close()
+    messages = (await db.execute(
+        select(ChatMessage).where(ChatMessage.well_id == well_id).order_by(ChatMessage.created_at)
+    )).scalars().all()
     
     return {
         "messages": [{"role": m.role, "content": m.content} for m in messages]
     }
 
 @router.delete("/wells/{well_id}/chat/history")
-def delete_chat_history(well_id: int):
+async def delete_chat_history(well_id: int, db: AsyncSession = Depends(get_async_db)):
     """Clear chat history"""
-    db = SessionLocal()
-    db.query(ChatMessage).filter(ChatMessage.well_id == well_id).delete()
-    db.commit()
-    db.close()
+    await db.execute(delete(ChatMessage).where(ChatMessage.well_id == well_id))
+    await db.execute(delete(ChatSummary).where(ChatSummary.well_id == well_id))
+    await db.commit()
     
     return {"message": "Chat history cleared"}
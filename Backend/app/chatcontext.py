@@ -0,0 +1,210 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import AsyncSessionLocal, with_session
+from .models import ChatMessage, ChatSummary
+from .grounding import get_grounding_summary
+from .llm import configured, complete
+
+# Chat prompts stay about the same size however long the conversation gets:
+# grounded system prompt + rolling summary of older turns + the latest turns
+# that fit the history budget + the new message.
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", "2000"))  # budget for verbatim turns per prompt
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "400"))  # max length of the rolling summary
+CHAT_PROMPT_CACHE = int(os.getenv("CHAT_PROMPT_CACHE", "256"))  # system prompts kept (per process)
+HISTORY_SCAN = 100  # most messages read per query (the prompt reads the newest, the summarizer the oldest)
+MESSAGE_OVERHEAD = 4  # tokens of role/separator framing per message
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text and numbers)"""
+    return len(text or "") // 4 + 1
+
+def clip(text: str, tokens: int) -> str:
+    text = text or ""
+    return text if len(text) <= tokens * 4 else text[:tokens * 4] + " [...]"
+
+def message_tokens(m: ChatMessage) -> int:
+    return estimate_tokens(m.content) + MESSAGE_OVERHEAD
+
+def pack(history: list, budget: int) -> list:
+    """Newest messages (oldest first) that fit the token budget, starting on a user turn"""
+    kept, used = [], 0
+    for m in reversed(history):
+        used += message_tokens(m)
+        if used > budget:
+            break
+        kept.append(m)
+    kept.reverse()
+    # Roles must alternate user/assistant: don't open on an orphaned reply
+    while kept and kept[0].role != "user":
+        kept.pop(0)
+    return kept
+
+# ===== SYSTEM PROMPT (grounded data summary, serialized once per well version) =====
+_prompts = OrderedDict()  # (content_hash, well_name) -> system prompt
+_lock = threading.Lock()
+_stats = {"prompt_hits": 0, "prompt_misses": 0, "summaries": 0, "summary_failures": 0}
+
+def _count(stat: str):
+    with _lock:
+        _stats[stat] += 1
+
+def render_system_prompt(well_name: str, data_summary: dict) -> str:
+    # Compact JSON: the indented form cost about twice the tokens for the same numbers
+    return f"""You are GeoBot, an expert geological AI. You are analyzing well '{well_name}'.
+
+REAL-TIME DATA SUMMARY for this well:
+{json.dumps(data_summary, separators=(",", ":"))}
+
+MISSION:
+Use the numbers above to answer questions.
+- Reference 'max' and 'peak_at' for spikes, 'anomalies' for other notable depths.
+- Technical focus: Hydrocarbon ratios, gas units.
+- Don't hallucinate numbers. Use only the summary."""
+
+async def system_prompt(db: AsyncSession, well_id: int, well) -> str:
+    """Grounded system prompt of a well.
+
+    Cached by content hash (the summary is derived from the file content
+    alone, like the chart cache); wells without one are rendered every time.
+    """
+    key = (well.content_hash, well.well_name) if well is not None and well.content_hash else None
+    if key is not None:
+        with _lock:
+            prompt = _prompts.get(key)
+            if prompt is not None:
+                _prompts.move_to_end(key)
+                _stats["prompt_hits"] += 1
+                return prompt
+    _count("prompt_misses")
+    # Off the event loop: wells ingested before summaries existed get theirs built here (a full read)
+    data_summary = await run_in_threadpool(with_session, get_grounding_summary, well_id)
+    prompt = render_system_prompt(well.well_name if well else "Unknown", data_summary)
+    if key is not None and CHAT_PROMPT_CACHE:
+        with _lock:
+            _prompts[key] = prompt
+            while len(_prompts) > CHAT_PROMPT_CACHE:
+                _prompts.popitem(last=False)
+    return prompt
+
+# ===== CONTEXT =====
+
+async def latest_unsummarized(db: AsyncSession, well_id: int, through_id: int, before_id: int) -> list:
+    """Newest messages not yet folded into the summary, oldest first (ids order the chat, as for the summary's cursor)"""
+    rows = (await db.execute(
+        select(ChatMessage)
+        .where(ChatMessage.well_id == well_id, ChatMessage.id > through_id, ChatMessage.id < before_id)
+        .order_by(ChatMessage.id.desc())
+        .limit(HISTORY_SCAN)
+    )).scalars().all()
+    return rows[::-1]
+
+async def build_context(db: AsyncSession, well_id: int, well, message: str, before_id: int) -> list:
+    """Messages for a chat turn: system prompt, rolling summary, latest turns within
+    CHAT_HISTORY_TOKENS, then the new message (before_id: its saved id, left out of the history)"""
+    messages = [{"role": "system", "content": await system_prompt(db, well_id, well)}]
+
+    summary = await db.get(ChatSummary, well_id)
+    if summary is not None and summary.summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary.summary}"})
+
+    history = await latest_unsummarized(db, well_id, summary.through_id if summary else 0, before_id)
+    messages += [{"role": m.role, "content": m.content} for m in pack(history, CHAT_HISTORY_TOKENS)]
+    messages.append({"role": "user", "content": message})
+    return messages
+
+# ===== ROLLING SUMMARY =====
+# Once the unsummarized turns outgrow the history budget, the oldest are folded
+# into the summary until half the budget is left, so this runs every few turns,
+# not every turn. It runs after the reply is sent and never delays it. The
+# summary's cursor (through_id) only moves past messages it has read, so a long
+# backlog (history from before summaries, or turns while the model was down)
+# is folded in over the following turns, oldest first, none skipped.
+
+SUMMARY_PROMPT = """You keep a running summary of a conversation between a geologist and GeoBot about well '{well_name}'.
+Merge the earlier summary and the new messages into one summary of at most {words} words.
+Keep questions asked, depths, curve values, conclusions and open points; drop greetings and repetition.
+Reply with the summary only."""
+
+_summarizing = set()  # well ids being summarized in this process
+
+def summary_messages(well_name: str, previous: str, fold: list) -> list:
+    transcript = "\n".join(
+        f"{'User' if m.role == 'user' else 'GeoBot'}: {clip(m.content, CHAT_HISTORY_TOKENS // 2)}" for m in fold
+    )
+    return [
+        {"role": "system", "content": SUMMARY_PROMPT.format(well_name=well_name, words=CHAT_SUMMARY_TOKENS * 3 // 4)},
+        {"role": "user", "content": f"Earlier summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript}"},
+    ]
+
+async def oldest_unsummarized(db: AsyncSession, well_id: int, through_id: int) -> list:
+    """Messages right after the summary's cursor, oldest first"""
+    return (await db.execute(
+        select(ChatMessage)
+        .where(ChatMessage.well_id == well_id, ChatMessage.id > through_id)
+        .order_by(ChatMessage.id)
+        .limit(HISTORY_SCAN)
+    )).scalars().all()
+
+def to_fold(history: list, more: bool = False) -> list:
+    """Oldest messages to fold into the summary (empty while the history fits the budget).
+
+    history: the oldest unsummarized messages; more: there are newer ones past
+    them, so none of these is among the latest turns to keep verbatim.
+    """
+    if not more and sum(message_tokens(m) for m in history) <= CHAT_HISTORY_TOKENS:
+        return []
+    keep = 0 if more else len(pack(history, CHAT_HISTORY_TOKENS // 2))
+    older = history[:len(history) - keep]
+    # One summarizer call reads at most a budget's worth; the rest waits for the next turn
+    fold, used = [], 0
+    for m in older:
+        used += message_tokens(m)
+        if fold and used > CHAT_HISTORY_TOKENS:
+            break
+        fold.append(m)
+    return fold
+
+async def update_summary(well_id: int, well_name: str = "Unknown"):
+    """Fold older turns into the well's rolling summary if the history outgrew its budget"""
+    if not configured() or well_id in _summarizing:
+        return
+    _summarizing.add(well_id)
+    try:
+        async with AsyncSessionLocal() as db:
+            summary = await db.get(ChatSummary, well_id)
+            history = await oldest_unsummarized(db, well_id, summary.through_id if summary else 0)
+            fold = to_fold(history, more=len(history) == HISTORY_SCAN)
+            if not fold:
+                return
+            previous = summary.summary if summary else ""
+            try:
+                text = await complete(summary_messages(well_name, previous, fold), CHAT_SUMMARY_TOKENS, 0.0)
+            except Exception as e:
+                _count("summary_failures")
+                print(f"WARNING: chat summary for well {well_id} failed ({type(e).__name__}: {e}); older turns are left out meanwhile")
+                return
+            if summary is None:
+                db.add(ChatSummary(well_id=well_id, summary=text.strip(), through_id=fold[-1].id))
+            else:
+                summary.summary, summary.through_id = text.strip(), fold[-1].id
+            try:
+                await db.commit()
+            except Exception as e:
+                # Another process summarized the same turns first, or the well was deleted
+                await db.rollback()
+                print(f"WARNING: chat summary for well {well_id} not saved: {type(e).__name__}")
+                return
+            _count("summaries")
+            print(f"INFO: Folded {len(fold)} chat messages of well {well_id} into its summary")
+    finally:
+        _summarizing.discard(well_id)
+
+def metrics() -> dict:
+    """System prompt cache hits/misses and summaries written (this process)"""
+    with _lock:
+        return {**_stats, "cached_prompts": len(_prompts), "history_tokens": CHAT_HISTORY_TOKENS}
@@ -0,0 +1,432 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import Well, WellCurve, WellData, CurveChunk, CurvePyramid, CurveTileStats
+from .pyramid import LEVEL_FACTORS, minmax_decimate, pick_level
+from .stats import FIELDS, aggregate, merge, finalize
+from .bulkload import bulk_load
+
+DEPTH_KEY = "__depth__"  # curve_name under which the depth array is stored
+CHUNK_ROWS = 4096        # depth samples per stored chunk (tile)
+INDEX_CACHE_WELLS = 256  # per-well depth indexes / tile stats kept in memory
+DTYPE = np.dtype("<f8")
+
+def encode(values: np.ndarray) -> bytes:
+    return np.ascontiguousarray(values, dtype=DTYPE).tobytes()
+
+def decode(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=DTYPE)
+
+def widen(values: np.ndarray) -> np.ndarray:
+    """float32 -> float64 rounded to float32's 7 significant digits, so 0.1 reads back as 0.1"""
+    if values.dtype != np.float32:
+        return values
+    x = values.astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        digits = 6 - np.floor(np.log10(np.abs(x)))
+        up = 10.0 ** np.clip(digits, 0, 300)
+        down = 10.0 ** np.clip(-digits, 0, 300)
+        # Divide/multiply by exact powers of ten so the result is the nearest double to the decimal
+        rounded = np.round(x * up / down) / up * down
+    return np.where(np.isfinite(rounded), rounded, x)
+
+def narrow(values: np.ndarray) -> np.ndarray:
+    """float32 copy of an array if widen() gives the values back exactly, else float64"""
+    if values.dtype == np.float32:
+        return values
+    values = values.astype(np.float64, copy=False)
+    narrowed = values.astype(np.float32)
+    if np.array_equal(widen(narrowed), values, equal_nan=True):
+        return narrowed
+    return values
+
+def to_json_list(values: np.ndarray) -> list:
+    """float array -> JSON-safe list, NaN (missing cell) becomes None"""
+    return [None if v != v else v for v in widen(values).tolist()]
+
+def chunk_rows(well_id: int, chunk_index: int, curves: list, batch: np.ndarray, null_value: float = None) -> dict:
+    """{model: rows} for one (rows, curves) batch: one typed array per curve plus
+    depth, its min/max pyramid levels and per-tile stats"""
+    columns = {DEPTH_KEY: batch[:, 0]}
+    columns.update((name, batch[:, j]) for j, name in enumerate(curves) if j < batch.shape[1])
+    chunks = [
+        {
+            "well_id": well_id,
+            "curve_name": name,
+            "chunk_index": chunk_index,
+            "row_count": len(batch),
+            "data": encode(values)
+        }
+        for name, values in columns.items()
+    ]
+
+    depths = columns.pop(DEPTH_KEY)
+    levels = []
+    for level, factor in enumerate(LEVEL_FACTORS[1:], start=1):
+        level_depths, level_columns = minmax_decimate(depths, columns, factor, null_value)
+        level_columns[DEPTH_KEY] = level_depths
+        levels.extend(
+            {
+                "well_id": well_id,
+                "curve_name": name,
+                "level": level,
+                "chunk_index": chunk_index,
+                "data": encode(values)
+            }
+            for name, values in level_columns.items()
+        )
+
+    tile_stats = []
+    for name, values in columns.items():
+        agg = dict(zip(FIELDS, aggregate(depths, values, null_value).tolist()))
+        if not agg["count"]:
+            agg.update(min=None, max=None, max_depth=None)
+        agg["count"] = int(agg["count"])
+        tile_stats.append({"well_id": well_id, "curve_name": name, "chunk_index": chunk_index, **agg})
+
+    return {CurveChunk: chunks, CurvePyramid: levels, CurveTileStats: tile_stats}
+
+def write_chunk(db: Session, well_id: int, chunk_index: int, curves: list, batch: np.ndarray, null_value: float = None):
+    """Store one (rows, curves) batch with its pyramid levels and tile stats"""
+    for model, rows in chunk_rows(well_id, chunk_index, curves, batch, null_value).items():
+        bulk_load(db, model, rows)
+
+def has_columns(db: Session, well_id: int) -> bool:
+    return db.query(CurveChunk.id).filter(
+        CurveChunk.well_id == well_id, CurveChunk.curve_name == DEPTH_KEY
+    ).first() is not None
+
+def ensure_columns(db: Session, well_id: int):
+    """Migrate a legacy well to curve chunks on its first read"""
+    if has_columns(db, well_id):
+        return
+    try:
+        migrate_well(db, well_id)
+    except IntegrityError:
+        # A concurrent first read migrated it first (unique chunk index); use its chunks
+        db.rollback()
+        if not has_columns(db, well_id):
+            raise
+
+def read_columns(db: Session, well_id: int, curves: list) -> tuple:
+    """Load the depth array and the requested curves only.
+
+    Returns (depths, {curve: values}); curves the well doesn't have are absent.
+    """
+    ensure_columns(db, well_id)
+
+    names = [DEPTH_KEY] + [c for c in curves if c != DEPTH_KEY]
+    chunks = (
+        db.query(CurveChunk.curve_name, CurveChunk.data)
+        .filter(CurveChunk.well_id == well_id, CurveChunk.curve_name.in_(names))
+        .order_by(CurveChunk.curve_name, CurveChunk.chunk_index)
+        .all()
+    )
+
+    parts = {}
+    for name, blob in chunks:
+        parts.setdefault(name, []).append(decode(blob))
+    columns = {name: np.concatenate(arrays) for name, arrays in parts.items()}
+
+    depths = columns.pop(DEPTH_KEY, np.empty(0))
+    return depths, columns
+
+# ===== SHARED DATA (deduplicated uploads) =====
+
+def data_well_id(db: Session, well_id: int) -> int:
+    """Id the well's tiles are stored under: itself, or the well it was deduplicated against"""
+    return db.query(func.coalesce(Well.data_well_id, Well.id)).filter(Well.id == well_id).scalar()
+
+def hand_over_data(db: Session, well_id: int):
+    """Before deleting a well, move its tiles to the oldest well sharing them (if any)"""
+    heir = db.query(Well.id).filter(Well.data_well_id == well_id).order_by(Well.id).limit(1).scalar()
+    if heir is None:
+        return None
+    for model in (CurveChunk, CurvePyramid, CurveTileStats):
+        db.query(model).filter(model.well_id == well_id).update({"well_id": heir}, synchronize_session=False)
+    db.query(Well).filter(Well.data_well_id == well_id, Well.id != heir).update(
+        {"data_well_id": heir}, synchronize_session=False)
+    db.query(Well).filter(Well.id == heir).update({"data_well_id": None}, synchronize_session=False)
+    db.commit()
+    forget_well(well_id)
+    return heir
+
+# ===== DEPTH INDEX & TILED WINDOW READS =====
+
+class DepthIndex:
+    """Maps a depth window to [start, stop) row offsets for one well.
+
+    Regularly sampled wells (constant STEP) resolve by arithmetic, other
+    monotonic wells by binary search. Non-monotonic depth can't be mapped
+    to a contiguous row range, so the whole well is returned for masking.
+    """
+
+    def __init__(self, depths: np.ndarray, null_value: float = None):
+        self.depths = depths
+        self.null_value = null_value
+        n = len(depths)
+        diffs = np.diff(depths)
+        self.monotonic = n < 2 or bool(np.all(diffs > 0) or np.all(diffs < 0))
+        self.descending = n >= 2 and self.monotonic and diffs[0] < 0
+        self.step = None
+        if n >= 2 and self.monotonic and np.allclose(diffs, diffs[0], rtol=1e-9, atol=1e-9):
+            self.step = float(diffs[0])
+
+    def row_range(self, depth_from: float, depth_to: float) -> tuple:
+        d = self.depths
+        n = len(d)
+        if not n or not self.monotonic:
+            return 0, n
+
+        lo, hi = min(depth_from, depth_to), max(depth_from, depth_to)
+        if self.step:
+            t1, t2 = (lo - d[0]) / self.step, (hi - d[0]) / self.step
+            start = min(max(int(np.ceil(min(t1, t2))), 0), n)
+            stop = min(max(int(np.floor(max(t1, t2))) + 1, 0), n)
+            # Nudge the estimate so float rounding never drops or adds an edge sample
+            while start > 0 and lo <= d[start - 1] <= hi:
+                start -= 1
+            while start < stop and not lo <= d[start] <= hi:
+                start += 1
+            while stop < n and lo <= d[stop] <= hi:
+                stop += 1
+            while stop > start and not lo <= d[stop - 1] <= hi:
+                stop -= 1
+            return start, stop
+
+        if self.descending:
+            return (int(np.searchsorted(-d, -hi, side="left")),
+                    int(np.searchsorted(-d, -lo, side="right")))
+        return (int(np.searchsorted(d, lo, side="left")),
+                int(np.searchsorted(d, hi, side="right")))
+
+_depth_indexes = OrderedDict()
+_tile_stats = OrderedDict()  # well_id -> {curve: (tiles, 6) aggregate array}
+_depth_indexes_lock = threading.Lock()
+
+def get_depth_index(db: Session, well_id: int) -> DepthIndex:
+    """Per-well depth index, built from the stored depth array once per process"""
+    with _depth_indexes_lock:
+        index = _depth_indexes.get(well_id)
+        if index is not None:
+            _depth_indexes.move_to_end(well_id)
+            return index
+
+    depths, _ = read_columns(db, well_id, [])
+    null_value, row_count = db.query(Well.null_value, Well.row_count).filter(Well.id == well_id).first() or (None, 0)
+    index = DepthIndex(depths, null_value)
+    if not len(depths) or len(depths) != row_count:
+        # Nothing or only part ingested yet (row_count is set when ingest finishes,
+        # possibly in a worker process), don't pin an incomplete index
+        return index
+    with _depth_indexes_lock:
+        _depth_indexes[well_id] = index
+        while len(_depth_indexes) > INDEX_CACHE_WELLS:
+            _depth_indexes.popitem(last=False)
+    return index
+
+def forget_well(well_id: int):
+    """Drop cached per-well structures (call when a well is deleted or re-ingested)"""
+    with _depth_indexes_lock:
+        _depth_indexes.pop(well_id, None)
+        _tile_stats.pop(well_id, None)
+
+def read_tiles(db: Session, well_id: int, curves: list, first: int, last: int, level: int = 0) -> dict:
+    """Concatenate tiles first..last of the given curves at one pyramid level"""
+    if level:
+        query = db.query(CurvePyramid.curve_name, CurvePyramid.data).filter(
+            CurvePyramid.well_id == well_id,
+            CurvePyramid.curve_name.in_(curves),
+            CurvePyramid.level == level,
+            CurvePyramid.chunk_index.between(first, last)
+        ).order_by(CurvePyramid.curve_name, CurvePyramid.chunk_index)
+    else:
+        query = db.query(CurveChunk.curve_name, CurveChunk.data).filter(
+            CurveChunk.well_id == well_id,
+            CurveChunk.curve_name.in_(curves),
+            CurveChunk.chunk_index.between(first, last)
+        ).order_by(CurveChunk.curve_name, CurveChunk.chunk_index)
+
+    parts = {}
+    for name, blob in query.all():
+        parts.setdefault(name, []).append(decode(blob))
+    return {name: np.concatenate(arrays) for name, arrays in parts.items()}
+
+def read_window(db: Session, well_id: int, curves: list, depth_from: float = None, depth_to: float = None,
+                max_points: int = None) -> tuple:
+    """Like read_columns, but only loads the tiles covering [depth_from, depth_to].
+
+    With max_points, the finest pyramid level that fits is served instead of
+    raw samples (min/max pairs, so peaks stay visible).
+    """
+    index = get_depth_index(db, well_id)
+    n = len(index.depths)
+    if depth_from is None or depth_to is None:
+        start, stop = 0, n
+    else:
+        start, stop = index.row_range(depth_from, depth_to)
+    if start >= stop:
+        return np.empty(0), {}
+
+    first, last = start // CHUNK_ROWS, (stop - 1) // CHUNK_ROWS
+    names = [c for c in curves if c != DEPTH_KEY]
+
+    level = pick_level(stop - start, max_points) if index.monotonic else 0
+    if level:
+        factor = LEVEL_FACTORS[level]
+        columns = read_tiles(db, well_id, names + [DEPTH_KEY], first, last, level)
+        offset = 2 * first * CHUNK_ROWS // factor
+        lo, hi = 2 * (start // factor) - offset, 2 * -(-stop // factor) - offset
+        columns = {c: v[lo:hi] for c, v in columns.items()}
+        depths = columns.pop(DEPTH_KEY, np.empty(0))
+        return depths, columns
+
+    columns = read_tiles(db, well_id, names, first, last)
+    offset = first * CHUNK_ROWS
+    columns = {c: v[start - offset:stop - offset] for c, v in columns.items()}
+    depths = index.depths[start:stop]
+
+    if not index.monotonic and depth_from is not None and depth_to is not None:
+        in_range = (depths >= min(depth_from, depth_to)) & (depths <= max(depth_from, depth_to))
+        depths = depths[in_range]
+        columns = {c: v[in_range] for c, v in columns.items()}
+    return depths, columns
+
+# ===== RANGE STATISTICS FROM TILE AGGREGATES =====
+
+def load_tile_stats(db: Session, well_id: int, curves: list) -> dict:
+    """Per-tile aggregates for the given curves, cached per process"""
+    with _depth_indexes_lock:
+        # Only wells with a pinned (complete) depth index keep their aggregates
+        if well_id in _depth_indexes:
+            cached = _tile_stats.setdefault(well_id, {})
+            _tile_stats.move_to_end(well_id)
+            while len(_tile_stats) > INDEX_CACHE_WELLS:
+                _tile_stats.popitem(last=False)
+        else:
+            cached = {}
+        missing = [c for c in curves if c not in cached]
+
+    if missing:
+        rows = (
+            db.query(CurveTileStats)
+            .filter(CurveTileStats.well_id == well_id, CurveTileStats.curve_name.in_(missing))
+            .order_by(CurveTileStats.curve_name, CurveTileStats.chunk_index)
+            .all()
+        )
+        loaded = {c: [] for c in missing}
+        for r in rows:
+            loaded[r.curve_name].append([
+                r.count, r.mean, r.m2,
+                np.inf if r.min is None else r.min,
+                -np.inf if r.max is None else r.max,
+                np.nan if r.max_depth is None else r.max_depth
+            ])
+        with _depth_indexes_lock:
+            for c, tiles in loaded.items():
+                if tiles:  # unknown curve or ingest still running: ask again next time
+                    cached[c] = np.array(tiles, dtype=float).reshape(-1, len(FIELDS))
+
+    return {c: cached[c] for c in curves if c in cached}
+
+def read_range_stats(db: Session, well_id: int, curves: list, depth_from: float = None, depth_to: float = None) -> dict:
+    """{curve: stats.finalize()} over a depth window without scanning it.
+
+    Whole tiles inside the window merge from their stored aggregates; only the
+    (at most two) partially covered edge tiles are read and aggregated.
+    """
+    index = get_depth_index(db, well_id)
+    n = len(index.depths)
+    window = depth_from is not None and depth_to is not None
+    start, stop = index.row_range(depth_from, depth_to) if window else (0, n)
+    if start >= stop:
+        return {}
+
+    names = [c for c in curves if c != DEPTH_KEY]
+    if window and not index.monotonic:
+        depths, columns = read_window(db, well_id, names, depth_from, depth_to)
+        return {c: finalize(aggregate(depths, v, index.null_value)) for c, v in columns.items()}
+
+    tiles = load_tile_stats(db, well_id, names)
+
+    def read_rows(curves: list, lo: int, hi: int) -> dict:
+        tile = lo // CHUNK_ROWS
+        offset = tile * CHUNK_ROWS
+        return {c: v[lo - offset:hi - offset] for c, v in read_tiles(db, well_id, curves, tile, tile).items()}
+
+    return merge_range_stats(index, tiles, start, stop, read_rows)
+
+def merge_range_stats(index: DepthIndex, tiles: dict, start: int, stop: int, read_rows) -> dict:
+    """{curve: stats.finalize()} over rows [start, stop) from per-tile aggregates.
+
+    read_rows(curves, lo, hi) supplies the rows of the partial edge tiles.
+    """
+    n = len(index.depths)
+    first, last = start // CHUNK_ROWS, (stop - 1) // CHUNK_ROWS
+    full_first = first if start == first * CHUNK_ROWS else first + 1
+    full_last = last if stop == min((last + 1) * CHUNK_ROWS, n) else last - 1
+
+    # Partial edge tiles: aggregate just the rows inside the window
+    head, tail = {}, {}
+    for tile, part in ((first, head), (last, tail)):
+        if full_first <= tile <= full_last or part is tail and first == last:
+            continue
+        lo, hi = max(start, tile * CHUNK_ROWS), min(stop, (tile + 1) * CHUNK_ROWS)
+        for c, values in read_rows(list(tiles), lo, hi).items():
+            part[c] = aggregate(index.depths[lo:hi], values, index.null_value)
+
+    result = {}
+    for c, aggs in tiles.items():
+        parts = [head[c]] if c in head else []
+        if full_first <= full_last:
+            parts.append(aggs[full_first:full_last + 1])
+        if c in tail:
+            parts.append(tail[c])
+        result[c] = finalize(merge(np.vstack(parts))) if parts else None
+    return result
+
+# ===== MIGRATION FROM well_data ROWS =====
+
+def migrate_well(db: Session, well_id: int) -> int:
+    """Convert a well's legacy JSON rows into curve chunks; returns rows moved"""
+    well = db.query(Well).filter(Well.id == well_id).first()
+    null_value = well.null_value if well else None
+    curves = [c.curve_name for c in
+              db.query(WellCurve).filter(WellCurve.well_id == well_id).order_by(WellCurve.id)]
+    rows = (
+        db.query(WellData.depth, WellData.curve_values)
+        .filter(WellData.well_id == well_id)
+        .order_by(WellData.id)
+        .yield_per(CHUNK_ROWS)
+    )
+
+    total = 0
+    batch = []
+    for depth, curve_values in rows:
+        curve_values = curve_values or {}
+        batch.append([depth] + [curve_values.get(c, np.nan) for c in curves[1:]])
+        if len(batch) == CHUNK_ROWS:
+            write_chunk(db, well_id, total // CHUNK_ROWS, curves, np.array(batch, dtype=float), null_value)
+            total += len(batch)
+            batch = []
+    if batch:
+        write_chunk(db, well_id, total // CHUNK_ROWS, curves, np.array(batch, dtype=float), null_value)
+        total += len(batch)
+
+    db.commit()
+    return total
+
+def migrate_all(db: Session, drop_rows: bool = False) -> dict:
+    """Migrate every well still stored only as well_data rows"""
+    migrated = {}
+    for (well_id,) in db.query(Well.id).all():
+        if has_columns(db, well_id):
+            continue
+        migrated[well_id] = migrate_well(db, well_id)
+        if drop_rows:
+            db.query(WellData).filter(WellData.well_id == well_id).delete()
+            db.commit()
+    return migrated
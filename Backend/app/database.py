@@ -1,6 +1,10 @@
 import os
+import time
+import threading
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.pool import NullPool
 
@@ -8,19 +12,122 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Create engine
-engine = create_engine(DATABASE_URL, echo=False, poolclass=NullPool)
+# ===== CONNECTION POOL =====
+# DB_POOL_SIZE=0 falls back to NullPool (e.g. behind a transaction-mode pgbouncer)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
 
-# Create session factory
+def _engine_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        # Sessions are opened in the dependency and used from the handler's thread
+        return {"connect_args": {"check_same_thread": False}}
+    if POOL_SIZE <= 0:
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+
+# Async drivers for the request path
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def async_database_url(url: str):
+    url = make_url(url)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+    if "sslmode" in url.query:
+        # asyncpg takes ssl=, not libpq's sslmode=
+        url = url.difference_update_query(["sslmode"]).update_query_dict({"ssl": url.query["sslmode"]})
+    return url
+
+# Create engines: async for request handlers, sync for ingest workers and scripts
+engine = create_engine(DATABASE_URL, echo=False, **_engine_options(DATABASE_URL))
+async_engine = create_async_engine(async_database_url(DATABASE_URL), echo=False,
+                                   **{k: v for k, v in _engine_options(DATABASE_URL).items() if k != "connect_args"})
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores ON DELETE CASCADE (and would keep per-well data/summaries) unless enabled
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _enable_sqlite_foreign_keys)
+    event.listen(async_engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, expire_on_commit=False)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 # Base class for models
 Base = declarative_base()
 
+# ===== POOL METRICS =====
+_wait_lock = threading.Lock()
+_wait = {"checkouts": 0, "total_ms": 0.0, "max_ms": 0.0}
+
+def _record_wait(ms: float):
+    with _wait_lock:
+        _wait["checkouts"] += 1
+        _wait["total_ms"] += ms
+        _wait["max_ms"] = max(_wait["max_ms"], ms)
+
+def _pool_stats(pool) -> dict:
+    return {
+        "pool": type(pool).__name__,
+        "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+        "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+        "size": pool.size() if hasattr(pool, "size") else None,
+        "overflow": max(pool.overflow(), 0) if hasattr(pool, "overflow") else None,
+    }
+
+def pool_metrics() -> dict:
+    """Checked-out / idle / overflow connections plus time spent waiting for one"""
+    with _wait_lock:
+        wait = dict(_wait)
+    return {
+        "requests": _pool_stats(async_engine.pool),
+        "ingest": _pool_stats(engine.pool),
+        "checkouts": wait["checkouts"],
+        "wait_ms_avg": round(wait["total_ms"] / wait["checkouts"], 3) if wait["checkouts"] else 0.0,
+        "wait_ms_max": round(wait["max_ms"], 3),
+    }
+
 # Dependency for FastAPI routes
 def get_db():
+    """One session per request, always returned to the pool (also on errors / 404s)"""
     db = SessionLocal()
     try:
+        # Check out up front so the wait for a pooled connection is measured
+        started = time.perf_counter()
+        db.connection()
+        _record_wait((time.perf_counter() - started) * 1000)
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def with_session(fn, *args, **kwargs):
+    """Call fn(db, *args, **kwargs) on its own sync session.
+
+    For handlers on the event loop: run it through run_in_threadpool so tile
+    decoding and NumPy work happen off the loop (AsyncSession.run_sync would
+    run them on the loop's thread).
+    """
+    db = SessionLocal()
+    try:
+        return fn(db, *args, **kwargs)
+    finally:
+        db.close()
+
+async def get_async_db():
+    """Async session per request (handlers on the event loop)"""
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        await db.connection()
+        _record_wait((time.perf_counter() - started) * 1000)
+        yield db
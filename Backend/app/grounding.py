@@ -0,0 +1,42 @@
+from sqlalchemy.orm import Session
+from .models import Well, WellSummary
+from .columnar import read_columns, data_well_id
+from .analysis import describe, top_anomalies, round_stats
+
+# Curves GeoBot is grounded on
+GROUNDING_CURVES = ["TOTAL_GAS", "HC1", "HC2", "HC3", "ROP", "CO2"]
+TOP_ANOMALIES = 5
+
+def build_grounding_summary(db: Session, well_id: int) -> dict:
+    """Peaks, averages and top anomalies per grounding curve (one full read)"""
+    null_value = db.query(Well.null_value).filter(Well.id == well_id).scalar()
+    depths, columns = read_columns(db, data_well_id(db, well_id), GROUNDING_CURVES)
+
+    summary = {}
+    for c, s in round_stats(describe(depths, columns, null_value), 2).items():
+        summary[c] = {
+            "avg": s["mean"],
+            "max": s["max"],
+            "peak_at": s["max_at"],
+            "anomalies": [
+                {"depth": round(a["depth"], 1), "value": round(a["value"], 2), "zscore": round(a["zscore"], 1)}
+                for a in top_anomalies(depths, columns[c], null_value, TOP_ANOMALIES)
+            ]
+        }
+    return summary
+
+def store_grounding_summary(db: Session, well_id: int) -> dict:
+    """(Re)build and persist the summary; call whenever a well's data changes"""
+    summary = build_grounding_summary(db, well_id)
+    db.merge(WellSummary(well_id=well_id, summary=summary))
+    db.commit()
+    return summary
+
+def get_grounding_summary(db: Session, well_id: int) -> dict:
+    """Stored summary for chat; built on first use for wells ingested before it existed"""
+    row = db.query(WellSummary).filter(WellSummary.well_id == well_id).first()
+    if row is not None:
+        return row.summary
+    if not db.query(Well.id).filter(Well.id == well_id).first():
+        return {}
+    return store_grounding_summary(db, well_id)
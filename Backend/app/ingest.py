@@ -0,0 +1,243 @@
+import time
+from typing import BinaryIO, Callable, Iterable, Iterator
+from sqlalchemy import select, exists, func, or_, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import WellNameCounter, Well, WellCurve, CurveChunk, CurvePyramid, CurveTileStats, WellSummary
+from .parser import LasStream
+from .columnar import CHUNK_ROWS, write_chunk, forget_well
+from .storage import storage_service, UploadWriter
+from .grounding import store_grounding_summary
+from .wellfile import store_well_file
+
+CHUNK_SIZE = 1024 * 1024  # bytes read from the upload per step
+BATCH_ROWS = CHUNK_ROWS   # depth samples parsed and stored per batch (one chunk)
+NAME_ATTEMPTS = 100       # display names tried before an upload gives up
+
+def iter_chunks(fileobj: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Read a file object in fixed-size chunks"""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+def tee_to_storage(chunks: Iterable[bytes], writer: UploadWriter) -> Iterator[bytes]:
+    """Pass chunks through to the parser while writing them to storage"""
+    for chunk in chunks:
+        writer.write(chunk)
+        yield chunk
+
+def base_display_name(parsed_name: str, filename: str) -> str:
+    # Determine a friendly name for the UI
+    if parsed_name.upper() in ['WELL1', 'UNKNOWN', 'WELL', 'N/A']:
+        # Append filename for better distinction in generic cases
+        return f"{parsed_name} ({filename})"
+    return parsed_name
+
+def _insert(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(WellNameCounter)
+
+def next_copy_number(db: Session, base_name: str) -> int:
+    """Allocate a copy number for base_name in one atomic upsert (0 = the base name is free).
+
+    The counter row stays locked until the caller commits, so concurrent uploads of
+    the same well queue up here instead of racing for the same name. The first time a
+    base name is seen the counter is seeded from the wells that already use it.
+    """
+    escaped = base_name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    taken = exists().where(Well.well_name == base_name)
+    in_use = (select(func.count(Well.id))
+              .where(or_(Well.well_name == base_name,
+                         Well.well_name.like(f"{escaped} (Copy %)", escape="\\")))
+              .scalar_subquery())
+    stmt = _insert(db).values(base_name=base_name, copies=case((taken, in_use), else_=0))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[WellNameCounter.base_name],
+        set_={"copies": case((taken, WellNameCounter.copies + 1), else_=0)}
+    ).returning(WellNameCounter.copies)
+    return db.execute(stmt).scalar_one()
+
+def resolve_display_name(db: Session, parsed_name: str, filename: str) -> str:
+    # Option 1: Auto-rename if name exists
+    base_name = base_display_name(parsed_name, filename)
+    copy = next_copy_number(db, base_name)
+    return base_name if copy == 0 else f"{base_name} (Copy {copy})"
+
+def create_well(db: Session, well_info: dict, filename: str) -> Well:
+    """Well record (row_count 0 until its data is stored) plus its curve list"""
+    well = Well(
+        filename=filename,
+        company=well_info.get('company'),
+        field=well_info.get('field'),
+        location=well_info.get('location'),
+        country=well_info.get('country'),
+        date_analysed=well_info.get('date_analysed'),
+        start_depth=well_info.get('start_depth'),
+        stop_depth=well_info.get('stop_depth'),
+        step=well_info.get('step'),
+        null_value=well_info.get('null_value'),
+        row_count=0
+    )
+    for attempt in range(NAME_ATTEMPTS):
+        well.well_name = resolve_display_name(db, well_info.get('well_name', 'Unknown'), filename)
+        try:
+            # The unique index has the final say: a name the counter skipped over
+            # (e.g. "X (Copy 2)" uploaded as-is) just takes the next number
+            with db.begin_nested():
+                db.add(well)
+            break
+        except IntegrityError:
+            continue
+    else:
+        db.rollback()
+        raise ValueError(f"No free display name for {well.well_name!r}")
+    db.commit()
+    db.refresh(well)
+
+    db.add_all([WellCurve(well_id=well.id, curve_name=c) for c in well_info.get('curves', [])])
+    db.commit()
+    return well
+
+def discard_well(db: Session, well_id: int):
+    """Remove a half-ingested well and everything stored for it"""
+    db.query(CurveChunk).filter(CurveChunk.well_id == well_id).delete()
+    db.query(CurvePyramid).filter(CurvePyramid.well_id == well_id).delete()
+    db.query(CurveTileStats).filter(CurveTileStats.well_id == well_id).delete()
+    db.query(WellSummary).filter(WellSummary.well_id == well_id).delete()
+    db.query(WellCurve).filter(WellCurve.well_id == well_id).delete()
+    db.query(Well).filter(Well.id == well_id).delete()
+    db.commit()
+
+def ingest_stream(db: Session, chunks: Iterable[bytes], filename: str,
+                  progress: Callable[[str, int], None] = None, content_hash: str = None) -> dict:
+    """Streaming ingest: header -> well record -> batches of rows -> storage.
+
+    Memory stays bounded by CHUNK_SIZE plus BATCH_ROWS rows: each batch is
+    written to the database, and each chunk to local storage, before the
+    next chunk is pulled from the upload.
+
+    progress(stage, rows) is called as the ingest moves through its stages
+    (see jobs.STAGES) and after every stored batch. content_hash, if the
+    caller already hashed the file, lets storage skip a file already in S3.
+    """
+    progress = progress or (lambda stage, rows: None)
+    started = time.perf_counter()
+    writer = storage_service.open_writer(filename, content_hash)
+    stream = LasStream(tee_to_storage(chunks, writer), batch_rows=BATCH_ROWS)
+    well = None
+
+    try:
+        progress("parsing", 0)
+        well_info = stream.read_header()
+        well = create_well(db, well_info, filename)
+        curves_list = well_info.get('curves', [])
+
+        # Parse, local file write, bulk load and pyramid/tile stats build run batch by batch
+        for chunk_index, batch in enumerate(stream.iter_batches()):
+            write_chunk(db, well.id, chunk_index, curves_list, batch, well.null_value)
+            db.commit()
+            progress("loading", stream.row_count)
+
+        progress("storing", stream.row_count)
+        storage_result = writer.close()
+
+        well.row_count = stream.row_count
+        well.s3_key = storage_result.get('s3_key')
+        well.content_hash = storage_result.get('content_hash')
+        db.commit()
+        # Anything read while the well was still loading is stale now
+        forget_well(well.id)
+        progress("summarizing", stream.row_count)
+        store_grounding_summary(db, well.id)
+        store_well_file(db, well.id, well.content_hash)
+    except Exception:
+        db.rollback()
+        writer.abort()
+        if well is not None and well.id:
+            # Don't leave a half-ingested well behind
+            discard_well(db, well.id)
+        raise
+
+    elapsed = time.perf_counter() - started
+    rows_per_sec = round(stream.row_count / elapsed) if elapsed else 0
+    print(f"INFO: Ingested {filename}: {stream.row_count} rows in {elapsed:.2f}s ({rows_per_sec} rows/sec)")
+
+    return {
+        "well": well,
+        "curves": curves_list,
+        "storage": storage_result,
+        "ingest": {
+            "rows": stream.row_count,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": rows_per_sec
+        }
+    }
+
+def find_ingested(db: Session, content_hash: str) -> Well:
+    """A fully ingested well holding its own data for this exact file, if any"""
+    return (db.query(Well)
+            .filter(Well.content_hash == content_hash, Well.data_well_id.is_(None), Well.row_count > 0)
+            .order_by(Well.id)
+            .first())
+
+def link_duplicate(db: Session, chunks: Iterable[bytes], filename: str, source: Well) -> dict:
+    """Re-upload of an already ingested file: a new well record over the source's data.
+
+    Only the header is read (for the display name and curve list); nothing is
+    parsed, stored or uploaded again. Returns the same shape as ingest_stream.
+    """
+    started = time.perf_counter()
+    well_info = LasStream(chunks).read_header()
+    well = create_well(db, well_info, filename)
+    well.data_well_id = source.id
+    well.row_count = source.row_count
+    well.s3_key = source.s3_key
+    well.content_hash = source.content_hash
+    summary = db.query(WellSummary.summary).filter(WellSummary.well_id == source.id).scalar()
+    if summary is not None:
+        db.add(WellSummary(well_id=well.id, summary=summary))
+    db.commit()
+    # Sources ingested before the file store was enabled get their file now
+    store_well_file(db, source.id, source.content_hash)
+
+    elapsed = time.perf_counter() - started
+    print(f"INFO: {filename} already ingested as well {source.id}; linked well {well.id} in {elapsed:.3f}s")
+    return {
+        "well": well,
+        "curves": well_info.get('curves', []),
+        "storage": {"s3_stored": bool(source.s3_key), "s3_key": source.s3_key, "content_hash": source.content_hash},
+        "ingest": {
+            "rows": source.row_count,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(source.row_count / elapsed) if elapsed else 0,
+            "deduplicated_from": source.id
+        }
+    }
+
+def ingest_summary(result: dict) -> dict:
+    """JSON-ready upload response for an ingest_stream() result"""
+    well = result["well"]
+    return {
+        "id": well.id,
+        "well_name": well.well_name,
+        "filename": well.filename,
+        "company": well.company,
+        "field": well.field,
+        "location": well.location,
+        "country": well.country,
+        "date_analysed": well.date_analysed,
+        "start_depth": well.start_depth,
+        "stop_depth": well.stop_depth,
+        "step": well.step,
+        "row_count": well.row_count,
+        "curves": result["curves"],
+        "s3_stored": result["storage"].get('s3_stored'),
+        "s3_key": well.s3_key,
+        "depth_range": {"start": well.start_depth, "stop": well.stop_depth},
+        "ingest": result["ingest"]
+    }
@@ -1,171 +1,259 @@
-import os
 import json
-from groq import Groq
-from fastapi import APIRouter, HTTPException
-from .database import SessionLocal
-from .models import Well, WellData, Interpretation
+import hashlib
+import anyio
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import get_async_db, AsyncSessionLocal, with_session
+from .models import Well, Interpretation
+from .columnar import read_window
+from .analysis import describe, gas_ratios, round_stats, DEFAULT_PERCENTILES
+from .llm import MODEL, sse, sse_response, configured, complete, stream_completion
 
 router = APIRouter(prefix="/interpret", tags=["interpret"])
 
-def get_client():
-    api_key = os.getenv("API_KEY")
-    if not api_key:
-        return None
-    return Groq(api_key=api_key.strip())
+MODEL_LABEL = "Groq Llama-3.3-70b"
+MAX_TOKENS = 1500
+TEMPERATURE = 0.0
+# Bump when the prompt's meaning changes without its text changing, so stored answers aren't reused
+PROMPT_VERSION = 1
+NO_KEY_TEXT = "OpenAI API Key not configured. Please add API_KEY to your .env file."
 
-@router.post("")
-def interpret(request: dict):
-    """Deep AI interpretation with numeric grounding (Groq)"""
-    db = SessionLocal()
-    
+def build_prompt(well_name: str, depth_from, depth_to, stats: dict, ratios: dict) -> list:
+    """Chat messages asking the model for an interpretation of the computed statistics"""
+    # STRUCTURED GEOLOGIST PROMPT
+    prompt = f"""
+You are a Senior Petroleum Geologist and Petrophysicist. 
+Analyze these well log signatures for well '{well_name}' at interval {depth_from}-{depth_to} ft.
+
+CURVE STATISTICS:
+{json.dumps(stats, indent=2)}
+
+{f"GAS RATIOS: {json.dumps(ratios)}" if ratios else ""}
+
+TASK:
+Provide a technical, high-precision interpretation.
+1. FORMATION ANALYSIS: identify potential lithology or reservoir characteristics.
+2. HYDROCARBON POTENTIAL: Analyze spikes (Max values) and their depths. Compare against background mean.
+3. FLUID TYPE: If gas ratios are available, interpret if we see dry gas, wet gas, or oil.
+4. RECOMMENDATIONS: Precise next steps.
+
+STYLE:
+Professional, data-driven, and technical. Use markdown. Reference EXACT peaks and depths.
+"""
+    return [
+        {"role": "system", "content": "You are a professional geologist interpreting well log data."},
+        {"role": "user", "content": prompt}
+    ]
+
+def prompt_fingerprint(messages: list) -> str:
+    """Hash of everything the model sees. The prompt embeds the well, the interval and
+    the computed stats/ratios, and temperature 0 makes the answer a function of it."""
+    request = {"model": MODEL, "version": PROMPT_VERSION, "max_tokens": MAX_TOKENS,
+               "temperature": TEMPERATURE, "messages": messages}
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+def fallback_interpretation(stats: dict, depth_from, depth_to) -> str:
+    """Rules-based summary when the model can't be reached"""
+    # Professional Fallback logic
+    avg_gas = stats.get('TOTAL_GAS', {}).get('mean', 0)
+    max_gas = stats.get('TOTAL_GAS', {}).get('max', 0)
+    max_depth = stats.get('TOTAL_GAS', {}).get('max_at', 0)
+
+    interpretation_text = f"### Technical Interpretation Summary\n\n"
+    interpretation_text += f"Analysis of the interval **{depth_from}–{depth_to} ft** indicates "
+    if avg_gas > 500:
+        interpretation_text += f"a high-potential hydrocarbon zone. A peak of **{max_gas} units** was detected at **{max_depth} ft**, "
+        interpretation_text += "suggesting a significant gas entry or reservoir intersection. "
+    else:
+        interpretation_text += "stable background conditions with no major anomalies detected. "
+
+    interpretation_text += "\n\n*Note: Advanced AI analysis encountered a connectivity issue. Providing rules-based summary.*"
+    return interpretation_text
+
+async def analyze(request: dict, db: AsyncSession) -> dict:
+    """Validate an interpretation request and compute its statistics (None if the range is empty)"""
     well_id = request.get("well_id")
     depth_from = request.get("depth_from")
     depth_to = request.get("depth_to")
     curves = request.get("curves", [])
     
     if not well_id:
-        db.close()
         raise HTTPException(status_code=400, detail="well_id is required")
 
-    well = db.query(Well).filter(Well.id == well_id).first()
+    well = await db.get(Well, well_id)
     if not well:
-        db.close()
         raise HTTPException(status_code=404, detail="Well not found")
 
-    # Fetch data for technical analysis
-    query = db.query(WellData).filter(WellData.well_id == well_id)
-    if depth_from is not None and depth_to is not None:
-        query = query.filter(WellData.depth.between(depth_from, depth_to))
-    
-    data = query.all()
-    if not data:
-        db.close()
-        return {"error": "No data in range"}
-
     # --- ADVANCED ANALYSIS ENGINE ---
-    # We compute these in backend so the LLM doesn't have to guess or calculate
-    stats = {}
-    for c in curves:
-        valid_points = [(d.depth, d.curve_values.get(c)) for d in data 
-                       if d.curve_values.get(c) is not None and d.curve_values.get(c) > -900]
-        
-        if valid_points:
-            vals = [p[1] for p in valid_points]
-            mean = sum(vals) / len(vals)
-            max_val = max(vals)
-            max_depth = [p[0] for p in valid_points if p[1] == max_val][0]
-            
-            # Simple Standard Deviation
-            variance = sum((x - mean) ** 2 for x in vals) / len(vals)
-            std_dev = variance ** 0.5
-            
-            stats[c] = {
-                "min": round(min(vals), 2),
-                "max": round(max_val, 2),
-                "max_at": round(max_depth, 1),
-                "mean": round(mean, 2),
-                "std": round(std_dev, 2),
-                "count": len(vals)
-            }
+    # We compute these in backend so the LLM doesn't have to guess or calculate.
+    # Only the requested curves, and only the tiles covering the interval, are read.
+    depths, columns = await run_in_threadpool(with_session, read_window, well.data_well_id or well.id, curves,
+                                              depth_from, depth_to)
+    if not len(depths):
+        return None
+
+    stats = round_stats(await run_in_threadpool(describe, depths, columns, well.null_value, DEFAULT_PERCENTILES), 2)
 
     # Detect Gas Ratios if light hydrocarbons are present
-    ratios = {}
-    if all(k in stats for k in ["HC1", "HC2", "HC3"]):
-        c1 = stats["HC1"]["mean"]
-        c2 = stats["HC2"]["mean"]
-        c3 = stats["HC3"]["mean"]
-        if c1 > 0:
-            wetness = ((c2 + c3) / (c1 + c2 + c3)) * 100
-            balance = c1 / (c2 + c3) if (c2+c3) > 0 else 0
-            ratios = {
-                "gas_wetness": f"{round(wetness, 2)}%",
-                "balance_index": round(balance, 2),
-                "interpretation_hint": "Gas" if wetness < 5 else "Condensate/Oil"
-            }
+    ratios = gas_ratios(stats)
 
-    client = get_client()
-    if not client:
-        interpretation_text = "OpenAI API Key not configured. Please add API_KEY to your .env file."
+    messages = build_prompt(well.well_name, depth_from, depth_to, stats, ratios)
+    return {"well_id": well_id, "depth_from": depth_from, "depth_to": depth_to, "curves": curves,
+            "stats": stats, "ratios": ratios, "messages": messages, "prompt_hash": prompt_fingerprint(messages)}
+
+def interpretation_response(interpretation: Interpretation, analysis: dict, cached: bool) -> dict:
+    """An interpretation as the API sends it"""
+    return {
+        "id": interpretation.id,
+        "depth_from": analysis["depth_from"],
+        "depth_to": analysis["depth_to"],
+        "curves": analysis["curves"],
+        "interpretation": interpretation.interpretation,
+        "model": MODEL_LABEL,
+        "stats": analysis["stats"],
+        "ratios": analysis["ratios"],
+        "cached": cached,
+        "created_at": interpretation.created_at.isoformat()
+    }
+
+async def save_interpretation(db: AsyncSession, analysis: dict, interpretation_text: str,
+                              prompt_hash: str = None) -> dict:
+    """Persist an interpretation; returns it as the API sends it.
+
+    Model output (prompt_hash given) replaces the well's earlier text for the
+    same fingerprint instead of adding a duplicate row.
+    """
+    interpretation = None
+    if prompt_hash:
+        interpretation = (await db.execute(
+            select(Interpretation).where(Interpretation.well_id == analysis["well_id"],
+                                         Interpretation.prompt_hash == prompt_hash).limit(1)
+        )).scalars().first()
+    if interpretation is None:
+        interpretation = Interpretation(
+            well_id=analysis["well_id"],
+            depth_from=analysis["depth_from"],
+            depth_to=analysis["depth_to"],
+            curves_analyzed=",".join(analysis["curves"]),
+            prompt_hash=prompt_hash
+        )
+        db.add(interpretation)
+    interpretation.interpretation = interpretation_text
+    interpretation.created_at = datetime.utcnow()
+    await db.commit()
+    await db.refresh(interpretation)
+    
+    return interpretation_response(interpretation, analysis, cached=False)
+
+async def cached_interpretation(db: AsyncSession, analysis: dict) -> Optional[dict]:
+    """Earlier model output of this well for the same fingerprint, if any (None if the model has to run).
+
+    The prompt names the well, and display names are unique, so a fingerprint
+    never matches another well's row.
+    """
+    hit = (await db.execute(
+        select(Interpretation).where(Interpretation.well_id == analysis["well_id"],
+                                     Interpretation.prompt_hash == analysis["prompt_hash"])
+        .order_by(Interpretation.id.desc()).limit(1)
+    )).scalars().first()
+    if hit is None:
+        return None
+    return interpretation_response(hit, analysis, cached=True)
+
+@router.post("")
+async def interpret(request: dict, db: AsyncSession = Depends(get_async_db)):
+    """Deep AI interpretation with numeric grounding (Groq).
+
+    Identical requests reuse the stored text ("cached": true); pass
+    "refresh": true to run the model again.
+    """
+    analysis = await analyze(request, db)
+    if analysis is None:
+        return {"error": "No data in range"}
+    stats, depth_from, depth_to = analysis["stats"], analysis["depth_from"], analysis["depth_to"]
+
+    if not request.get("refresh"):
+        cached = await cached_interpretation(db, analysis)
+        if cached is not None:
+            return cached
+
+    prompt_hash = None
+    if not configured():
+        interpretation_text = NO_KEY_TEXT
     else:
         try:
-            # STRUCTURED GEOLOGIST PROMPT
-            prompt = f"""
-You are a Senior Petroleum Geologist and Petrophysicist. 
-Analyze these well log signatures for well '{well.well_name}' at interval {depth_from}-{depth_to} ft.
+            # Through the shared gateway (llm.py); an open breaker fails at once into the fallback
+            interpretation_text = await complete(analysis["messages"], MAX_TOKENS, TEMPERATURE)
+            prompt_hash = analysis["prompt_hash"]
+        except Exception as e:
+            print(f"❌ Groq Interpret Error: {type(e).__name__}: {str(e)}")
+            interpretation_text = fallback_interpretation(stats, depth_from, depth_to)
 
-CURVE STATISTICS:
-{json.dumps(stats, indent=2)}
+    return await save_interpretation(db, analysis, interpretation_text, prompt_hash)
 
-{f"GAS RATIOS: {json.dumps(ratios)}" if ratios else ""}
+@router.post("/stream")
+async def interpret_stream(request: dict, db: AsyncSession = Depends(get_async_db)):
+    """Same interpretation as POST /interpret, streamed as server-sent events (see llm.py).
 
-TASK:
-Provide a technical, high-precision interpretation.
-1. FORMATION ANALYSIS: identify potential lithology or reservoir characteristics.
-2. HYDROCARBON POTENTIAL: Analyze spikes (Max values) and their depths. Compare against background mean.
-3. FLUID TYPE: If gas ratios are available, interpret if we see dry gas, wet gas, or oil.
-4. RECOMMENDATIONS: Precise next steps.
+    Tokens are forwarded as the model produces them; the interpretation is
+    saved when the stream ends (also if the client goes away mid-way).
+    Cached text comes back as a single delta.
+    """
+    analysis = await analyze(request, db)
+    cached = None
+    if analysis is not None and not request.get("refresh"):
+        cached = await cached_interpretation(db, analysis)
 
-STYLE:
-Professional, data-driven, and technical. Use markdown. Reference EXACT peaks and depths.
-"""
+    async def events():
+        if analysis is None:
+            yield sse("error", {"detail": "No data in range"})
+            return
+        stats, depth_from, depth_to = analysis["stats"], analysis["depth_from"], analysis["depth_to"]
+        yield sse("start", {"depth_from": depth_from, "depth_to": depth_to, "curves": analysis["curves"],
+                            "model": MODEL_LABEL, "stats": stats, "ratios": analysis["ratios"],
+                            "cached": cached is not None})
+        if cached is not None:
+            yield sse("delta", {"text": cached["interpretation"]})
+            yield sse("done", cached)
+            return
 
-            response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[
-                    {"role": "system", "content": "You are a professional geologist interpreting well log data."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1500,
-                temperature=0.0
-            )
-            interpretation_text = response.choices[0].message.content
+        text, saved, prompt_hash = "", None, None
+        try:
+            if not configured():
+                text = NO_KEY_TEXT
+                yield sse("delta", {"text": text})
+            else:
+                async for delta in stream_completion(analysis["messages"], MAX_TOKENS, TEMPERATURE):
+                    text += delta
+                    yield sse("delta", {"text": delta})
+                # Only a complete answer is reused
+                prompt_hash = analysis["prompt_hash"]
         except Exception as e:
             print(f"❌ Groq Interpret Error: {type(e).__name__}: {str(e)}")
-            # Professional Fallback logic
-            avg_gas = stats.get('TOTAL_GAS', {}).get('mean', 0)
-            max_gas = stats.get('TOTAL_GAS', {}).get('max', 0)
-            max_depth = stats.get('TOTAL_GAS', {}).get('max_at', 0)
-            
-            interpretation_text = f"### Technical Interpretation Summary\n\n"
-            interpretation_text += f"Analysis of the interval **{depth_from}–{depth_to} ft** indicates "
-            if avg_gas > 500:
-                interpretation_text += f"a high-potential hydrocarbon zone. A peak of **{max_gas} units** was detected at **{max_depth} ft**, "
-                interpretation_text += "suggesting a significant gas entry or reservoir intersection. "
+            if not text:
+                text = fallback_interpretation(stats, depth_from, depth_to)
+                yield sse("delta", {"text": text})
             else:
-                interpretation_text += "stable background conditions with no major anomalies detected. "
-            
-            interpretation_text += "\n\n*Note: Advanced AI analysis encountered a connectivity issue. Providing rules-based summary.*"
-
-    interpretation = Interpretation(
-        well_id=well_id,
-        depth_from=depth_from,
-        depth_to=depth_to,
-        curves_analyzed=",".join(curves),
-        interpretation=interpretation_text
-    )
-    db.add(interpretation)
-    db.commit()
-    db.refresh(interpretation)
-    db.close()
-    
-    return {
-        "id": interpretation.id,
-        "depth_from": depth_from,
-        "depth_to": depth_to,
-        "curves": curves,
-        "interpretation": interpretation_text,
-        "model": "Groq Llama-3.3-70b",
-        "stats": stats,
-        "ratios": ratios,
-        "created_at": interpretation.created_at.isoformat()
-    }
+                yield sse("error", {"detail": str(e)})
+        finally:
+            # Shielded: a disconnect cancels the stream, the text produced so far is still kept
+            with anyio.CancelScope(shield=True):
+                async with AsyncSessionLocal() as session:
+                    saved = await save_interpretation(session, analysis, text, prompt_hash)
+        yield sse("done", saved)
+
+    return sse_response(events())
 
 @router.get("/wells/{well_id}/interpretations")
-def get_interpretations(well_id: int):
+async def get_interpretations(well_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get past interpretations"""
-    db = SessionLocal()
-    interpretations = db.query(Interpretation).filter(Interpretation.well_id == well_id).order_by(Interpretation.created_at.desc()).all()
-    db.close()
+    interpretations = (await db.execute(
+        select(Interpretation).where(Interpretation.well_id == well_id).order_by(Interpretation.created_at.desc())
+    )).scalars().all()
     
     return {
         "interpretations": [
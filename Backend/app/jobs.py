@@ -0,0 +1,115 @@
+import os
+import time
+import threading
+import multiprocessing
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from .models import IngestJob
+from .ingest import ingest_stream, ingest_summary, iter_chunks, find_ingested, link_duplicate
+from .storage import UPLOAD_DIR
+
+# Uploads are spooled here, then ingested by a worker process
+INCOMING_DIR = UPLOAD_DIR / "incoming"
+INCOMING_DIR.mkdir(parents=True, exist_ok=True)
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PROGRESS_INTERVAL = 0.5  # seconds between row-count updates on the job
+
+STAGES = ["queued", "parsing", "loading", "storing", "summarizing", "done", "failed"]
+FINISHED = ("done", "failed")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor() -> ProcessPoolExecutor:
+    """Process pool shared by all uploads; spawned, so workers build their own engine"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=INGEST_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+def spool_path(job_id: int) -> Path:
+    return INCOMING_DIR / f"{job_id}.las"
+
+def update_job(db: Session, job_id: int, **fields):
+    db.query(IngestJob).filter(IngestJob.id == job_id).update({**fields, "updated_at": datetime.utcnow()})
+    db.commit()
+
+def run_job(job_id: int, filename: str, content_hash: str = None):
+    """Worker entry point: parse -> store -> bulk load -> stats/pyramid, recording progress.
+
+    A file already ingested (same content_hash) is linked to the existing data instead.
+    """
+    path = spool_path(job_id)
+    db = SessionLocal()
+    status_db = SessionLocal()  # job updates commit independently of the ingest
+    last = {"stage": None, "at": 0.0}
+
+    def progress(stage: str, rows: int):
+        now = time.perf_counter()
+        if stage == last["stage"] and now - last["at"] < PROGRESS_INTERVAL:
+            return
+        last.update(stage=stage, at=now)
+        update_job(status_db, job_id, stage=stage, rows=rows)
+
+    try:
+        update_job(status_db, job_id, stage="parsing", started_at=datetime.utcnow())
+        source = find_ingested(db, content_hash) if content_hash else None
+        with open(path, "rb") as f:
+            if source is not None:
+                result = link_duplicate(db, iter_chunks(f), filename, source)
+            else:
+                result = ingest_stream(db, iter_chunks(f), filename, progress, content_hash)
+        update_job(status_db, job_id, stage="done", rows=result["ingest"]["rows"], well_id=result["well"].id,
+                   result=ingest_summary(result), finished_at=datetime.utcnow())
+    except Exception as e:
+        print(f"❌ Ingest job {job_id} failed: {type(e).__name__}: {str(e)}")
+        status_db.rollback()
+        update_job(status_db, job_id, stage="failed", error=str(e), finished_at=datetime.utcnow())
+    finally:
+        db.close()
+        status_db.close()
+        path.unlink(missing_ok=True)
+
+def _fail_if_lost(job_id: int):
+    def callback(future):
+        # run_job records its own failures; this catches a crashed/killed worker
+        if future.exception() is None:
+            return
+        db = SessionLocal()
+        try:
+            update_job(db, job_id, stage="failed", error=f"Worker failed: {future.exception()}",
+                       finished_at=datetime.utcnow())
+        finally:
+            db.close()
+        spool_path(job_id).unlink(missing_ok=True)
+    return callback
+
+def submit_job(job_id: int, filename: str, content_hash: str = None):
+    """Queue an ingest for a spooled upload"""
+    future = get_executor().submit(run_job, job_id, filename, content_hash)
+    future.add_done_callback(_fail_if_lost(job_id))
+
+def job_status(job: IngestJob) -> dict:
+    """Stage, rows processed and throughput so far"""
+    elapsed = None
+    if job.started_at:
+        elapsed = ((job.finished_at or job.updated_at or job.started_at) - job.started_at).total_seconds()
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "stage": job.stage,
+        "finished": job.stage in FINISHED,
+        "rows": job.rows or 0,
+        "seconds": round(elapsed, 3) if elapsed is not None else None,
+        "rows_per_sec": round((job.rows or 0) / elapsed) if elapsed else None,
+        "well_id": job.well_id,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None
+    }
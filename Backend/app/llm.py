@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import httpx
+from groq import AsyncGroq, APIConnectionError, APIStatusError, APITimeoutError, DefaultAsyncHttpxClient
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+MODEL = "llama-3.3-70b-versatile"
+
+# ===== GATEWAY SETTINGS =====
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # model calls in flight per process
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))  # seconds to wait for a free slot
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))  # deadline per attempt (to the first token when streaming)
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_RETRY_BASE = float(os.getenv("LLM_RETRY_BASE", "0.5"))  # seconds, doubled after every failed attempt
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))  # failed calls in a row that open the breaker
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))  # seconds open before a trial call
+
+class LLMUnavailable(Exception):
+    """No model call was made (no API key, breaker open, or no free slot); callers answer with their fallback"""
+
+def _retryable(e: Exception) -> bool:
+    """Provider trouble: rate limits, 5xx, timeouts and connection errors"""
+    if isinstance(e, APIStatusError):
+        return e.status_code == 429 or e.status_code >= 500
+    # asyncio.TimeoutError is what wait_for raises before Python 3.11 (the builtin TimeoutError since)
+    return isinstance(e, (APIConnectionError, APITimeoutError, asyncio.TimeoutError, httpx.TransportError))
+
+def _retry_delay(e: Exception, attempt: int) -> float:
+    delay = LLM_RETRY_BASE * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+    if isinstance(e, APIStatusError) and e.status_code == 429:
+        # Rate limited: wait as long as the provider asks, within one deadline
+        try:
+            delay = max(delay, min(float(e.response.headers.get("retry-after", 0)), LLM_TIMEOUT))
+        except ValueError:
+            pass
+    return delay
+
+# ===== CIRCUIT BREAKER =====
+
+class CircuitBreaker:
+    """Stops calling a provider that keeps failing.
+
+    Closed: calls go through. After `failures` failed calls in a row it opens
+    and calls are refused at once (callers fall back without waiting for
+    timeouts). After `reset` seconds a single trial call is let through
+    (half-open); its success closes the breaker, its failure reopens it.
+    """
+
+    def __init__(self, failures: int, reset: float):
+        self.failures = failures
+        self.reset = reset
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.reset:
+                return False
+            self._trial = True
+            return True
+
+    def success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                print("INFO: LLM circuit breaker closed")
+            self._consecutive, self._opened_at, self._trial = 0, None, False
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._trial or (self._opened_at is None and self._consecutive >= self.failures):
+                print(f"WARNING: LLM circuit breaker open for {self.reset:.0f}s after {self._consecutive} failed calls")
+                self._opened_at, self._trial = time.monotonic(), False
+
+    def abandon(self):
+        """A trial call ended without an outcome (e.g. the client left); let another one through"""
+        with self._lock:
+            self._trial = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if self._trial or time.monotonic() - self._opened_at >= self.reset else "open"
+
+breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET)
+
+# ===== CLIENT POOL =====
+# One client (one keep-alive connection pool) and one concurrency semaphore per
+# event loop; httpx pools can't be shared across loops. Rebuilt if the key or
+# endpoint changes.
+_loops = weakref.WeakKeyDictionary()  # event loop -> (settings, AsyncGroq, Semaphore)
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "succeeded": 0, "failed": 0, "retries": 0, "timeouts": 0, "rejected_open": 0,
+          "rejected_busy": 0, "in_flight": 0}
+
+def _count(stat: str, n: int = 1):
+    with _stats_lock:
+        _stats[stat] += n
+
+def configured() -> bool:
+    return bool(os.getenv("API_KEY"))
+
+def _loop_state() -> tuple:
+    loop = asyncio.get_running_loop()
+    settings = (os.getenv("API_KEY", "").strip(), os.getenv("GROQ_BASE_URL"), LLM_MAX_CONCURRENCY)
+    state = _loops.get(loop)
+    if state is None or state[0] != settings:
+        if state is not None:
+            loop.create_task(state[1].close())
+        limits = httpx.Limits(max_connections=LLM_MAX_CONCURRENCY, max_keepalive_connections=LLM_MAX_CONCURRENCY,
+                              keepalive_expiry=60)
+        # Retries are ours (they feed the breaker); the SDK's own are off
+        client = AsyncGroq(api_key=settings[0], max_retries=0,
+                           timeout=httpx.Timeout(LLM_TIMEOUT, connect=min(LLM_TIMEOUT, 10)),
+                           http_client=DefaultAsyncHttpxClient(limits=limits))
+        state = _loops[loop] = (settings, client, asyncio.Semaphore(LLM_MAX_CONCURRENCY))
+    return state[1], state[2]
+
+@asynccontextmanager
+async def _slot():
+    """Breaker check and a concurrency slot around one logical model call"""
+    if not configured():
+        raise LLMUnavailable("API key not configured")
+    client, semaphore = _loop_state()
+    _count("calls")
+    if not breaker.allow():
+        _count("rejected_open")
+        raise LLMUnavailable("LLM provider unavailable (circuit breaker open)")
+    try:
+        await asyncio.wait_for(semaphore.acquire(), LLM_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        breaker.abandon()
+        _count("rejected_busy")
+        raise LLMUnavailable(f"LLM busy: {LLM_MAX_CONCURRENCY} calls in flight")
+    _count("in_flight")
+    try:
+        yield client
+    finally:
+        _count("in_flight", -1)
+        semaphore.release()
+
+def _failed(e: Exception):
+    """Record a call that gave up; only provider trouble counts towards the breaker"""
+    _count("failed")
+    if isinstance(e, (asyncio.TimeoutError, APITimeoutError)):
+        _count("timeouts")
+    if _retryable(e):
+        breaker.failure()
+    else:
+        breaker.success()  # the provider answered, the request itself was bad
+
+async def complete(messages: list, max_tokens: int, temperature: float) -> str:
+    """Text of a chat completion, through the gateway (raises LLMUnavailable or the last API error)"""
+    async with _slot() as client:
+        outcome = False
+        try:
+            for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+                try:
+                    response = await asyncio.wait_for(client.chat.completions.create(
+                        model=MODEL, messages=messages, max_tokens=max_tokens, temperature=temperature
+                    ), LLM_TIMEOUT)
+                    breaker.success()
+                    _count("succeeded")
+                    outcome = True
+                    return response.choices[0].message.content
+                except Exception as e:
+                    if attempt == LLM_MAX_ATTEMPTS or not _retryable(e):
+                        _failed(e)
+                        outcome = True
+                        raise
+                    delay = _retry_delay(e, attempt)
+                    _count("retries")
+                    print(f"WARNING: LLM call failed ({type(e).__name__}); retry {attempt}/{LLM_MAX_ATTEMPTS - 1} in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+        finally:
+            if not outcome:
+                breaker.abandon()
+
+async def stream_completion(messages: list, max_tokens: int, temperature: float) -> AsyncIterator[str]:
+    """Text deltas of a chat completion as they arrive, through the gateway.
+
+    The deadline covers the wait for the first token; attempts are retried
+    only until a token has been passed on.
+    """
+    async with _slot() as client:
+        outcome = False
+        try:
+            for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+                produced = False
+                try:
+                    deadline = asyncio.get_running_loop().time() + LLM_TIMEOUT
+                    stream = await asyncio.wait_for(client.chat.completions.create(
+                        model=MODEL, messages=messages, max_tokens=max_tokens, temperature=temperature, stream=True
+                    ), LLM_TIMEOUT)
+                    async with stream:
+                        chunks = stream.__aiter__()
+                        while True:
+                            try:
+                                if produced:
+                                    chunk = await chunks.__anext__()
+                                else:
+                                    remaining = max(deadline - asyncio.get_running_loop().time(), 0)
+                                    chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                            except StopAsyncIteration:
+                                break
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                if not produced:
+                                    produced = True
+                                    breaker.success()
+                                yield chunk.choices[0].delta.content
+                    _count("succeeded")
+                    breaker.success()
+                    outcome = True
+                    return
+                except Exception as e:
+                    if produced or attempt == LLM_MAX_ATTEMPTS or not _retryable(e):
+                        _failed(e)
+                        outcome = True
+                        raise
+                    delay = _retry_delay(e, attempt)
+                    _count("retries")
+                    print(f"WARNING: LLM stream failed ({type(e).__name__}); retry {attempt}/{LLM_MAX_ATTEMPTS - 1} in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+        finally:
+            if not outcome:
+                breaker.abandon()
+
+def metrics() -> dict:
+    """Call counters (this process), calls in flight and the breaker state"""
+    with _stats_lock:
+        stats = dict(_stats)
+    return {**stats, "max_concurrency": LLM_MAX_CONCURRENCY, "breaker": breaker.state}
+
+# ===== STREAMING (server-sent events) =====
+# Streams send "start" (context computed before the model runs), "delta"
+# ({"text": ...} per token batch as the model produces it), then "done" with
+# the persisted result, or "error" ({"detail": ...}) if it broke off.
+
+def sse(event: str, data) -> bytes:
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+def sse_response(events: AsyncIterator[bytes], background: BackgroundTask = None) -> StreamingResponse:
+    # no-transform / X-Accel-Buffering: proxies must pass tokens on as they come
+    return StreamingResponse(events, media_type="text/event-stream", background=background,
+                             headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"})
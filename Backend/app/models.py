@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Text, LargeBinary, Index, DDL, event
 from datetime import datetime
 from .database import Base
 
@@ -19,8 +19,27 @@ class Well(Base):
     null_value = Column(Float)
     row_count = Column(Integer)
     s3_key = Column(String, nullable=True)
+    content_hash = Column(String, nullable=True)  # SHA-256 of the uploaded file
+    # Re-uploads of identical content read the tiles stored under this well (see columnar.data_well_id)
+    data_well_id = Column(Integer, ForeignKey("wells.id"), nullable=True)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
 
+    # Server-side filters of the well listing; display names are unique (see ingest.resolve_display_name)
+    __table_args__ = (
+        Index("ux_wells_well_name", "well_name", unique=True),
+        Index("ix_wells_company", "company"),
+        Index("ix_wells_field", "field"),
+        Index("ix_wells_country", "country"),
+        Index("ix_wells_content_hash", "content_hash"),
+        Index("ix_wells_data_well_id", "data_well_id"),
+    )
+
+# ===== WELL NAME COUNTERS TABLE (copy numbers handed out per base name) =====
+class WellNameCounter(Base):
+    __tablename__ = "well_name_counters"
+    base_name = Column(String, primary_key=True)
+    copies = Column(Integer, nullable=False)  # last "(Copy N)" handed out; 0 = the base name itself
+
 # ===== WELL CURVES TABLE =====
 class WellCurve(Base):
     __tablename__ = "well_curves"
@@ -29,6 +48,8 @@ class WellCurve(Base):
     curve_name = Column(String)
     unit = Column(String)
 
+    __table_args__ = (Index("ix_well_curves_well_id", "well_id"),)
+
 # ===== WELL DATA TABLE =====
 class WellData(Base):
     __tablename__ = "well_data"
@@ -37,6 +58,82 @@ class WellData(Base):
     depth = Column(Float)
     curve_values = Column(JSON)  # {"HC1": 23.5, "HC2": 12.3, ...}
 
+    __table_args__ = (Index("ix_well_data_well_depth", "well_id", "depth"),)
+
+# ===== CURVE CHUNKS TABLE (columnar storage) =====
+class CurveChunk(Base):
+    __tablename__ = "curve_chunks"
+    id = Column(Integer, primary_key=True)
+    well_id = Column(Integer, ForeignKey("wells.id", ondelete="CASCADE"))
+    curve_name = Column(String)  # "__depth__" holds the depth index
+    chunk_index = Column(Integer)  # rows chunk_index * CHUNK_ROWS onwards
+    row_count = Column(Integer)
+    data = Column(LargeBinary)  # little-endian float64 values
+
+    __table_args__ = (
+        Index("ix_curve_chunks_well_curve_chunk", "well_id", "curve_name", "chunk_index", unique=True),
+    )
+
+# ===== CURVE PYRAMID TABLE (min/max level-of-detail tiles) =====
+class CurvePyramid(Base):
+    __tablename__ = "curve_pyramid"
+    id = Column(Integer, primary_key=True)
+    well_id = Column(Integer, ForeignKey("wells.id", ondelete="CASCADE"))
+    curve_name = Column(String)  # "__depth__" holds the level's depths
+    level = Column(Integer)  # 1.. ; bucket size is pyramid.LEVEL_FACTORS[level]
+    chunk_index = Column(Integer)  # same tiling as curve_chunks
+    data = Column(LargeBinary)  # little-endian float64 (min, max) pairs
+
+    __table_args__ = (
+        Index("ix_curve_pyramid_well_curve_level_chunk", "well_id", "curve_name", "level", "chunk_index", unique=True),
+    )
+
+# Float arrays barely compress; skipping pglz makes COPY of the blobs several times faster
+for _table in (CurveChunk.__table__, CurvePyramid.__table__):
+    event.listen(_table, "after_create", DDL(
+        f"ALTER TABLE {_table.name} ALTER COLUMN data SET STORAGE EXTERNAL"
+    ).execute_if(dialect="postgresql"))
+
+# ===== CURVE TILE STATS TABLE (mergeable per-tile aggregates) =====
+class CurveTileStats(Base):
+    __tablename__ = "curve_tile_stats"
+    id = Column(Integer, primary_key=True)
+    well_id = Column(Integer, ForeignKey("wells.id", ondelete="CASCADE"))
+    curve_name = Column(String)
+    chunk_index = Column(Integer)  # same tiling as curve_chunks
+    count = Column(Integer)  # valid (non-NULL) samples
+    mean = Column(Float)
+    m2 = Column(Float)  # sum of squared deviations from the mean
+    min = Column(Float)
+    max = Column(Float)
+    max_depth = Column(Float)  # depth of the first sample equal to max
+
+    __table_args__ = (
+        Index("ix_curve_tile_stats_well_curve_chunk", "well_id", "curve_name", "chunk_index", unique=True),
+    )
+
+# ===== WELL SUMMARY TABLE (chat grounding, built once at ingest) =====
+class WellSummary(Base):
+    __tablename__ = "well_summaries"
+    well_id = Column(Integer, ForeignKey("wells.id", ondelete="CASCADE"), primary_key=True)
+    summary = Column(JSON)  # {"TOTAL_GAS": {"avg", "max", "peak_at", "anomalies": [...]}, ...}
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# ===== INGEST JOB TABLE (background uploads, see jobs.py) =====
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+    id = Column(Integer, primary_key=True)
+    filename = Column(String)
+    stage = Column(String, default="queued")  # one of jobs.STAGES
+    rows = Column(Integer, default=0)  # rows stored so far
+    well_id = Column(Integer, ForeignKey("wells.id", ondelete="SET NULL"), nullable=True)
+    result = Column(JSON, nullable=True)  # upload summary once done
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
 # ===== INTERPRETATION TABLE =====
 class Interpretation(Base):
     __tablename__ = "interpretations"
@@ -46,8 +143,15 @@ class Interpretation(Base):
     depth_to = Column(Float)
     curves_analyzed = Column(String)
     interpretation = Column(Text)
+    # Fingerprint of the model request (interpret.prompt_fingerprint), set on model
+    # output only; requests with the same fingerprint reuse the text
+    prompt_hash = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_interpretations_prompt_hash", "prompt_hash"),
+    )
+
 # ===== CHAT MESSAGE TABLE =====
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
@@ -55,4 +159,16 @@ class ChatMessage(Base):
     well_id = Column(Integer, ForeignKey("wells.id", ondelete="CASCADE"))
     role = Column(String)  # "user" or "assistant"
     content = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_chat_messages_well_created", "well_id", "created_at"),
+    )
+
+# ===== CHAT SUMMARY TABLE (rolling summary of older chat turns, see chatcontext.py) =====
+class ChatSummary(Base):
+    __tablename__ = "chat_summaries"
+    well_id = Column(Integer, ForeignKey("wells.id", ondelete="CASCADE"), primary_key=True)
+    summary = Column(Text)
+    through_id = Column(Integer)  # last chat_messages.id folded into the summary
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,146 +1,241 @@
+import io
 import re
+import numpy as np
+from typing import Iterable, Iterator
 
-def parse_las_file(content: bytes) -> dict:
+# Matches the start of the ~A (ASCII data) section header line
+DATA_SECTION_RE = re.compile(rb'(?im)^[ \t]*~A[^\n]*(\n|$)')
+
+def decode_text(content: bytes) -> str:
     try:
-        lines = content.decode('utf-8', errors='ignore').split('\n')
+        return content.decode('utf-8', errors='ignore')
     except:
-        lines = content.decode('latin-1', errors='ignore').split('\n')
-    
-    # Initialize
+        return content.decode('latin-1', errors='ignore')
+
+def parse_header_line(line: str, section: str, well_info: dict, curves_list: list):
+    """Parse one ~V/~W/~C header line into well_info or curves_list"""
+    # ===== PARSE WELL INFO =====
+    # Format: STRT.F          8665.00:  START DEPTH
+    if section != 'C' and '.' in line:
+        try:
+            parts = line.split('.')
+            if len(parts) >= 2:
+                key = parts[0].strip()
+
+                # Extract value (between . and :)
+                rest = '.'.join(parts[1:])
+                if ':' in rest:
+                    value_part = rest.split(':')[0].strip()
+                else:
+                    value_part = rest.strip()
+
+                # Extract numeric value using regex
+                value = None
+                # Regex to find float or integer, possibly negative
+                match = re.search(r'[-+]?\d*\.\d+|[-+]?\d+', value_part)
+                if match:
+                    try:
+                        value = float(match.group())
+                    except ValueError:
+                        pass
+
+                # Store known fields
+                if key == 'STRT':
+                    well_info['start_depth'] = value
+                elif key == 'STOP':
+                    well_info['stop_depth'] = value
+                elif key == 'STEP':
+                    well_info['step'] = value
+                elif key == 'NULL':
+                    well_info['null_value'] = value
+                elif key == 'WELL':
+                    well_info['well_name'] = value_part if value is None else str(value_part) # Keep string for names
+                elif key == 'COMP':
+                    well_info['company'] = value_part
+                elif key == 'FLD':
+                    well_info['field'] = value_part
+                elif key == 'LOC':
+                    well_info['location'] = value_part
+                elif key == 'CTRY':
+                    well_info['country'] = value_part
+                elif key == 'DATE':
+                    well_info['date_analysed'] = value_part
+        except Exception as e:
+            pass
+
+    # ===== PARSE CURVES =====
+    # Format: Depth          .F      :  Track #   0
+    if section == 'C' and '.' in line:
+        try:
+            parts = line.split('.')
+            if parts:
+                curve_name = parts[0].strip().upper()
+
+                # Skip header line and empty names
+                if curve_name and curve_name not in ['MNEM', '#', '']:
+                    # Handle Duplicate Column Names (e.g. ROP duplicate)
+                    unique_name = curve_name
+                    counter = 1
+                    while unique_name in curves_list:
+                        unique_name = f"{curve_name}_{counter}"
+                        counter += 1
+
+                    curves_list.append(unique_name)
+        except Exception as e:
+            pass
+
+def parse_header(text: str) -> dict:
+    """Parse everything before the ~A section (version, well and curve blocks)"""
     well_info = {}
     curves_list = []
-    in_curve_section = False
-    in_data_section = False
-    data_rows = []
-    
-    for line in lines:
-        original_line = line
+    section = None
+
+    for line in text.split('\n'):
         line = line.strip()
-        
+
         # Skip empty lines and comments
         if not line or line.startswith('#'):
             continue
-        
+
         # ===== DETECT SECTIONS (case-insensitive) =====
-        line_upper = line.upper()
-        
-        if line_upper.startswith('~V'):  # ~Version
-            in_curve_section = False
-            in_data_section = False
-            continue
-        elif line_upper.startswith('~W'):  # ~Well
-            in_curve_section = False
-            in_data_section = False
+        if line.startswith('~'):
+            section = line[1:2].upper()  # V, W, C, P, O ...
             continue
-        elif line_upper.startswith('~C'):  # ~Curve
-            in_curve_section = True
-            in_data_section = False
-            continue
-        elif line_upper.startswith('~A'):  # ~ASCII or ~A
-            in_curve_section = False
-            in_data_section = True
-            continue
-        
-        # ===== PARSE WELL INFO =====
-        # Format: STRT.F          8665.00:  START DEPTH
-        if not in_curve_section and not in_data_section and '.' in line:
-            try:
-                parts = line.split('.')
-                if len(parts) >= 2:
-                    key = parts[0].strip()
-                    
-                    # Extract value (between . and :)
-                    rest = '.'.join(parts[1:])
-                    if ':' in rest:
-                        value_part = rest.split(':')[0].strip()
-                    else:
-                        value_part = rest.strip()
-                    
-                    # Extract numeric value using regex
-                    value = None
-                    # Regex to find float or integer, possibly negative
-                    match = re.search(r'[-+]?\d*\.\d+|[-+]?\d+', value_part)
-                    if match:
-                        try:
-                            value = float(match.group())
-                        except ValueError:
-                            pass
-                    
-                    # Store known fields
-                    if key == 'STRT':
-                        well_info['start_depth'] = value
-                    elif key == 'STOP':
-                        well_info['stop_depth'] = value
-                    elif key == 'STEP':
-                        well_info['step'] = value
-                    elif key == 'NULL':
-                        well_info['null_value'] = value
-                    elif key == 'WELL':
-                        well_info['well_name'] = value_part if value is None else str(value_part) # Keep string for names
-                    elif key == 'COMP':
-                        well_info['company'] = value_part
-                    elif key == 'FLD':
-                        well_info['field'] = value_part
-                    elif key == 'LOC':
-                        well_info['location'] = value_part
-                    elif key == 'CTRY':
-                        well_info['country'] = value_part
-                    elif key == 'DATE':
-                        well_info['date_analysed'] = value_part
-            except Exception as e:
-                pass
-        
-        # ===== PARSE CURVES =====
-        # Format: Depth          .F      :  Track #   0
-        if in_curve_section and '.' in line:
-            try:
-                parts = line.split('.')
-                if parts:
-                    curve_name = parts[0].strip().upper()
-                    
-                    # Skip header line and empty names
-                    if curve_name and curve_name not in ['MNEM', '#', '']:
-                        # Handle Duplicate Column Names (e.g. ROP duplicate)
-                        unique_name = curve_name
-                        counter = 1
-                        while unique_name in curves_list:
-                            unique_name = f"{curve_name}_{counter}"
-                            counter += 1
-                        
-                        curves_list.append(unique_name)
-            except Exception as e:
-                pass
-        
-        # ===== PARSE DATA =====
-        if in_data_section and line and not line.startswith('#'):
-            try:
-                # Split by whitespace and convert to floats
-                values = []
-                for val in line.split():
-                    try:
-                        values.append(float(val))
-                    except ValueError:
-                        # Skip non-numeric values
-                        pass
-                
-                if values:  # Only add non-empty rows
-                    data_rows.append(values)
-            except Exception as e:
-                pass
-    
+
+        parse_header_line(line, section, well_info, curves_list)
+
     # Fill in defaults if not found
     if 'well_name' not in well_info:
         well_info['well_name'] = 'Unknown'
-    
-    # Clean up string fields to remove comments or trailing colons if regex failed to catch only value
-    for k in ['well_name', 'company', 'field', 'location', 'country', 'date_analysed']:
-        if k in well_info and isinstance(well_info[k], str):
-            # Sometimes value is like "CLIENT COMPANY : CLIENT"
-            # We already split by ':', but sometimes there are extra descriptions
-            pass
 
-    well_info['row_count'] = len(data_rows)
     well_info['curves'] = curves_list
-    well_info['data'] = data_rows
-    
     return well_info
+
+def parse_data_lines(text: str) -> list:
+    """Line-by-line fallback for irregular ~A sections (ragged rows, stray tokens)"""
+    data_rows = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        # Split by whitespace and convert to floats
+        values = []
+        for val in line.split():
+            try:
+                values.append(float(val))
+            except ValueError:
+                # Skip non-numeric values
+                pass
+
+        if values:  # Only add non-empty rows
+            data_rows.append(values)
+    return data_rows
+
+def rows_to_array(data_rows: list, ncols: int = 0) -> np.ndarray:
+    """Pack ragged row lists into a 2-D float64 array, padding short rows with NaN.
+
+    With ncols set, extra trailing values are dropped (they map to no curve).
+    """
+    width = ncols or max([0] + [len(r) for r in data_rows])
+    data = np.full((len(data_rows), width), np.nan)
+    for i, row in enumerate(data_rows):
+        row = row[:width]
+        data[i, :len(row)] = row
+    return data
+
+def parse_data_block(block: bytes, ncols: int) -> np.ndarray:
+    """Load a chunk of ~A rows into a contiguous (rows, ncols) float64 array.
+
+    Regular blocks go through NumPy's C tokenizer in one pass; anything it
+    rejects falls back to the tolerant line-by-line parser.
+    """
+    if not block.strip():
+        return np.empty((0, ncols))
+    try:
+        data = np.loadtxt(io.BytesIO(block), dtype=np.float64, comments='#', ndmin=2)
+        if ncols and data.shape[1] != ncols:
+            raise ValueError(f"expected {ncols} columns, got {data.shape[1]}")
+        return data
+    except ValueError:
+        return rows_to_array(parse_data_lines(decode_text(block)), ncols)
+
+def split_las(content: bytes):
+    """Split raw LAS bytes into (header bytes, ~A data bytes)"""
+    match = DATA_SECTION_RE.search(content)
+    if not match:
+        return content, b''
+    return content[:match.start()], content[match.end():]
+
+def parse_las_file(content: bytes) -> dict:
+    header, block = split_las(content)
+    well_info = parse_header(decode_text(header))
+
+    # ===== PARSE DATA (vectorized) =====
+    data = parse_data_block(block, len(well_info['curves']))
+
+    well_info['row_count'] = len(data)
+    well_info['data'] = data
+
+    return well_info
+
+class LasStream:
+    """Incremental LAS reader over an iterable of byte chunks.
+
+    read_header() consumes chunks only until the ~A line; iter_batches() then
+    yields (batch_rows, ncols) float64 arrays, so at most one chunk plus one
+    batch of rows is held in memory regardless of file size.
+    """
+
+    def __init__(self, chunks: Iterable[bytes], batch_rows: int = 4096):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+        self.batch_rows = batch_rows
+        self.ncols = 0
+        self.row_count = 0
+
+    def read_header(self) -> dict:
+        while True:
+            match = DATA_SECTION_RE.search(self._buffer)
+            # Wait for the full ~A line unless the stream has ended
+            if match and match.group(1):
+                break
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+
+        header, self._buffer = split_las(self._buffer)
+        well_info = parse_header(decode_text(header))
+        self.ncols = len(well_info['curves'])
+        return well_info
+
+    def _iter_blocks(self) -> Iterator[bytes]:
+        """Yield runs of complete data lines, keeping any partial line buffered"""
+        for chunk in self._chunks:
+            self._buffer += chunk
+            cut = self._buffer.rfind(b'\n') + 1
+            if cut:
+                block, self._buffer = self._buffer[:cut], self._buffer[cut:]
+                yield block
+        if self._buffer:
+            block, self._buffer = self._buffer, b''
+            yield block
+
+    def iter_batches(self) -> Iterator[np.ndarray]:
+        carry = None
+        for block in self._iter_blocks():
+            data = parse_data_block(block, self.ncols)
+            if not len(data):
+                continue
+            self.ncols = self.ncols or data.shape[1]
+            carry = data if carry is None else np.concatenate([carry, data])
+
+            while len(carry) >= self.batch_rows:
+                batch, carry = carry[:self.batch_rows], carry[self.batch_rows:]
+                self.row_count += len(batch)
+                yield batch
+
+        if carry is not None and len(carry):
+            self.row_count += len(carry)
+            yield carry
@@ -0,0 +1,51 @@
+import numpy as np
+from .analysis import null_mask
+
+# Rows folded into one min/max bucket at each pyramid level (level 0 is raw).
+# Every factor divides CHUNK_ROWS, so each tile decimates on its own.
+LEVEL_FACTORS = [1, 4, 16, 64, 256, 1024]
+
+def minmax_decimate(depths: np.ndarray, columns: dict, factor: int, null_value: float = None) -> tuple:
+    """Fold every `factor` rows into two points: the bucket's min and max.
+
+    The two extremes are emitted in depth order at the bucket's first and last
+    depth, so spikes survive at any zoom level. Buckets with no valid sample
+    yield NaN. Returns (depths, {curve: values}) of length 2 * ceil(n / factor).
+    """
+    n = len(depths)
+    buckets = -(-n // factor)
+    pad = buckets * factor - n
+
+    starts = np.arange(buckets) * factor
+    ends = np.minimum(starts + factor, n) - 1
+    level_depths = np.empty(buckets * 2)
+    level_depths[0::2] = depths[starts]
+    level_depths[1::2] = depths[ends]
+
+    level_columns = {}
+    for name, values in columns.items():
+        values = np.where(null_mask(values, null_value), np.nan, values)
+        grid = np.concatenate([values, np.full(pad, np.nan)]).reshape(buckets, factor)
+        empty = np.isnan(grid)
+
+        i_min = np.argmin(np.where(empty, np.inf, grid), axis=1)
+        i_max = np.argmax(np.where(empty, -np.inf, grid), axis=1)
+        first = np.minimum(i_min, i_max)
+        second = np.maximum(i_min, i_max)
+
+        rows = np.arange(buckets)
+        out = np.empty(buckets * 2)
+        out[0::2] = grid[rows, first]
+        out[1::2] = grid[rows, second]
+        level_columns[name] = out
+
+    return level_depths, level_columns
+
+def pick_level(rows: int, max_points: int) -> int:
+    """Finest level whose point count for `rows` samples fits in max_points"""
+    if not max_points or rows <= max_points:
+        return 0
+    for level, factor in enumerate(LEVEL_FACTORS[1:], start=1):
+        if 2 * -(-rows // factor) <= max_points:
+            return level
+    return len(LEVEL_FACTORS) - 1
@@ -0,0 +1,65 @@
+import numpy as np
+from .analysis import null_mask
+
+# Mergeable per-tile aggregate, stored as one float64 row in this field order
+# (mean and M2, the sum of squared deviations from it, rather than raw sums:
+# sum(x^2)/n - mean^2 loses the spread of curves with a large offset)
+FIELDS = ("count", "mean", "m2", "min", "max", "max_depth")
+EMPTY = np.array([0.0, 0.0, 0.0, np.inf, -np.inf, np.nan])
+
+def aggregate(depths: np.ndarray, values: np.ndarray, null_value: float = None) -> np.ndarray:
+    """count/mean/M2/min/max/argmax depth of the valid samples"""
+    valid = ~null_mask(values, null_value)
+    vals = values[valid]
+    if not len(vals):
+        return EMPTY.copy()
+    i_max = int(np.argmax(vals))
+    mean = vals.mean()
+    deviations = vals - mean
+    return np.array([
+        len(vals),
+        mean,
+        np.dot(deviations, deviations),
+        vals.min(),
+        vals[i_max],
+        depths[valid][i_max]
+    ])
+
+def merge(aggregates: np.ndarray) -> np.ndarray:
+    """Combine (k, 6) aggregates in depth order into one; ties keep the first peak.
+
+    Means and M2s combine with Chan et al.'s parallel formula (k-way form):
+    M2 = sum(M2_i) + sum(n_i * (mean_i - mean)^2).
+    """
+    aggregates = np.asarray(aggregates).reshape(-1, len(FIELDS))
+    counts = aggregates[:, 0]
+    count = counts.sum()
+    if not count:
+        return EMPTY.copy()
+    mean = np.dot(counts, aggregates[:, 1]) / count
+    offsets = aggregates[:, 1] - mean
+    i_max = int(np.argmax(aggregates[:, 4]))
+    return np.array([
+        count,
+        mean,
+        aggregates[:, 2].sum() + np.dot(counts, offsets * offsets),
+        aggregates[:, 3].min(),
+        aggregates[i_max, 4],
+        aggregates[i_max, 5]
+    ])
+
+def finalize(agg: np.ndarray) -> dict:
+    """Aggregate -> min/max/mean/std (population) dict, or None with no valid sample"""
+    count = int(agg[0])
+    if not count:
+        return None
+    mean = agg[1]
+    variance = agg[2] / count
+    return {
+        "count": count,
+        "min": float(agg[3]),
+        "max": float(agg[4]),
+        "max_at": float(agg[5]),
+        "mean": float(mean),
+        "std": float(variance ** 0.5)
+    }
@@ -1,11 +1,49 @@
 import os
+import re
+import mmap
+import time
+import uuid
+import random
+import hashlib
+import threading
 import boto3
-from botocore.exceptions import ClientError
+from boto3.exceptions import S3UploadFailedError, S3TransferFailedError
+from botocore.exceptions import BotoCoreError, ClientError
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import BinaryIO, Optional
 
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# ===== S3 UPLOAD SETTINGS =====
+S3_PREFIX = "las-files/"
+S3_PART_SIZE = max(int(os.getenv("S3_PART_SIZE_MB", "8")), 5) * 1024 * 1024  # S3 parts are at least 5 MB
+S3_UPLOAD_THREADS = int(os.getenv("S3_UPLOAD_THREADS", "4"))  # parts in flight per upload
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", "5"))
+S3_RETRY_BASE = float(os.getenv("S3_RETRY_BASE", "0.5"))  # seconds, doubled after every failed attempt
+LOCAL_CACHE_MB = int(os.getenv("LOCAL_CACHE_MB", "2048"))  # cap on uploads/ when S3 holds the files; 0 = no cap
+RETRYABLE_CODES = {"RequestTimeout", "RequestTimeoutException", "SlowDown", "Throttling",
+                   "ThrottlingException", "InternalError", "ServiceUnavailable"}
+
+def _retryable(e: Exception) -> bool:
+    if isinstance(e, ClientError):
+        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return status >= 500 or e.response.get("Error", {}).get("Code") in RETRYABLE_CODES
+    return True  # connection / timeout errors from botocore
+
+def with_retries(action: str, fn, *args, **kwargs):
+    """Run an S3 call, retrying transient failures with exponential backoff and jitter"""
+    for attempt in range(1, S3_MAX_ATTEMPTS + 1):
+        try:
+            return fn(*args, **kwargs)
+        except (ClientError, BotoCoreError) as e:
+            if attempt == S3_MAX_ATTEMPTS or not _retryable(e):
+                raise
+            delay = S3_RETRY_BASE * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            print(f"WARNING: {action} failed ({e}); retry {attempt}/{S3_MAX_ATTEMPTS - 1} in {delay:.2f}s")
+            time.sleep(delay)
+
 class StorageService:
     def __init__(self):
         self.s3_enabled = False
@@ -29,35 +67,365 @@ class StorageService:
         else:
             print("INFO: S3 credentials not found. Using local storage only.")
 
-    def store_file(self, filename: str, content: bytes) -> dict:
-        """Stores file locally and attempts S3 upload if configured"""
-        
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.cache = LocalFileCache(self, UPLOAD_DIR, LOCAL_CACHE_MB * 1024 * 1024)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Threads sending multipart parts, shared by all uploads of this process"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=S3_UPLOAD_THREADS, thread_name_prefix="s3-part")
+            return self._executor
+
+    def store_file(self, filename: str, content: bytes, content_hash: str = None) -> dict:
+        """Stores file locally and attempts S3 upload if configured (content-addressed)"""
+        writer = self.open_writer(filename, content_hash)
+        view = memoryview(content)
+        for start in range(0, len(view), S3_PART_SIZE):
+            writer.write(view[start:start + S3_PART_SIZE])
+        return writer.close()
+
+    def open_writer(self, filename: str, content_hash: str = None) -> "UploadWriter":
+        """Start a streamed store: write chunks locally, push to S3 on close.
+
+        content_hash: the file's SHA-256 if the caller already knows it, so a
+        file already in S3 is not streamed there again.
+        """
+        return UploadWriter(self, filename, content_hash)
+
+    def s3_exists(self, key: str) -> bool:
+        try:
+            with_retries(f"HeadObject {key}", self.s3_client.head_object, Bucket=self.bucket_name, Key=key)
+            return True
+        except ClientError:
+            return False
+
+class MultipartUpload:
+    """S3 multipart upload fed part by part while the file is still being written.
+
+    Parts go out on the service's thread pool; at most S3_UPLOAD_THREADS of them
+    are in flight (and held in memory), so a slow S3 applies back-pressure.
+    """
+
+    def __init__(self, service: StorageService, key: str):
+        self.service = service
+        self.key = key
+        self.upload_id = with_retries(f"CreateMultipartUpload {key}", service.s3_client.create_multipart_upload,
+                                      Bucket=service.bucket_name, Key=key)["UploadId"]
+        self.futures = []
+        self._slots = threading.BoundedSemaphore(S3_UPLOAD_THREADS)
+
+    def send(self, body: bytes):
+        # Surface a failed part now instead of streaming the rest of the file for nothing
+        for future in self.futures:
+            if future.done() and future.exception():
+                raise future.exception()
+        self._slots.acquire()
+        future = self.service.executor.submit(self._upload_part, len(self.futures) + 1, body)
+        future.add_done_callback(lambda f: self._slots.release())
+        self.futures.append(future)
+
+    def _upload_part(self, number: int, body: bytes) -> dict:
+        response = with_retries(f"UploadPart {number} of {self.key}", self.service.s3_client.upload_part,
+                                Bucket=self.service.bucket_name, Key=self.key, UploadId=self.upload_id,
+                                PartNumber=number, Body=body)
+        return {"PartNumber": number, "ETag": response["ETag"]}
+
+    def complete(self):
+        parts = [future.result() for future in self.futures]
+        with_retries(f"CompleteMultipartUpload {self.key}", self.service.s3_client.complete_multipart_upload,
+                     Bucket=self.service.bucket_name, Key=self.key, UploadId=self.upload_id,
+                     MultipartUpload={"Parts": parts})
+
+    def abort(self):
+        for future in self.futures:
+            future.cancel()
+        for future in self.futures:
+            if not future.cancelled():
+                future.exception()  # wait; a part still running would otherwise outlive the abort
+        try:
+            self.service.s3_client.abort_multipart_upload(Bucket=self.service.bucket_name, Key=self.key,
+                                                          UploadId=self.upload_id)
+        except (ClientError, BotoCoreError) as e:
+            print(f"WARNING: Could not abort multipart upload of {self.key}: {e}")
+
+def content_path(content_hash: str) -> Path:
+    return UPLOAD_DIR / f"{content_hash}.las"
+
+def file_ref(content_hash: Optional[str], filename: str, s3_key: Optional[str]) -> tuple:
+    """(local name, S3 key) of a well's stored upload; older uploads were stored under their filename"""
+    if content_hash:
+        return f"{content_hash}.las", f"{S3_PREFIX}{content_hash}.las"
+    key = s3_key.split("/", 3)[3] if s3_key else None  # s3://bucket/key
+    return filename, key
+
+# ===== LOCAL FILE CACHE =====
+HASHED_NAME = re.compile(r"[0-9a-f]{64}\.las")
+
+class LocalFileCache:
+    """uploads/ as a size-capped LRU cache in front of S3.
+
+    Recency is the file's mtime (touched on every hit), so the web process and
+    the ingest workers share one LRU order. Only content-addressed files that
+    are confirmed to be in S3 are evicted; without S3 the directory is the only
+    copy and is never trimmed. Misses are fetched back from S3, and concurrent
+    misses for the same file wait on a single download.
+    """
+
+    def __init__(self, service: StorageService, directory: Path, max_bytes: int):
+        self.service = service
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._fetches = {}  # name -> Event set when its download finishes
+        self.stats = {"hits": 0, "misses": 0, "fetches": 0, "coalesced": 0, "fetch_errors": 0,
+                      "evictions": 0, "evicted_bytes": 0}
+
+    def _count(self, stat: str, n: int = 1):
+        with self._lock:
+            self.stats[stat] += n
+
+    def get(self, name: str, key: str = None) -> Optional[Path]:
+        """Local path of a stored file, downloading it from S3 on a miss (None if unavailable)"""
+        path = self.directory / name
+        if path.exists():
+            self._count("hits")
+            self.touch(path)
+            return path
+        self._count("misses")
+        if key is None or not self.service.s3_enabled:
+            return None
+
+        with self._lock:
+            done = self._fetches.get(name)
+            leader = done is None
+            if leader:
+                done = self._fetches[name] = threading.Event()
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            done.wait()
+            return path if path.exists() else None
+        try:
+            self._download(key, path)
+        except (ClientError, BotoCoreError, S3TransferFailedError) as e:
+            self._count("fetch_errors")
+            print(f"ERROR: S3 download failed for {key}: {e}")
+            return None
+        finally:
+            with self._lock:
+                del self._fetches[name]
+            done.set()
+        return path
+
+    def open(self, name: str, key: str = None) -> Optional[BinaryIO]:
+        """Open a stored file for reading; the handle stays valid even if the file is evicted"""
+        for _ in range(2):  # evicted between get() and open(): fetch again
+            path = self.get(name, key)
+            if path is None:
+                return None
+            try:
+                return open(path, "rb")
+            except FileNotFoundError:
+                continue
+        return None
+
+    def map(self, name: str, key: str = None) -> Optional[mmap.mmap]:
+        """Read-only memory map of a stored file"""
+        handle = self.open(name, key)
+        if handle is None:
+            return None
+        with handle:
+            return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _download(self, key: str, path: Path):
+        part_path = self.directory / f".{uuid.uuid4().hex}.part"
+        started = time.perf_counter()
+        try:
+            with_retries(f"GetObject {key}", self.service.s3_client.download_file,
+                         self.service.bucket_name, key, str(part_path))
+            os.replace(part_path, path)
+        finally:
+            part_path.unlink(missing_ok=True)
+        self._count("fetches")
+        print(f"INFO: Fetched {key} from S3 in {time.perf_counter() - started:.2f}s")
+        self.added(path)
+
+    def touch(self, path: Path):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def added(self, path: Path):
+        """Record a new file; trims the cache back under its cap"""
+        self.touch(path)
+        self.trim(keep=path)
+
+    def _entries(self) -> list:
+        entries = []
+        for path in self.directory.glob("*.las"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def trim(self, keep: Path = None):
+        """Evict least recently used files (already in S3) until the cache fits its cap"""
+        if not self.max_bytes or not self.service.s3_enabled:
+            return
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep or not HASHED_NAME.fullmatch(path.name):
+                continue
+            if not self.service.s3_exists(f"{S3_PREFIX}{path.name}"):
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
+            self._count("evictions")
+            self._count("evicted_bytes", size)
+
+    def metrics(self) -> dict:
+        """Hit/miss counters (this process) plus the cache's current size"""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        entries = self._entries()
+        return {
+            **stats,
+            "hit_rate": round(stats["hits"] / lookups, 3) if lookups else None,
+            "files": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes or None,
+            "evicting": bool(self.max_bytes and self.service.s3_enabled)
+        }
+
+class UploadWriter:
+    """Single pass over an upload: local write, SHA-256 and S3 multipart parts.
+
+    Files are content-addressed: the blob is stored as <hash>.las locally and
+    las-files/<hash>.las in S3, so identical uploads share one copy (and one PUT).
+    The hash is only known at the end, so parts streamed before that go to a
+    temporary key that is copied into place server-side on close. Callers that
+    hashed the file beforehand (spooled jobs, batches) pass content_hash and
+    skip the parts when the object exists; direct uploads only find out on
+    close and discard the parts already sent.
+    """
+
+    def __init__(self, service: StorageService, filename: str, content_hash: str = None):
+        self.service = service
+        self.filename = filename
+        self.digest = hashlib.sha256()
         # 1. Always store locally as secondary/primary cache
-        local_path = UPLOAD_DIR / filename
-        with open(local_path, "wb") as f:
-            f.write(content)
-        
-        s3_success = False
-        s3_key = None
-
-        # 2. Upload to S3 if enabled
-        if self.s3_enabled:
+        self._part_path = UPLOAD_DIR / f".{uuid.uuid4().hex}.part"
+        self._file = open(self._part_path, "wb")
+        self.bytes_written = 0
+        # 2. S3 parts, sent as soon as a full part is buffered
+        self._buffer = bytearray()
+        self._multipart = None
+        self.s3_error = None
+        self._expected_hash = None  # content already in S3 under this hash: no parts to send
+        if content_hash and service.s3_enabled:
             try:
-                self.s3_client.put_object(
-                    Bucket=self.bucket_name,
-                    Key=filename,
-                    Body=content
-                )
-                s3_success = True
-                s3_key = f"s3://{self.bucket_name}/{filename}"
-                print(f"SUCCESS: File uploaded to S3: {filename}")
-            except ClientError as e:
-                print(f"ERROR: S3 upload failed for {filename}: {e}")
+                if service.s3_exists(f"{S3_PREFIX}{content_hash}.las"):
+                    self._expected_hash = content_hash
+            except (ClientError, BotoCoreError):
+                pass  # checked again on close
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self.digest.update(chunk)
+        self.bytes_written += len(chunk)
+        if self.service.s3_enabled and self.s3_error is None and self._expected_hash is None:
+            self._buffer += chunk
+            if len(self._buffer) >= S3_PART_SIZE:
+                self._send_part()
 
+    def _send_part(self):
+        body = bytes(self._buffer)
+        self._buffer.clear()
+        try:
+            if self._multipart is None:
+                self._multipart = MultipartUpload(self.service, f"{S3_PREFIX}incoming/{uuid.uuid4().hex}.las")
+            self._multipart.send(body)
+        except (ClientError, BotoCoreError) as e:
+            # The local copy still completes; the file is just not in S3
+            self.s3_error = e
+            self._abort_multipart()
+
+    def _abort_multipart(self):
+        if self._multipart is not None:
+            self._multipart.abort()
+            self._multipart = None
+        self._buffer.clear()
+
+    def _finish_s3(self, key: str, local_path: Path) -> bool:
+        if not self.service.s3_enabled:
+            return False
+        if self.s3_error is not None:
+            print(f"ERROR: S3 upload failed for {key}: {self.s3_error}")
+            return False
+        if self._expected_hash is not None and key == f"{S3_PREFIX}{self._expected_hash}.las":
+            print(f"INFO: S3 object already stored, skipping upload: {key}")
+            return True
+        try:
+            # Keys are content hashes, so an existing object is this exact file
+            if self.service.s3_exists(key):
+                print(f"INFO: S3 object already stored, skipping upload: {key}")
+                self._abort_multipart()
+                return True
+            client, bucket = self.service.s3_client, self.service.bucket_name
+            if self._expected_hash is not None:
+                # The given hash was not this file's, so nothing was streamed: upload the local copy
+                with_retries(f"PutObject {key}", client.upload_file, str(local_path), bucket, key)
+            elif self._multipart is None:
+                # Smaller than one part: a single PUT
+                with_retries(f"PutObject {key}", client.put_object, Bucket=bucket, Key=key, Body=bytes(self._buffer))
+            else:
+                if self._buffer:
+                    self._multipart.send(bytes(self._buffer))
+                self._multipart.complete()
+                temp_key = self._multipart.key
+                self._multipart = None
+                with_retries(f"CopyObject {key}", client.copy, {"Bucket": bucket, "Key": temp_key}, bucket, key)
+                with_retries(f"DeleteObject {temp_key}", client.delete_object, Bucket=bucket, Key=temp_key)
+            print(f"SUCCESS: File uploaded to S3: {key}")
+            return True
+        except (ClientError, BotoCoreError, S3UploadFailedError) as e:
+            print(f"ERROR: S3 upload failed for {key}: {e}")
+            self._abort_multipart()
+            return False
+        finally:
+            self._buffer = bytearray()
+
+    def close(self) -> dict:
+        self._file.close()
+        content_hash = self.digest.hexdigest()
+        local_path = content_path(content_hash)
+        if local_path.exists():
+            self._part_path.unlink()
+        else:
+            os.replace(self._part_path, local_path)
+        key = f"{S3_PREFIX}{content_hash}.las"
+        s3_stored = self._finish_s3(key, local_path)
+        self.service.cache.added(local_path)
         return {
             "local_path": str(local_path),
-            "s3_stored": s3_success,
-            "s3_key": s3_key
+            "s3_stored": s3_stored,
+            "s3_key": f"s3://{self.service.bucket_name}/{key}" if s3_stored else None,
+            "content_hash": content_hash
         }
 
+    def abort(self):
+        self._file.close()
+        self._part_path.unlink(missing_ok=True)
+        self._abort_multipart()
+
 storage_service = StorageService()
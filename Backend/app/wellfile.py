@@ -0,0 +1,215 @@
+import os
+import json
+import uuid
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from sqlalchemy.orm import Session
+from .models import Well, WellCurve
+from .columnar import (CHUNK_ROWS, DEPTH_KEY, INDEX_CACHE_WELLS, DepthIndex, read_columns, read_tiles,
+                       load_tile_stats, merge_range_stats, narrow, widen)
+from .pyramid import LEVEL_FACTORS, pick_level
+from .stats import FIELDS, aggregate, finalize
+
+# Optional store: every ingested well also written as one memory-mapped file,
+# so chart reads slice arrays out of the page cache instead of querying tiles
+WELL_FILES = os.getenv("WELL_FILES", "false").lower() in ("1", "true", "yes")
+WELL_FILE_DIR = Path(os.getenv("WELL_FILE_DIR", "wellfiles"))
+
+# File layout: MAGIC, then 64-byte aligned arrays: depth (float64), and per
+# curve its values (float32, or float64 for curves float32 can't hold exactly)
+# and tile stats (float64, tiles x FIELDS); the min/max pyramid levels (depth
+# and curves, same dtypes); then a JSON footer with the offsets, its uint32
+# length and MAGIC again. The footer lets the file be written in one pass.
+MAGIC = b"WELLCOL2"  # 2: tile stats hold mean/M2 instead of sum/sum of squares
+ALIGN = 64
+FLOAT64 = np.dtype("<f8")
+
+def _aligned(n: int) -> int:
+    return -(-n // ALIGN) * ALIGN
+
+def well_file_path(content_hash: str) -> Path:
+    # Keyed by content: deduplicated wells share the file and it never goes stale
+    return WELL_FILE_DIR / f"{content_hash}.wcol"
+
+# ===== WRITE =====
+
+def write_well_file(db: Session, well_id: int, content_hash: str) -> Optional[Path]:
+    """Write a well's stored columns (read back one curve at a time) as its .wcol file"""
+    depths, _ = read_columns(db, well_id, [])
+    n = len(depths)
+    if not n or not content_hash:
+        return None
+    null_value = db.query(Well.null_value).filter(Well.id == well_id).scalar()
+    curves = list(dict.fromkeys(
+        c for (c,) in db.query(WellCurve.curve_name).filter(WellCurve.well_id == well_id).order_by(WellCurve.id)))
+    tiles = -(-n // CHUNK_ROWS)
+    tile_stats = load_tile_stats(db, well_id, curves)
+
+    WELL_FILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = well_file_path(content_hash)
+    part_path = WELL_FILE_DIR / f".{uuid.uuid4().hex}.part"
+    try:
+        with open(part_path, "wb") as f:
+            def put(array: np.ndarray) -> int:
+                f.seek(_aligned(f.tell()))
+                offset = f.tell()
+                f.write(np.ascontiguousarray(array).tobytes())
+                return offset
+
+            f.write(MAGIC)
+            depth_offset = put(depths.astype(FLOAT64))
+            layout = {}
+            for name in curves:
+                values = narrow(read_tiles(db, well_id, [name], 0, tiles - 1).get(name, np.full(n, np.nan)))
+                layout[name] = {"values": put(values), "dtype": values.dtype.str, "stats": None}
+                if name in tile_stats:
+                    layout[name]["stats"] = put(tile_stats[name].astype(FLOAT64))
+            levels = {}
+            for level in range(1, len(LEVEL_FACTORS)):
+                level_depths = read_tiles(db, well_id, [DEPTH_KEY], 0, tiles - 1, level).get(DEPTH_KEY)
+                if level_depths is None:
+                    break
+                entry = levels[level] = {"depth": put(level_depths.astype(FLOAT64)), "curves": {}}
+                for name in curves:
+                    values = read_tiles(db, well_id, [name], 0, tiles - 1, level).get(name)
+                    if values is not None:
+                        entry["curves"][name] = put(values.astype(layout[name]["dtype"]))
+            footer = json.dumps({"rows": n, "tiles": tiles, "null_value": null_value,
+                                 "depth": depth_offset, "curves": layout, "levels": levels}).encode()
+            f.write(footer + struct.pack("<I", len(footer)) + MAGIC)
+        os.replace(part_path, path)
+    finally:
+        part_path.unlink(missing_ok=True)
+    return path
+
+def store_well_file(db: Session, well_id: int, content_hash: str):
+    """Ingest hook: write the file if the store is enabled and the content has none yet.
+
+    A failure only costs the fast path; chart reads fall back to the tiles.
+    """
+    if not WELL_FILES or not content_hash or well_file_path(content_hash).exists():
+        return
+    try:
+        write_well_file(db, well_id, content_hash)
+    except Exception as e:
+        db.rollback()
+        print(f"WARNING: Could not write well file for well {well_id}: {e}")
+
+def remove_well_file(content_hash: str):
+    """Delete the file once no well uses the content anymore"""
+    with _open_lock:
+        _open_files.pop(content_hash, None)
+    well_file_path(content_hash).unlink(missing_ok=True)
+
+# ===== READ =====
+
+class WellFile:
+    """One well's columns memory-mapped; reads are zero-copy slices of the mapping"""
+
+    def __init__(self, path: Path):
+        self._map = np.memmap(path, dtype=np.uint8, mode="r")
+        tail = len(MAGIC) + 4
+        if self._map[:len(MAGIC)].tobytes() != MAGIC or self._map[-len(MAGIC):].tobytes() != MAGIC:
+            raise ValueError(f"{path} is not a well file")
+        (length,) = struct.unpack("<I", self._map[-tail:-len(MAGIC)].tobytes())
+        footer = json.loads(self._map[-tail - length:-tail].tobytes())
+        self.rows = footer["rows"]
+        self.tiles = footer["tiles"]
+        self.null_value = footer["null_value"]
+        self.layout = footer["curves"]
+        self.curves = list(self.layout)
+        self.levels = {int(level): entry for level, entry in footer["levels"].items()}
+        self.depths = self._array(footer["depth"], FLOAT64, self.rows)
+        self.index = DepthIndex(self.depths, self.null_value)
+
+    def _array(self, offset: int, dtype: np.dtype, count: int) -> np.ndarray:
+        return self._map[offset:offset + count * dtype.itemsize].view(dtype)
+
+    def column(self, name: str) -> Optional[np.ndarray]:
+        entry = self.layout.get(name)
+        return None if entry is None else self._array(entry["values"], np.dtype(entry["dtype"]), self.rows)
+
+    def tile_stats(self, name: str) -> Optional[np.ndarray]:
+        entry = self.layout.get(name)
+        if entry is None or entry["stats"] is None:
+            return None
+        return self._array(entry["stats"], FLOAT64, self.tiles * len(FIELDS)).reshape(self.tiles, len(FIELDS))
+
+    def _row_range(self, depth_from: float, depth_to: float) -> tuple:
+        if depth_from is None or depth_to is None:
+            return 0, self.rows
+        return self.index.row_range(depth_from, depth_to)
+
+    def read_window(self, curves: list, depth_from: float = None, depth_to: float = None,
+                    max_points: int = None) -> tuple:
+        """Same contract as columnar.read_window; the arrays are views of the mapping"""
+        start, stop = self._row_range(depth_from, depth_to)
+        if start >= stop:
+            return np.empty(0), {}
+        names = [c for c in curves if c != DEPTH_KEY and c in self.layout]
+
+        level = pick_level(stop - start, max_points) if self.index.monotonic else 0
+        if level in self.levels:
+            factor = LEVEL_FACTORS[level]
+            entry = self.levels[level]
+            buckets = -(-self.rows // factor)
+            lo, hi = 2 * (start // factor), 2 * -(-stop // factor)
+            depths = self._array(entry["depth"], FLOAT64, 2 * buckets)[lo:hi]
+            columns = {c: self._array(entry["curves"][c], np.dtype(self.layout[c]["dtype"]), 2 * buckets)[lo:hi]
+                       for c in names if c in entry["curves"]}
+            return depths, columns
+
+        depths = self.depths[start:stop]
+        columns = {c: self.column(c)[start:stop] for c in names}
+        if not self.index.monotonic and depth_from is not None and depth_to is not None:
+            in_range = (depths >= min(depth_from, depth_to)) & (depths <= max(depth_from, depth_to))
+            depths = depths[in_range]
+            columns = {c: v[in_range] for c, v in columns.items()}
+        return depths, columns
+
+    def read_range_stats(self, curves: list, depth_from: float = None, depth_to: float = None) -> dict:
+        """Same contract as columnar.read_range_stats, from the stored tile aggregates"""
+        start, stop = self._row_range(depth_from, depth_to)
+        if start >= stop:
+            return {}
+        names = [c for c in curves if c != DEPTH_KEY]
+        if depth_from is not None and depth_to is not None and not self.index.monotonic:
+            depths, columns = self.read_window(names, depth_from, depth_to)
+            return {c: finalize(aggregate(depths, widen(v), self.null_value)) for c, v in columns.items()}
+
+        tiles = {c: self.tile_stats(c) for c in names if self.tile_stats(c) is not None}
+        return merge_range_stats(self.index, tiles, start, stop,
+                                 lambda cs, lo, hi: {c: widen(self.column(c)[lo:hi]) for c in cs})
+
+_open_files = OrderedDict()  # content_hash -> WellFile
+_open_lock = threading.Lock()
+
+def open_well_file(content_hash: Optional[str]) -> Optional[WellFile]:
+    """Mapped file for the content, kept open per process (None if there is none)"""
+    if not WELL_FILES or not content_hash:
+        return None
+    with _open_lock:
+        well_file = _open_files.get(content_hash)
+        if well_file is not None:
+            _open_files.move_to_end(content_hash)
+            return well_file
+
+    path = well_file_path(content_hash)
+    if not path.exists():
+        return None
+    try:
+        well_file = WellFile(path)
+    except ValueError as e:
+        # Written in an older layout: drop it, reads use the tiles until tests/build_well_files.py writes it again
+        print(f"WARNING: {e}; removed, rebuild it with tests/build_well_files.py")
+        remove_well_file(content_hash)
+        return None
+    with _open_lock:
+        _open_files[content_hash] = well_file
+        while len(_open_files) > INDEX_CACHE_WELLS:
+            _open_files.popitem(last=False)
+    return well_file
@@ -1,153 +1,88 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import json
+import struct
+import hashlib
+import zipfile
+import numpy as np
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Header
 from pathlib import Path
-from .database import SessionLocal
-from .models import Well, WellCurve, WellData
-from .parser import parse_las_file
-from .storage import storage_service
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy import or_, select, func, exists
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import get_db, get_async_db, with_session
+from .models import Well, WellCurve, IngestJob
+from .ingest import iter_chunks
+from .jobs import submit_job, job_status, spool_path
+from .batch import ingest_batch, iter_zip
+from .columnar import read_window, read_range_stats, to_json_list, narrow, forget_well, hand_over_data
+from .analysis import round_stats
+from .storage import storage_service, file_ref
+from .wellfile import open_well_file, remove_well_file
+from .chartcache import chart_cache, chart_key, chart_etag, etag_matches
 
 router = APIRouter(prefix="/wells", tags=["wells"])
 
-@router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    """Upload LAS file"""
+def spool_upload(fileobj, job_id: int) -> str:
+    """Copy the request's spooled upload to the worker's incoming file, chunk by chunk.
+
+    Returns the SHA-256 of the content, hashed on the way through.
+    """
+    digest = hashlib.sha256()
+    with open(spool_path(job_id), "wb") as out:
+        for chunk in iter_chunks(fileobj):
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
+@router.post("/upload", status_code=202)
+async def upload_file(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
+    """Accept a LAS file and queue it for background ingest.
+
+    Returns a job right away; poll /wells/jobs/{job_id} for stage, rows and
+    throughput, and for the well once the job is done.
+    """
+    job = IngestJob(filename=file.filename, stage="queued")
+    db.add(job)
+    await db.commit()
+
     try:
-        content = await file.read()
-        well_data = parse_las_file(content)
-        
-        # Store file using StorageService (Local + S3)
-        storage_result = storage_service.store_file(file.filename, content)
-        
-        db = SessionLocal()
-        
-        # Determine a friendly name for the UI
-        parsed_name = well_data.get('well_name', 'Unknown')
-        if parsed_name.upper() in ['WELL1', 'UNKNOWN', 'WELL', 'N/A']:
-            # Append filename for better distinction in generic cases
-            base_display_name = f"{parsed_name} ({file.filename})"
-        else:
-            base_display_name = parsed_name
-        
-        # Option 1: Auto-rename if name exists
-        display_name = base_display_name
-        copy_counter = 1
-        while db.query(Well).filter(Well.well_name == display_name).first():
-            display_name = f"{base_display_name} (Copy {copy_counter})"
-            copy_counter += 1
-
-        well = Well(
-            well_name=display_name,
-            filename=file.filename,
-            company=well_data.get('company'),
-            field=well_data.get('field'),
-            location=well_data.get('location'),
-            country=well_data.get('country'),
-            date_analysed=well_data.get('date_analysed'),
-            start_depth=well_data.get('start_depth'),
-            stop_depth=well_data.get('stop_depth'),
-            step=well_data.get('step'),
-            null_value=well_data.get('null_value'),
-            row_count=well_data.get('row_count'),
-            s3_key=storage_result.get('s3_key')
-        )
-        db.add(well)
-        db.commit()
-        db.refresh(well)
-        
-        curves_list = well_data.get('curves', [])
-        for curve_name in curves_list:
-            curve = WellCurve(well_id=well.id, curve_name=curve_name)
-            db.add(curve)
-        db.commit()
-        
-        # Optimized Bulk Insert for large datasets (e.g. 11k+ rows)
-        data_to_insert = []
-        for row in well_data.get('data', []):
-            if row:
-                depth = row[0]
-                curve_values = {}
-                for j, curve_name in enumerate(curves_list):
-                    if j < len(row):
-                        curve_values[curve_name] = row[j]
-                
-                data_to_insert.append({
-                    "well_id": well.id,
-                    "depth": depth,
-                    "curve_values": curve_values
-                })
-        
-        if data_to_insert:
-            db.bulk_insert_mappings(WellData, data_to_insert)
-            db.commit()
-        
-        db.close()
-        
-        return {
-            "id": well.id,
-            "well_name": well.well_name,
-            "filename": well.filename,
-            "company": well.company,
-            "field": well.field,
-            "location": well.location,
-            "country": well.country,
-            "date_analysed": well.date_analysed,
-            "start_depth": well.start_depth,
-            "stop_depth": well.stop_depth,
-            "step": well.step,
-            "row_count": well.row_count,
-            "curves": well_data.get('curves', []),
-            "s3_stored": storage_result.get('s3_stored'),
-            "s3_key": well.s3_key,
-            "depth_range": {"start": well.start_depth, "stop": well.stop_depth}
-        }
+        content_hash = await run_in_threadpool(spool_upload, file.file, job.id)
+        submit_job(job.id, file.filename, content_hash)
     except Exception as e:
+        # Never queued: no worker will clean up the (partial) spooled file
+        spool_path(job.id).unlink(missing_ok=True)
+        job.stage, job.error = "failed", str(e)
+        await db.commit()
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("")
-def get_wells():
-    """Get all wells"""
-    db = SessionLocal()
-    wells = db.query(Well).all()
-    
-    result = []
-    for well in wells:
-        curves = db.query(WellCurve).filter(WellCurve.well_id == well.id).all()
-        curve_names = [c.curve_name for c in curves]
-        
-        result.append({
-            "id": well.id,
-            "well_name": well.well_name,
-            "filename": well.filename,
-            "company": well.company,
-            "field": well.field,
-            "location": well.location,
-            "country": well.country,
-            "date_analysed": well.date_analysed,
-            "start_depth": well.start_depth,
-            "stop_depth": well.stop_depth,
-            "step": well.step,
-            "row_count": well.row_count,
-            "curves": curve_names,
-            "uploaded_at": well.uploaded_at.isoformat()
-        })
-    
-    db.close()
-    return {"wells": result}
+    return job_status(job)
 
-@router.get("/{well_id}")
-def get_well(well_id: int):
-    """Get specific well"""
-    db = SessionLocal()
-    well = db.query(Well).filter(Well.id == well_id).first()
-    
-    if not well:
-        raise HTTPException(status_code=404, detail="Well not found")
-    
-    curves = db.query(WellCurve).filter(WellCurve.well_id == well_id).all()
-    curve_names = [c.curve_name for c in curves]
-    
-    db.close()
-    
-    return {
+@router.post("/batch")
+async def upload_batch(file: UploadFile = File(...), workers: int = None, db: Session = Depends(get_db)):
+    """Ingest every .las file in a zip archive, parsed in parallel.
+
+    Returns a result per file (ok / failed, well id, rows, error).
+    """
+    try:
+        return await run_in_threadpool(ingest_batch, db, iter_zip(file.file), workers)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Expected a zip archive of .las files")
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Ingest job progress"""
+    job = await db.get(IngestJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
+
+# Listing page size (keyset pagination on well id)
+LIST_LIMIT = 100
+LIST_LIMIT_MAX = 1000
+
+def well_to_dict(well: Well, curve_names: list = None) -> dict:
+    result = {
         "id": well.id,
         "well_name": well.well_name,
         "filename": well.filename,
@@ -160,77 +95,255 @@ def get_well(well_id: int):
         "stop_depth": well.stop_depth,
         "step": well.step,
         "row_count": well.row_count,
-        "curves": curve_names,
         "uploaded_at": well.uploaded_at.isoformat()
     }
+    if curve_names is not None:
+        result["curves"] = curve_names
+    return result
 
-@router.get("/{well_id}/data")
-def get_well_data(well_id: int, curves: str = None, depth_from: float = None, depth_to: float = None, downsample: int = 1):
-    """Get chart data for well with optional downsampling for performance"""
-    db = SessionLocal()
-    
-    query = db.query(WellData).filter(WellData.well_id == well_id)
-    
-    if depth_from and depth_to:
-        query = query.filter(WellData.depth.between(depth_from, depth_to))
+async def curve_names_by_well(db: AsyncSession, well_ids: list) -> dict:
+    """Curve names for many wells in one query, in upload order"""
+    names = {well_id: [] for well_id in well_ids}
+    if not well_ids:
+        return names
+    rows = await db.execute(
+        select(WellCurve.well_id, WellCurve.curve_name)
+        .where(WellCurve.well_id.in_(well_ids))
+        .order_by(WellCurve.well_id, WellCurve.id))
+    for well_id, curve_name in rows:
+        names[well_id].append(curve_name)
+    return names
+
+@router.get("")
+async def get_wells(after: int = None, limit: int = LIST_LIMIT, company: str = None, field: str = None,
+              country: str = None, depth_from: float = None, depth_to: float = None,
+              compact: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """List wells, one page at a time.
+
+    Pages are keyed on well id: pass the previous page's next_cursor as after.
+    depth_from / depth_to keep wells whose logged interval overlaps the range.
+    compact leaves out the curve lists (sidebar).
+    """
+    limit = max(1, min(limit, LIST_LIMIT_MAX))
+    query = select(Well)
+    if after is not None:
+        query = query.where(Well.id > after)
+    if company:
+        query = query.where(Well.company == company)
+    if field:
+        query = query.where(Well.field == field)
+    if country:
+        query = query.where(Well.country == country)
+    # STRT/STOP may be listed in either order (negative STEP)
+    if depth_to is not None:
+        query = query.where(or_(Well.start_depth <= depth_to, Well.stop_depth <= depth_to))
+    if depth_from is not None:
+        query = query.where(or_(Well.start_depth >= depth_from, Well.stop_depth >= depth_from))
+
+    # One row past the page tells whether another page exists
+    wells = (await db.execute(query.order_by(Well.id).limit(limit + 1))).scalars().all()
+    next_cursor = wells[limit - 1].id if len(wells) > limit else None
+    wells = wells[:limit]
+
+    curves = None if compact else await curve_names_by_well(db, [w.id for w in wells])
+    return {
+        "wells": [well_to_dict(w, None if compact else curves[w.id]) for w in wells],
+        "next_cursor": next_cursor
+    }
+
+@router.get("/{well_id}")
+async def get_well(well_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Get specific well"""
+    well = await db.get(Well, well_id)
     
-    # We fetch ALL data in the range to calculate accurate statistics
-    all_data = query.order_by(WellData.depth).all()
-    db.close()
+    if not well:
+        raise HTTPException(status_code=404, detail="Well not found")
     
-    if not all_data:
-        return {"depths": [], "curves": {}, "stats": {}}
+    return well_to_dict(well, (await curve_names_by_well(db, [well_id]))[well_id])
 
-    # 1. Calculate Statistics on the FULL range for precision
-    stats = {}
-    curves_to_process = curves.split(',') if curves else (all_data[0].curve_values.keys() if all_data[0].curve_values else [])
+def sort_by_depth(depths, columns):
+    if np.any(np.diff(depths) < 0):
+        order = np.argsort(depths, kind="stable")
+        depths = depths[order]
+        columns = {c: v[order] for c, v in columns.items()}
+    return depths, columns
+
+def chart_payload(depths, columns, curves: list, step: int) -> tuple:
+    """Sorted, JSON-ready depth and curve lists (CPU-bound; run off the event loop)"""
+    depths, columns = sort_by_depth(depths, columns)
     
-    for curve in curves_to_process:
-        values = [d.curve_values.get(curve, None) if d.curve_values else None for d in all_data]
-        valid_values = [v for v in values if v is not None and v > -900]
-        
-        if valid_values:
-            mean_val = sum(valid_values) / len(valid_values)
-            variance = sum((x - mean_val) ** 2 for x in valid_values) / len(valid_values)
-            std_dev = variance ** 0.5
-            
-            stats[curve] = {
-                "min": round(min(valid_values), 4),
-                "max": round(max(valid_values), 4),
-                "mean": round(mean_val, 4),
-                "std": round(std_dev, 4)
-            }
-
-    # 2. Downsample for the Chart Visualization (Performance Reason)
+    curve_dict = {}
+    for curve in curves:
+        values = columns.get(curve)
+        if values is None:
+            curve_dict[curve] = [None] * len(depths[::step])
+        else:
+            curve_dict[curve] = to_json_list(values[::step])
+    return depths[::step].tolist(), curve_dict
+
+# ===== BINARY CHART FORMAT =====
+# Sent for "Accept: application/vnd.onegeo.well-data". Little-endian:
+#   "WDAT" | uint32 header length | JSON header | arrays, each 8-byte aligned
+# The header has points, stats, and [offset, dtype] for "depth" and every curve
+# (null if the well lacks it); offsets count from the first 8-byte boundary after
+# the header. Arrays are float32 ("<f4") where that holds the values to 7
+# significant digits, otherwise float64 ("<f8"); NaN marks a missing sample.
+BINARY_MEDIA_TYPE = "application/vnd.onegeo.well-data"
+BINARY_MAGIC = b"WDAT"
+VARY = {"Vary": "Accept"}
+
+def _align8(n: int) -> int:
+    return -(-n // 8) * 8
+
+def chart_binary(depths, columns, curves: list, step: int, stats: dict) -> bytes:
+    """Sorted chart data as typed arrays (CPU-bound; run off the event loop)"""
+    depths, columns = sort_by_depth(depths, columns)
+    arrays, layout, offset = [], {"depth": None, "curves": {}}, 0
+
+    def add(values: np.ndarray) -> list:
+        nonlocal offset
+        values = np.ascontiguousarray(narrow(values))
+        values = values.astype(values.dtype.newbyteorder("<"), copy=False)
+        arrays.append((offset, values))
+        entry = [offset, values.dtype.str]
+        offset = _align8(offset + values.nbytes)
+        return entry
+
+    layout["depth"] = add(depths[::step])
+    for curve in curves:
+        values = columns.get(curve)
+        layout["curves"][curve] = None if values is None else add(values[::step])
+
+    header = json.dumps({"points": len(depths[::step]), "stats": stats, **layout}).encode()
+    start = _align8(8 + len(header))
+    body = bytearray(start + offset)
+    body[:8] = BINARY_MAGIC + struct.pack("<I", len(header))
+    body[8:8 + len(header)] = header
+    for position, values in arrays:
+        body[start + position:start + position + values.nbytes] = values.tobytes()
+    return bytes(body)
+
+def render_chart(depths, columns, curves: list, step: int, stats: dict, binary: bool) -> tuple:
+    """Body and media type of a chart response (CPU-bound; run off the event loop)"""
+    if not len(depths):
+        depths, columns, curves, stats = np.empty(0), {}, [], {}
+    if binary:
+        return chart_binary(depths, columns, curves, step, stats), BINARY_MEDIA_TYPE
+    depth_list, curve_dict = chart_payload(depths, columns, curves, step)
+    # Rendered here rather than by FastAPI's jsonable_encoder, which walks every
+    # float and cost more than the read itself
+    return JSONResponse({"depths": depth_list, "curves": curve_dict, "stats": stats}).body, "application/json"
+
+def chart_headers(etag: str = None) -> dict:
+    # no-cache: browsers keep the body but revalidate, getting a 304 while the ETag holds
+    return {**VARY, "ETag": etag, "Cache-Control": "no-cache"} if etag else VARY
+
+@router.get("/{well_id}/data")
+async def get_well_data(well_id: int, curves: str = None, depth_from: float = None, depth_to: float = None,
+                        downsample: int = 1, max_points: int = None, accept: str = Header(None),
+                        if_none_match: str = Header(None), db: AsyncSession = Depends(get_async_db)):
+    """Get chart data for well.
+
+    max_points serves a precomputed min/max pyramid level sized to the window
+    (peaks preserved); without it, downsample keeps every Nth raw sample.
+    Clients accepting BINARY_MEDIA_TYPE get typed arrays instead of JSON lists.
+    Rendered bodies are cached per well content and carry an ETag.
+    """
+    binary = BINARY_MEDIA_TYPE in (accept or "")
+    # Deduplicated uploads read the tiles of the well they share data with
+    row = (await db.execute(select(func.coalesce(Well.data_well_id, Well.id), Well.content_hash)
+                            .where(Well.id == well_id))).first()
+    if row is None:
+        body, media_type = await run_in_threadpool(render_chart, np.empty(0), {}, [], 1, {}, binary)
+        return Response(body, media_type=media_type, headers=VARY)
+    data_id, content_hash = row
+
+    # Only the requested curves, and only the depth tiles covering the window, are read
+    window = (depth_from, depth_to) if depth_from and depth_to else (None, None)
+    # Downsample for the Chart Visualization (Performance Reason)
     # This prevents the browser from crashing or lagging with 10k+ DOM points
-    if downsample > 1:
-        data_for_chart = all_data[::downsample]
+    step = downsample if downsample > 1 and not max_points else 1
+
+    key = etag = None
+    if content_hash:
+        key = chart_key(content_hash, curves, *window, max_points, step, binary)
+        etag = chart_etag(key)
+        if etag_matches(if_none_match, etag):
+            chart_cache.count("not_modified")
+            return Response(status_code=304, headers=chart_headers(etag))
+        cached = chart_cache.get(key)
+        if cached is not None:
+            body, media_type, _ = cached
+            return Response(body, media_type=media_type, headers=chart_headers(etag))
+
+    well_file = await run_in_threadpool(open_well_file, content_hash)
+
+    if curves:
+        curves_to_process = curves.split(',')
+    elif well_file is not None:
+        curves_to_process = well_file.curves
     else:
-        data_for_chart = all_data
+        curves_to_process = list((await db.execute(
+            select(WellCurve.curve_name).where(WellCurve.well_id == well_id).order_by(WellCurve.id))).scalars())
 
-    depths = [d.depth for d in data_for_chart]
-    curve_dict = {}
-    
-    for curve in curves_to_process:
-        curve_dict[curve] = [d.curve_values.get(curve, None) if d.curve_values else None for d in data_for_chart]
-    
-    return {
-        "depths": depths,
-        "curves": curve_dict,
-        "stats": stats
-    }
+    if well_file is not None:
+        # Memory-mapped well file: slices of the page cache, no database reads
+        depths, columns = await run_in_threadpool(well_file.read_window, curves_to_process, *window,
+                                                  max_points=max_points)
+    else:
+        depths, columns = await run_in_threadpool(with_session, read_window, data_id, curves_to_process, *window,
+                                                  max_points=max_points)
+
+    # 1. Statistics on the FULL range, merged from per-tile aggregates stored at ingest
+    stats = {}
+    if len(depths):
+        if well_file is not None:
+            range_stats = await run_in_threadpool(well_file.read_range_stats, curves_to_process, *window)
+        else:
+            range_stats = await run_in_threadpool(with_session, read_range_stats, data_id, curves_to_process, *window)
+        stats = round_stats(range_stats, 4, ("min", "max", "mean", "std"))
+
+    # 2. Lists (or typed arrays) for the chart, at the step chosen above
+    body, media_type = await run_in_threadpool(render_chart, depths, columns, curves_to_process, step, stats, binary)
+    if key is not None:
+        chart_cache.put(key, body, media_type, etag)
+    return Response(body, media_type=media_type, headers=chart_headers(etag))
+
+@router.get("/{well_id}/file")
+async def download_well_file(well_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Original LAS file, from the local cache or fetched back from S3"""
+    well = await db.get(Well, well_id)
+
+    if not well:
+        raise HTTPException(status_code=404, detail="Well not found")
+
+    name, key = file_ref(well.content_hash, well.filename, well.s3_key)
+    handle = await run_in_threadpool(storage_service.cache.open, name, key)
+    if handle is None:
+        raise HTTPException(status_code=404, detail="Original file is not available")
+
+    def stream():
+        with handle:
+            yield from iter_chunks(handle)
+
+    return StreamingResponse(stream(), media_type="text/plain",
+                             headers={"Content-Disposition": f'attachment; filename="{well.filename}"'})
 
 @router.delete("/{well_id}")
-def delete_well(well_id: int):
+async def delete_well(well_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete well"""
-    db = SessionLocal()
-    well = db.query(Well).filter(Well.id == well_id).first()
+    well = await db.get(Well, well_id)
     
     if not well:
         raise HTTPException(status_code=404, detail="Well not found")
     
-    db.delete(well)
-    db.commit()
-    db.close()
+    # Wells deduplicated against this one keep the data
+    await db.run_sync(hand_over_data, well_id)
+    await db.delete(well)
+    await db.commit()
+    forget_well(well_id)
+    if well.content_hash and not await db.scalar(select(exists().where(Well.content_hash == well.content_hash))):
+        remove_well_file(well.content_hash)
+        chart_cache.forget(well.content_hash)
     
     return {"message": "Well deleted"}
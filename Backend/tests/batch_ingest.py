@@ -0,0 +1,39 @@
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import Base, engine, SessionLocal
+from app.batch import ingest_batch, iter_zip, iter_directory
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a directory or zip archive of LAS files")
+    parser.add_argument("source", help="directory (searched recursively) or .zip archive")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: all cores)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        source = Path(args.source)
+        if source.is_dir():
+            summary = ingest_batch(db, iter_directory(source), args.workers)
+        else:
+            with open(source, "rb") as f:
+                summary = ingest_batch(db, iter_zip(f), args.workers)
+    finally:
+        db.close()
+
+    for r in summary["results"]:
+        line = f"  {r['status']:<7} {r['filename']}"
+        if r["well_id"]:
+            line += f" -> well {r['well_id']} '{r['well_name']}' ({r['rows']} rows)"
+        if r["error"]:
+            line += f" [{r['error']}]"
+        print(line)
+    print(f"Done. {summary['succeeded']}/{summary['files']} files, {summary['rows']} rows in "
+          f"{summary['seconds']}s ({summary['rows_per_sec']} rows/sec, {summary['workers']} workers)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from app.analysis import describe, gas_ratios, DEFAULT_PERCENTILES
+from synthetic import build_synthetic
+from app.parser import parse_las_file
+
+CURVES = ["TOTAL_GAS", "HC1", "HC2", "HC3", "HC4", "CO2RAW"]
+
+def legacy_interpret_stats(rows, curves):
+    """The per-request loop interpret.py used to run over WellData rows"""
+    stats = {}
+    for c in curves:
+        valid_points = [(d["depth"], d["curve_values"].get(c)) for d in rows
+                        if d["curve_values"].get(c) is not None and d["curve_values"].get(c) > -900]
+        if valid_points:
+            vals = [p[1] for p in valid_points]
+            mean = sum(vals) / len(vals)
+            max_val = max(vals)
+            max_depth = [p[0] for p in valid_points if p[1] == max_val][0]
+            variance = sum((x - mean) ** 2 for x in vals) / len(vals)
+            stats[c] = {"min": min(vals), "max": max_val, "max_at": max_depth,
+                        "mean": mean, "std": variance ** 0.5, "count": len(vals)}
+    return stats
+
+def legacy_chat_summary(rows, curves):
+    """The per-message loop chat.py used to run, including the second peak scan"""
+    summary = {}
+    for c in curves:
+        vals = [d["curve_values"].get(c) for d in rows
+                if d["curve_values"].get(c) is not None and d["curve_values"].get(c) > -900]
+        if vals:
+            max_val = max(vals)
+            max_depth = [d["depth"] for d in rows if d["curve_values"].get(c) == max_val][0]
+            summary[c] = {"avg": sum(vals) / len(vals), "max": max_val, "peak_at": max_depth}
+    return summary
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+
+    for n in sizes:
+        parsed = parse_las_file(build_synthetic(n))
+        names, data = parsed["curves"], parsed["data"]
+        depths = data[:, 0]
+        columns = {c: data[:, names.index(c)] for c in CURVES}
+        rows = [{"depth": row[0], "curve_values": dict(zip(names, row))} for row in data.tolist()]
+
+        interp_s, legacy = timed(legacy_interpret_stats, rows, CURVES)
+        chat_s, _ = timed(legacy_chat_summary, rows, CURVES)
+        fast_s, stats = timed(describe, depths, columns, parsed.get("null_value"), DEFAULT_PERCENTILES)
+        gas_ratios(stats)
+
+        for c in CURVES:
+            assert np.isclose(stats[c]["mean"], legacy[c]["mean"]) and stats[c]["max_at"] == legacy[c]["max_at"]
+
+        print(f"{n:>8} rows x {len(CURVES)} curves: "
+              f"interpret loop {interp_s * 1000:8.1f} ms | chat loop {chat_s * 1000:8.1f} ms | "
+              f"analysis.describe (+percentiles) {fast_s * 1000:6.1f} ms")
@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Defaults to a throwaway SQLite file; set DATABASE_URL to benchmark Postgres (COPY path)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app.database import Base, engine, SessionLocal
+from app.batch import ingest_batch
+from app.ingest import ingest_stream
+from app.models import Well
+from synthetic import build_synthetic
+
+def sequential(db, files):
+    """The one-file-at-a-time path /wells/upload workers take"""
+    for name, content in files:
+        ingest_stream(db, [content], name)
+
+def worker_counts():
+    counts, n = [], 1
+    while n < (os.cpu_count() or 1):
+        counts.append(n)
+        n *= 2
+    return counts + [os.cpu_count() or 1]
+
+def clear(db):
+    db.query(Well).delete()
+    db.commit()
+
+if __name__ == "__main__":
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    Base.metadata.create_all(bind=engine)
+    print(f"engine: {engine.dialect.name}, {os.cpu_count()} cores, {n_files} files x {rows:,} rows")
+
+    # Distinct content per file, so nothing is deduplicated
+    files = [(f"bench_{i}.las", build_synthetic(rows, f"BENCH-{i}")) for i in range(n_files)]
+    db = SessionLocal()
+
+    start = time.perf_counter()
+    sequential(db, files)
+    base = time.perf_counter() - start
+    print(f"sequential ingest_stream : {n_files / base:6.2f} files/sec | {n_files * rows / base:>10,.0f} rows/sec")
+    clear(db)
+
+    for workers in worker_counts():
+        summary = ingest_batch(db, files, workers)
+        print(f"batch, {workers:>2} worker(s)    : {summary['files'] / summary['seconds']:6.2f} files/sec | "
+              f"{summary['rows_per_sec']:>10,} rows/sec | {base / summary['seconds']:4.1f}x")
+        clear(db)
+    db.close()
@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Defaults to a throwaway SQLite file; set DATABASE_URL to benchmark Postgres (COPY path)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app.database import Base, engine, SessionLocal
+from app.models import Well, WellData
+from app.columnar import CHUNK_ROWS, write_chunk
+from app.parser import parse_las_file
+from synthetic import build_synthetic
+
+def legacy_load(db, well_id, curves, data):
+    """The previous path: one JSON well_data row per sample via bulk_insert_mappings"""
+    data_to_insert = [
+        {"well_id": well_id, "depth": row[0], "curve_values": dict(zip(curves, row))}
+        for row in data.tolist()
+    ]
+    db.bulk_insert_mappings(WellData, data_to_insert)
+    db.commit()
+
+def columnar_load(db, well_id, curves, data, null_value):
+    """Current path: per-tile curve arrays + pyramid + tile stats through bulkload"""
+    for chunk_index, start in enumerate(range(0, len(data), CHUNK_ROWS)):
+        write_chunk(db, well_id, chunk_index, curves, data[start:start + CHUNK_ROWS], null_value)
+        db.commit()
+
+def timed(label, fn, db, rows, *args):
+    well = Well(well_name=f"bench-{label}-{time.time()}")
+    db.add(well)
+    db.commit()
+    start = time.perf_counter()
+    fn(db, well.id, *args)
+    elapsed = time.perf_counter() - start
+    db.delete(well)
+    db.commit()
+    return elapsed
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    sizes = [int(a) for a in sys.argv[1:]] or [20_000, 100_000]
+    print(f"engine: {engine.dialect.name}")
+
+    db = SessionLocal()
+    for n in sizes:
+        parsed = parse_las_file(build_synthetic(n))
+        curves, data = parsed["curves"], parsed["data"]
+
+        legacy_s = timed("legacy", legacy_load, db, n, curves, data)
+        bulk_s = timed("bulk", columnar_load, db, n, curves, data, parsed.get("null_value"))
+
+        print(f"{n:>8} rows x {len(curves)} curves: "
+              f"bulk_insert_mappings(WellData) {n / legacy_s:>10,.0f} rows/sec | "
+              f"bulkload (columnar) {n / bulk_s:>10,.0f} rows/sec | {legacy_s / bulk_s:5.1f}x")
+    db.close()
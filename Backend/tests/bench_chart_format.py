@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import time
+import struct
+import asyncio
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Defaults to a throwaway SQLite file; set DATABASE_URL to benchmark Postgres
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+import httpx
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from app.app import app
+from app.database import SessionLocal
+from app.ingest import ingest_stream
+from app.columnar import read_window, read_range_stats, widen
+from app.analysis import round_stats
+from app.wells import BINARY_MEDIA_TYPE, BINARY_MAGIC, chart_payload, chart_binary
+from synthetic import build_synthetic
+
+CHART_CURVES = ["TOTAL_GAS", "HC1", "HC2", "HC3"]
+WINDOWS = [2_000, 20_000, 200_000]  # samples per curve
+
+def decode_binary(body: bytes) -> dict:
+    """What the frontend does: header JSON + typed array views (no per-value parsing)"""
+    assert body[:4] == BINARY_MAGIC
+    (length,) = struct.unpack("<I", body[4:8])
+    header = json.loads(body[8:8 + length])
+    start = -(-(8 + length) // 8) * 8
+    view = lambda entry: np.frombuffer(body, dtype=entry[1], count=header["points"], offset=start + entry[0])
+    return {
+        "depths": view(header["depth"]),
+        "curves": {c: None if e is None else view(e) for c, e in header["curves"].items()},
+        "stats": header["stats"]
+    }
+
+def timed(fn, repeat: int) -> tuple:
+    result = fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+async def request_ms(client, well_id: int, params: dict, accept: str, repeat: int) -> float:
+    await client.get(f"/wells/{well_id}/data", params=params, headers={"Accept": accept})
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await client.get(f"/wells/{well_id}/data", params=params, headers={"Accept": accept})
+    return (time.perf_counter() - started) / repeat * 1000
+
+async def main(rows: int):
+    db = SessionLocal()
+    well_id = ingest_stream(db, [build_synthetic(rows, f"BENCH-{time.time_ns()}")], "bench.las")["well"].id
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"{'samples':>9} | {'JSON bytes':>11} {'binary':>10} | encode ms: {'JSON':>7} {'+encoder':>9} "
+              f"{'binary':>7} | decode ms: {'JSON':>6} {'binary':>6} | request ms: {'JSON':>6} {'binary':>6}")
+        for window in WINDOWS:
+            if window > rows:
+                continue
+            depth_to = 8665 + window - 1
+            depths, columns = read_window(db, well_id, CHART_CURVES, 8665, depth_to)
+            stats = round_stats(read_range_stats(db, well_id, CHART_CURVES, 8665, depth_to), 4,
+                                ("min", "max", "mean", "std"))
+            repeat = max(1, 200_000 // window)
+
+            def encode_json():
+                depth_list, curve_dict = chart_payload(depths, columns, CHART_CURVES, 1)
+                return json.dumps({"depths": depth_list, "curves": curve_dict, "stats": stats}).encode()
+
+            def encode_json_fastapi():
+                # The old path: handler returned a dict, FastAPI ran jsonable_encoder on it
+                depth_list, curve_dict = chart_payload(depths, columns, CHART_CURVES, 1)
+                return json.dumps(jsonable_encoder({"depths": depth_list, "curves": curve_dict,
+                                                    "stats": stats})).encode()
+
+            json_ms, json_body = timed(encode_json, repeat)
+            fastapi_ms, _ = timed(encode_json_fastapi, repeat)
+            binary_ms, binary_body = timed(lambda: chart_binary(depths, columns, CHART_CURVES, 1, stats), repeat)
+            json_decode_ms, parsed = timed(lambda: json.loads(json_body), repeat)
+            binary_decode_ms, decoded = timed(lambda: decode_binary(binary_body), repeat)
+
+            # Same samples either way (float32 arrays widen back to the JSON values)
+            assert np.array_equal(decoded["depths"], parsed["depths"])
+            for c in CHART_CURVES:
+                expected = np.array([np.nan if v is None else v for v in parsed["curves"][c]], dtype=np.float64)
+                assert np.array_equal(widen(decoded["curves"][c]), expected, equal_nan=True), c
+
+            params = {"curves": ",".join(CHART_CURVES), "depth_from": 8665, "depth_to": depth_to}
+            json_req = await request_ms(client, well_id, params, "application/json", max(1, repeat // 4))
+            binary_req = await request_ms(client, well_id, params, BINARY_MEDIA_TYPE, max(1, repeat // 4))
+
+            print(f"{len(depths):>9,} | {len(json_body):>11,} {len(binary_body):>10,} | "
+                  f"{json_ms:>18.2f} {fastapi_ms:>9.2f} {binary_ms:>7.2f} | "
+                  f"{json_decode_ms:>17.2f} {binary_decode_ms:>6.2f} | {json_req:>18.2f} {binary_req:>6.2f}")
+    db.close()
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    print(f"Chart data for {len(CHART_CURVES)} curves of a {rows:,}-row well: JSON lists vs {BINARY_MEDIA_TYPE}")
+    asyncio.run(main(rows))
@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Defaults to a throwaway SQLite file; set DATABASE_URL to benchmark Postgres
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+import httpx
+import numpy as np
+from app.app import app
+from synthetic import build_synthetic
+
+READERS = 8
+CHART_CURVES = "TOTAL_GAS,HC1,HC2,HC3"
+
+async def chart_reader(client, well_id, stop_at, latencies):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        r = await client.get(f"/wells/{well_id}/data", params={"curves": CHART_CURVES, "max_points": 2000})
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+async def upload(client, rows) -> dict:
+    """Upload a fresh synthetic file and wait for its ingest job"""
+    # Unique content each time, otherwise the upload is just linked to the first one
+    content = build_synthetic(rows, f"BENCH-{time.time_ns()}")
+    job = (await client.post("/wells/upload", files={"file": ("bench.las", content, "text/plain")})).json()
+    while not job["finished"]:
+        await asyncio.sleep(0.1)
+        job = (await client.get(f"/wells/jobs/{job['job_id']}")).json()
+    if job["stage"] != "done":
+        raise RuntimeError(job["error"])
+    return job
+
+async def uploader(client, rows, stop_at, done):
+    while time.perf_counter() < stop_at:
+        done.append((await upload(client, rows))["rows"])
+
+async def run(client, well_id, seconds, uploaders, rows):
+    latencies, uploads = [], []
+    stop_at = time.perf_counter() + seconds
+    await asyncio.gather(
+        *[chart_reader(client, well_id, stop_at, latencies) for _ in range(READERS)],
+        *[uploader(client, rows, stop_at, uploads) for _ in range(uploaders)]
+    )
+    ms = np.array(latencies) * 1000
+    print(f"{uploaders} uploader(s): {len(ms) / seconds:>8,.1f} chart reads/sec | "
+          f"p50 {np.percentile(ms, 50):7.1f} ms | p95 {np.percentile(ms, 95):7.1f} ms | "
+          f"{len(uploads)} uploads ({sum(uploads) / seconds:,.0f} rows/sec)")
+
+async def main(rows, seconds):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        well_id = (await upload(client, rows))["well_id"]
+        for uploaders in (0, 1, 2, 4):
+            await run(client, well_id, seconds, uploaders, rows)
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print(f"{READERS} concurrent chart readers, uploads of {rows:,} rows, {seconds:.0f}s per run")
+    asyncio.run(main(rows, seconds))
@@ -0,0 +1,38 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from app.parser import parse_las_file, parse_header, parse_data_lines, split_las, decode_text
+from synthetic import build_synthetic
+
+def parse_legacy(content: bytes) -> dict:
+    """The previous pure-Python path: decode, split lines, float() every token"""
+    header, block = split_las(content)
+    well_info = parse_header(decode_text(header))
+    data_rows = parse_data_lines(decode_text(block))
+    well_info['row_count'] = len(data_rows)
+    well_info['data'] = data_rows
+    return well_info
+
+def timed(fn, content):
+    start = time.perf_counter()
+    result = fn(content)
+    return time.perf_counter() - start, result
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [50_000, 200_000]
+
+    for rows in sizes:
+        content = build_synthetic(rows)
+        legacy_s, legacy = timed(parse_legacy, content)
+        fast_s, fast = timed(parse_las_file, content)
+
+        assert fast['row_count'] == legacy['row_count'] == rows
+        assert np.array_equal(fast['data'][-1], np.array(legacy['data'][-1]))
+
+        print(f"{rows:>8} rows ({len(content) / 1e6:7.1f} MB): "
+              f"legacy {legacy_s:7.2f}s | numpy {fast_s:6.2f}s | "
+              f"{legacy_s / fast_s:5.1f}x faster")
@@ -0,0 +1,28 @@
+import sys
+from app.database import SessionLocal
+from app.models import Well
+from app.wellfile import WELL_FILE_DIR, well_file_path, write_well_file
+
+def build(rebuild=False):
+    """Write the memory-mapped file of every ingested well that has none (WELL_FILES store)"""
+    db = SessionLocal()
+    try:
+        wells = (db.query(Well.id, Well.content_hash)
+                 .filter(Well.data_well_id.is_(None), Well.content_hash.isnot(None), Well.row_count > 0)
+                 .order_by(Well.id).all())
+        print(f"Writing well files to {WELL_FILE_DIR}/ ...")
+        written = 0
+        for well_id, content_hash in wells:
+            if not rebuild and well_file_path(content_hash).exists():
+                continue
+            path = write_well_file(db, well_id, content_hash)
+            if path is not None:
+                written += 1
+                print(f"  well {well_id}: {path.stat().st_size / 1e6:.1f} MB")
+        print(f"Done. {written} files written.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    # Pass --rebuild to rewrite files that already exist
+    build(rebuild="--rebuild" in sys.argv)
@@ -0,0 +1,87 @@
+"""Shared pytest fixtures.
+
+App modules read DATABASE_URL and create uploads/ when first imported, so
+test modules import them inside fixtures and tests, after `workdir` is set up,
+never at module level (app.llm and app.chartcache don't touch either).
+"""
+import os
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+S3_BUCKET = "test-bucket"
+
+@pytest.fixture(scope="session", autouse=True)
+def workdir(tmp_path_factory):
+    """Throwaway working directory (uploads/, wellfiles/) and SQLite database for the run.
+
+    An exported DATABASE_URL is kept, to run the suite against another database.
+    """
+    path = tmp_path_factory.mktemp("work")
+    (path / "uploads").mkdir()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(path)
+        if not os.getenv("DATABASE_URL"):
+            mp.setenv("DATABASE_URL", f"sqlite:///{path}/test.db")
+        yield path
+
+@pytest.fixture(scope="session")
+def app(workdir):
+    """The FastAPI app (importing it creates the tables)"""
+    from app.app import app as application
+    return application
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+    return TestClient(app)
+
+@pytest.fixture(scope="session")
+def ingest_well(app):
+    """ingest_well(rows=2000, name=None) -> id of a newly ingested synthetic well.
+
+    Names (and so file contents) are unique unless given, so wells are never
+    deduplicated against each other.
+    """
+    from app.database import SessionLocal
+    from app.ingest import ingest_stream
+    from synthetic import build_synthetic
+
+    def ingest(rows: int = 2000, name: str = None) -> int:
+        db = SessionLocal()
+        try:
+            content = build_synthetic(rows, name or f"TEST-{os.urandom(4).hex()}")
+            return ingest_stream(db, [content], "t.las")["well"].id
+        finally:
+            db.close()
+    return ingest
+
+@pytest.fixture
+def well_id(ingest_well):
+    """A freshly ingested well per test"""
+    return ingest_well()
+
+@pytest.fixture
+def s3_service(monkeypatch, tmp_path):
+    """StorageService with S3 enabled against moto (pip install moto), over an empty uploads/.
+
+    Settings are patched for the test only; the app's own storage_service is untouched.
+    """
+    mock_aws = pytest.importorskip("moto").mock_aws
+    from app import storage
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "uploads").mkdir()
+    for name, value in {"AWS_S3_BUCKET": S3_BUCKET, "AWS_ACCESS_KEY_ID": "testing",
+                        "AWS_SECRET_ACCESS_KEY": "testing", "AWS_REGION": "us-east-1"}.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setattr(storage, "S3_PART_SIZE", 5 * 1024 * 1024)  # smallest part S3 accepts, keeps the files small
+    monkeypatch.setattr(storage, "S3_RETRY_BASE", 0.0)
+
+    with mock_aws():
+        service = storage.StorageService()
+        service.s3_client.create_bucket(Bucket=S3_BUCKET)
+        yield service
@@ -0,0 +1,113 @@
+"""Local stand-in for the Groq chat completions API (OpenAI wire format), for tests.
+
+    with FakeLLM(reply="Dry gas.") as llm:   # sets GROQ_BASE_URL to the fake server
+        ...
+"""
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeLLM:
+    def __init__(self, reply: str = "Hello from the fake model.", delay: float = 0.0,
+                 fail_status: int = None, fail_after: int = None, fail_times: int = 0):
+        self.reply = reply
+        self.delay = delay              # seconds between streamed chunks (before the reply when not streaming)
+        self.fail_status = fail_status  # answer every request with this HTTP status
+        self.fail_after = fail_after    # send an error event in place of this chunk (0-based)
+        self.fail_times = fail_times    # answer the first n requests with a 503
+        self.requests = []              # JSON bodies received
+        self.active = self.max_active = 0  # requests being answered (now / at most)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def chunks(self) -> list:
+        """The reply split into the word-sized deltas it is streamed as"""
+        words = self.reply.split(" ")
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with fake._lock:
+                    fake.requests.append(body)
+                    failing = len(fake.requests) <= fake.fail_times
+                    fake.active += 1
+                    fake.max_active = max(fake.max_active, fake.active)
+                try:
+                    self._answer(body, failing)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client stopped reading
+                finally:
+                    with fake._lock:
+                        fake.active -= 1
+
+            def _answer(self, body: dict, failing: bool):
+                if fake.fail_status or failing:
+                    self._json(fake.fail_status or 503, {"error": {"message": "fake failure", "type": "server_error"}})
+                elif body.get("stream"):
+                    self._stream(body)
+                else:
+                    time.sleep(fake.delay)
+                    self._json(200, {
+                        "id": "fake", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": fake.reply}}],
+                        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+                    })
+
+            def _json(self, status: int, payload: dict):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, body: dict):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for i, text in enumerate(fake.chunks()):
+                    if fake.fail_after is not None and i >= fake.fail_after:
+                        error = {"error": {"message": "fake stream failure", "type": "server_error"}}
+                        self.wfile.write(f"data: {json.dumps(error)}\n\n".encode())
+                        self.wfile.flush()
+                        return
+                    time.sleep(fake.delay)
+                    chunk = {"id": "fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": body.get("model"),
+                             "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def __enter__(self):
+        self._env = {k: os.environ.get(k) for k in ("GROQ_BASE_URL", "API_KEY")}
+        os.environ.update(GROQ_BASE_URL=self.url, API_KEY="fake-key")
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        for key, value in self._env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
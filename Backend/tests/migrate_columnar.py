@@ -0,0 +1,20 @@
+import sys
+from app.database import Base, engine, SessionLocal
+from app.columnar import migrate_all
+
+def migrate(drop_rows=False):
+    # Creates curve_chunks if this database predates columnar storage
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print("Migrating well_data rows to columnar curve chunks...")
+        migrated = migrate_all(db, drop_rows=drop_rows)
+        for well_id, rows in migrated.items():
+            print(f"  well {well_id}: {rows} rows")
+        print(f"Done. {len(migrated)} wells migrated.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    # Pass --drop-rows to delete the legacy well_data rows once migrated
+    migrate(drop_rows="--drop-rows" in sys.argv)
@@ -0,0 +1,19 @@
+"""Synthetic LAS files of any length, built from demo.las, for tests and benchmarks"""
+from pathlib import Path
+from app.parser import split_las
+
+DEMO = Path(__file__).resolve().parent.parent.parent / "demo.las"
+
+def build_synthetic(rows: int, well_name: str = None) -> bytes:
+    """Repeat the ~A block of demo.las until the file holds `rows` data lines.
+
+    Depths are renumbered 1 ft apart so the log stays monotonic. A well_name
+    makes the file's content (and hash) unique, so uploads aren't deduplicated.
+    """
+    header, block = split_las(DEMO.read_bytes())
+    if well_name:
+        header = header.replace(b'WELL1:', well_name.encode() + b':', 1)
+    lines = [line.split(b' ', 1)[1] for line in block.strip().split(b'\n')]
+    repeats = rows // len(lines) + 1
+    body = b'\n'.join(b'%.2f %s' % (8665 + i, line) for i, line in enumerate((lines * repeats)[:rows]))
+    return header + b'~Ascii FIS DATA\n' + body + b'\n'
@@ -0,0 +1,53 @@
+"""Chart response cache of /wells/{id}/data: hits, ETag/304s, LRU budget and invalidation"""
+import sys
+import pytest
+
+PARAMS = {"curves": "TOTAL_GAS,HC1", "depth_from": 8665, "depth_to": 9665}
+
+def get(client, well_id: int, **headers):
+    return client.get(f"/wells/{well_id}/data", params=PARAMS, headers=headers)
+
+def test_second_request_is_a_hit(client, well_id):
+    from app.chartcache import chart_cache
+    before = chart_cache.metrics()
+    first, second = get(client, well_id), get(client, well_id)
+    after = chart_cache.metrics()
+    assert first.content == second.content and first.json()["depths"]
+    assert first.headers["etag"] == second.headers["etag"]
+    assert after["hits"] == before["hits"] + 1 and after["stores"] == before["stores"] + 1
+
+def test_if_none_match_gives_304(client, well_id):
+    etag = get(client, well_id).headers["etag"]
+    response = get(client, well_id, **{"If-None-Match": etag})
+    assert response.status_code == 304 and response.content == b""
+    assert get(client, well_id, **{"If-None-Match": '"stale"'}).status_code == 200
+
+def test_formats_have_their_own_entries(client, well_id):
+    from app.wells import BINARY_MEDIA_TYPE
+    as_json = get(client, well_id)
+    as_binary = get(client, well_id, Accept=BINARY_MEDIA_TYPE)
+    assert as_binary.headers["content-type"] == BINARY_MEDIA_TYPE
+    assert as_json.headers["etag"] != as_binary.headers["etag"]
+    assert get(client, well_id, Accept=BINARY_MEDIA_TYPE).content == as_binary.content
+
+def test_delete_invalidates(client, well_id):
+    from app.chartcache import chart_cache
+    get(client, well_id)
+    assert client.delete(f"/wells/{well_id}").status_code == 200
+    assert chart_cache.metrics()["invalidations"] >= 1
+    assert get(client, well_id).json() == {"depths": [], "curves": {}, "stats": {}}
+
+def test_lru_budget():
+    from app.chartcache import ChartCache
+    cache = ChartCache(1000)
+    for i in range(5):
+        cache.put(("h", i), b"x" * 200, "application/json", str(i))
+    cache.put(("big",), b"x" * 400, "application/json", "big")  # over a quarter of the budget
+    assert cache.get(("h", 0)) is not None  # recently used
+    cache.put(("h", 5), b"x" * 200, "application/json", "5")
+    assert cache.get(("h", 1)) is None  # least recently used went first
+    assert cache.get(("big",)) is None
+    assert cache.metrics()["bytes"] <= 1000
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,126 @@
+"""Chat context: token-budgeted history, rolling summary of older turns and the
+cached system prompt, against a local fake LLM server (tests/fake_llm.py)
+"""
+import sys
+from types import SimpleNamespace
+
+import pytest
+from fake_llm import FakeLLM
+
+BUDGET = 300  # history tokens per prompt in these tests
+QUESTION = "What does the gas curve do between {0} and {1} ft, and is the HC1/HC2 ratio different there? " * 2
+REPLY = "TOTAL_GAS rises to about 40 units with a wetter HC ratio; the zone looks like a gas show worth testing."
+
+@pytest.fixture
+def chatcontext(app):
+    from app import chatcontext
+    return chatcontext
+
+@pytest.fixture
+def budget(chatcontext, monkeypatch):
+    """Small history budget, so a few turns overflow it"""
+    monkeypatch.setattr(chatcontext, "CHAT_HISTORY_TOKENS", BUDGET)
+
+def converse(client, well_id: int, turns: int, stream: bool = False):
+    for i in range(turns):
+        payload = {"well_id": well_id, "message": QUESTION.format(8700 + 10 * i, 8710 + 10 * i)}
+        response = client.post("/chat/stream" if stream else "/chat", json=payload)
+        assert response.status_code == 200
+
+def is_summary_request(request: dict) -> bool:
+    return request["messages"][0]["content"].startswith("You keep a running summary")
+
+def chat_requests(llm: FakeLLM) -> list:
+    return [r["messages"] for r in llm.requests if not is_summary_request(r)]
+
+def history_tokens(chatcontext, messages: list) -> int:
+    """Verbatim turns of a chat prompt (between the system messages and the new question)"""
+    turns = [m for m in messages[:-1] if m["role"] != "system"]
+    return sum(chatcontext.estimate_tokens(m["content"]) + chatcontext.MESSAGE_OVERHEAD for m in turns)
+
+def summary_row(well_id: int):
+    from app.database import SessionLocal
+    from app.models import ChatSummary
+    with SessionLocal() as db:
+        return db.get(ChatSummary, well_id)
+
+def test_prompt_size_stays_bounded(client, well_id, chatcontext, budget):
+    with FakeLLM(reply=REPLY) as llm:
+        converse(client, well_id, 20)
+    prompts = chat_requests(llm)
+    assert len(prompts) == 20
+    assert all(history_tokens(chatcontext, p) <= BUDGET for p in prompts)
+    # Late turns cost about what early ones did, instead of growing with the conversation
+    sizes = [sum(len(m["content"]) for m in p) for p in prompts]
+    assert max(sizes[10:]) < 1.3 * max(sizes[:5])
+    # ... and still carry the earlier conversation, as a summary
+    assert any(m["content"].startswith("Summary of the earlier conversation") for m in prompts[-1])
+
+def test_older_turns_folded_into_summary(client, well_id, budget):
+    with FakeLLM(reply=REPLY) as llm:
+        converse(client, well_id, 12)
+    summarizer = [r["messages"] for r in llm.requests if is_summary_request(r)]
+    # Runs every few turns, not every turn, and the first fold starts at the first question
+    assert 1 <= len(summarizer) < 6
+    assert "8700 and 8710" in summarizer[0][1]["content"]
+    row = summary_row(well_id)
+    assert row is not None and row.summary == REPLY and row.through_id > 0
+    # Summarized turns leave the prompt but stay in the visible history
+    assert "8700 and 8710" not in str(chat_requests(llm)[-1])
+    assert len(client.get(f"/chat/wells/{well_id}/chat/history").json()["messages"]) == 24
+
+def test_streamed_chat_uses_the_same_context(client, well_id, chatcontext, budget):
+    with FakeLLM(reply=REPLY) as llm:
+        converse(client, well_id, 12, stream=True)
+    assert all(history_tokens(chatcontext, p) <= BUDGET for p in chat_requests(llm))
+    assert summary_row(well_id) is not None
+
+def test_short_chat_is_sent_verbatim(client, well_id):
+    with FakeLLM(reply=REPLY) as llm:
+        converse(client, well_id, 3)
+    last = chat_requests(llm)[-1]
+    assert not any(is_summary_request(r) for r in llm.requests)
+    assert [m["role"] for m in last] == ["system", "user", "assistant", "user", "assistant", "user"]
+    assert summary_row(well_id) is None
+
+def test_clear_history_drops_summary(client, well_id, budget):
+    with FakeLLM(reply=REPLY) as llm:
+        converse(client, well_id, 12)
+    assert summary_row(well_id) is not None
+    client.delete(f"/chat/wells/{well_id}/chat/history")
+    assert summary_row(well_id) is None
+
+def test_system_prompt_rendered_once_per_well(client, well_id):
+    before = client.get("/check/chat-context").json()
+    with FakeLLM(reply=REPLY) as llm:
+        converse(client, well_id, 4)
+    after = client.get("/check/chat-context").json()
+    assert after["prompt_misses"] - before["prompt_misses"] == 1
+    assert after["prompt_hits"] - before["prompt_hits"] == 3
+    assert len({p[0]["content"] for p in chat_requests(llm)}) == 1
+    assert "TOTAL_GAS" in chat_requests(llm)[0][0]["content"]
+
+def test_long_backlog_folded_oldest_first(client, well_id, chatcontext, budget, monkeypatch):
+    # History from before summaries existed: more unsummarized messages than one read returns
+    monkeypatch.setattr(chatcontext, "HISTORY_SCAN", 20)
+    from app.database import SessionLocal
+    from app.models import ChatMessage
+    with SessionLocal() as db:
+        db.add_all([ChatMessage(well_id=well_id, role="user" if i % 2 == 0 else "assistant",
+                                content=f"backlog-{i:03d} " + "x" * 120) for i in range(60)])
+        db.commit()
+    with FakeLLM(reply=REPLY) as llm:
+        converse(client, well_id, 10)
+    folded = [int(part[:3]) for r in llm.requests if is_summary_request(r)
+              for part in r["messages"][1]["content"].split("backlog-")[1:]]
+    # Every old message reaches the summary, in order, none skipped
+    assert folded == list(range(60))
+
+def test_pack_keeps_newest_whole_turns(chatcontext):
+    history = [SimpleNamespace(role="user" if i % 2 == 0 else "assistant", content="x" * 400) for i in range(10)]
+    kept = chatcontext.pack(history, 350)  # room for three messages of ~105 tokens
+    assert kept == history[-2:]  # the third would open on an assistant reply
+    assert chatcontext.pack(history, 10) == []
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,96 @@
+"""Local file cache (LRU over uploads/, lazy S3 fetch) against moto (pip install moto)"""
+import os
+import sys
+import time
+import threading
+from pathlib import Path
+
+import pytest
+import test_s3_upload as s3  # upload helpers
+
+MB = 1024 * 1024
+
+def evict_local(path: str):
+    Path(path).unlink()
+
+def stored_ref(result: dict, filename: str) -> tuple:
+    from app.storage import file_ref
+    return file_ref(result["content_hash"], filename, result["s3_key"])
+
+def test_miss_fetches_from_s3(s3_service):
+    service = s3_service
+    content = os.urandom(MB)
+    result = s3.stream(service, content)
+    name, key = stored_ref(result, "a.las")
+    evict_local(result["local_path"])
+
+    with service.cache.open(name, key) as f:
+        assert f.read() == content
+    with service.cache.open(name, key) as f:
+        assert f.read() == content
+    stats = service.cache.metrics()
+    assert (stats["misses"], stats["fetches"], stats["hits"]) == (1, 1, 1)
+
+def test_concurrent_misses_coalesced(s3_service):
+    service = s3_service
+    result = s3.stream(service, os.urandom(MB))
+    name, key = stored_ref(result, "a.las")
+    evict_local(result["local_path"])
+
+    download_file = service.s3_client.download_file
+    def slow_download(*args, **kwargs):
+        time.sleep(0.3)
+        return download_file(*args, **kwargs)
+    service.s3_client.download_file = slow_download
+
+    paths = []
+    threads = [threading.Thread(target=lambda: paths.append(service.cache.get(name, key))) for _ in range(8)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    stats = service.cache.metrics()
+    assert all(p is not None and p.exists() for p in paths)
+    assert stats["fetches"] == 1 and stats["coalesced"] == 7
+
+def test_lru_eviction(s3_service):
+    service = s3_service
+    service.cache.max_bytes = 13 * MB
+    results = []
+    for _ in range(3):
+        results.append(s3.stream(service, os.urandom(6 * MB)))
+        time.sleep(0.01)  # distinct mtimes
+    assert not Path(results[0]["local_path"]).exists()  # least recently used
+    assert Path(results[1]["local_path"]).exists() and Path(results[2]["local_path"]).exists()
+    assert service.cache.metrics()["evictions"] == 1
+
+    # A read makes a file recent: the next eviction takes the other one
+    service.cache.get(*stored_ref(results[1], "b.las"))
+    s3.stream(service, os.urandom(6 * MB))
+    assert Path(results[1]["local_path"]).exists() and not Path(results[2]["local_path"]).exists()
+
+    # Evicted files come back from S3
+    assert service.cache.get(*stored_ref(results[0], "a.las")) is not None
+
+def test_files_missing_from_s3_are_kept(s3_service):
+    service = s3_service
+    service.cache.max_bytes = 1 * MB
+    s3.fail_parts(service, 10 ** 6)
+    result = s3.stream(service, os.urandom(6 * MB))
+    assert not result["s3_stored"]
+    service.cache.trim()
+    assert Path(result["local_path"]).exists()
+
+def test_memory_map(s3_service):
+    service = s3_service
+    content = b"~Version\n" * 100
+    result = s3.stream(service, content)
+    mapped = service.cache.map(*stored_ref(result, "a.las"))
+    assert mapped[:] == content
+    mapped.close()
+
+def test_legacy_file_ref():
+    from app.storage import file_ref
+    assert file_ref(None, "old.las", "s3://bucket/old.las") == ("old.las", "old.las")
+    assert file_ref(None, "old.las", None) == ("old.las", None)
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
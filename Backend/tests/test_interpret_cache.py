@@ -0,0 +1,61 @@
+"""Interpretation cache: repeated /interpret requests reuse the stored model output"""
+import sys
+import time
+import pytest
+from fake_llm import FakeLLM
+
+REPLY = "Dry gas zone; TOTAL_GAS peaks near 8700 ft."
+
+REQUEST = {"depth_from": 8665, "depth_to": 9000, "curves": ["TOTAL_GAS", "HC1"]}
+
+def interpret(client, well_id: int, **extra) -> dict:
+    return client.post("/interpret", json={"well_id": well_id, **REQUEST, **extra}).json()
+
+def history(client, well_id: int) -> list:
+    return client.get(f"/interpret/wells/{well_id}/interpretations").json()["interpretations"]
+
+def test_repeat_is_served_from_cache(client, well_id):
+    with FakeLLM(reply=REPLY, delay=0.3) as llm:
+        first = interpret(client, well_id)
+        started = time.perf_counter()
+        second = interpret(client, well_id)
+        elapsed = time.perf_counter() - started
+    assert first["cached"] is False and second["cached"] is True
+    assert second["interpretation"] == REPLY and second["id"] == first["id"]
+    assert len(llm.requests) == 1 and elapsed < 0.3
+    assert len(history(client, well_id)) == 1
+
+def test_refresh_runs_the_model_again(client, well_id):
+    with FakeLLM(reply=REPLY) as llm:
+        first = interpret(client, well_id)
+        llm.reply = "Revised: wet gas."
+        refreshed = interpret(client, well_id, refresh=True)
+    assert refreshed["cached"] is False and refreshed["interpretation"] == "Revised: wet gas."
+    assert len(llm.requests) == 2
+    # The well's row for this fingerprint was replaced, not duplicated
+    assert [i["id"] for i in history(client, well_id)] == [first["id"]]
+    assert interpret(client, well_id)["interpretation"] == "Revised: wet gas."
+
+def test_different_interval_misses(client, well_id):
+    with FakeLLM(reply=REPLY) as llm:
+        interpret(client, well_id)
+        other = interpret(client, well_id, depth_to=9100)
+    assert other["cached"] is False and len(llm.requests) == 2
+
+def test_fallback_text_is_not_cached(client, well_id):
+    with FakeLLM(fail_status=400):
+        fallback = interpret(client, well_id)
+    assert "rules-based summary" in fallback["interpretation"]
+    with FakeLLM(reply=REPLY) as llm:
+        answer = interpret(client, well_id)
+    assert answer["cached"] is False and answer["interpretation"] == REPLY and len(llm.requests) == 1
+
+def test_stream_serves_cached_text(client, well_id):
+    with FakeLLM(reply=REPLY) as llm:
+        interpret(client, well_id)
+        body = client.post("/interpret/stream", json={"well_id": well_id, **REQUEST}).text
+    assert len(llm.requests) == 1
+    assert '"cached": true' in body and "event: done" in body
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,133 @@
+"""LLM gateway (app/llm.py) against a local fake LLM server (tests/fake_llm.py):
+client reuse, concurrency limit, deadlines, retries and the circuit breaker
+"""
+import sys
+import time
+import asyncio
+
+import pytest
+from fake_llm import FakeLLM
+
+MESSAGES = [{"role": "user", "content": "Interpret the gas peak."}]
+SETTINGS = {"LLM_MAX_CONCURRENCY": 8, "LLM_QUEUE_TIMEOUT": 10.0, "LLM_TIMEOUT": 5.0, "LLM_MAX_ATTEMPTS": 3,
+            "LLM_RETRY_BASE": 0.0}
+
+def configure(monkeypatch, llm, failures: int = 3, reset: float = 0.3, **settings):
+    """Gateway settings and a fresh circuit breaker (failures, reset) for one test"""
+    for name, value in settings.items():
+        monkeypatch.setattr(llm, name, value)
+    monkeypatch.setattr(llm, "breaker", llm.CircuitBreaker(failures, reset))
+
+@pytest.fixture
+def llm(monkeypatch):
+    """app.llm with fast retries, a fresh breaker and zeroed counters; restored after the test"""
+    from app import llm
+    configure(monkeypatch, llm, **SETTINGS)
+    monkeypatch.setattr(llm, "_stats", dict.fromkeys(llm._stats, 0))
+    return llm
+
+def complete(llm):
+    return llm.complete(MESSAGES, 100, 0.0)
+
+def test_client_reused_across_calls(llm):
+    async def run():
+        first = await complete(llm)
+        client = llm._loop_state()[0]
+        second = await complete(llm)
+        return first, second, client is llm._loop_state()[0]
+    with FakeLLM(reply="Dry gas.") as fake:
+        first, second, same = asyncio.run(run())
+    assert first == second == "Dry gas." and same and len(fake.requests) == 2
+
+def test_concurrency_is_bounded(llm, monkeypatch):
+    configure(monkeypatch, llm, LLM_MAX_CONCURRENCY=3)
+    async def run():
+        return await asyncio.gather(*[complete(llm) for _ in range(9)])
+    with FakeLLM(delay=0.2) as fake:
+        replies = asyncio.run(run())
+    assert len(replies) == 9 and fake.max_active == 3
+
+def test_busy_gateway_refuses_after_queue_timeout(llm, monkeypatch):
+    configure(monkeypatch, llm, LLM_MAX_CONCURRENCY=1, LLM_QUEUE_TIMEOUT=0.1)
+    async def run():
+        return await asyncio.gather(complete(llm), complete(llm), return_exceptions=True)
+    with FakeLLM(delay=0.5):
+        results = asyncio.run(run())
+    assert sum(isinstance(r, llm.LLMUnavailable) for r in results) == 1
+    assert llm.metrics()["rejected_busy"] == 1
+
+def test_transient_failures_retried(llm):
+    with FakeLLM(reply="Wet gas.", fail_times=2) as fake:
+        assert asyncio.run(complete(llm)) == "Wet gas."
+    assert len(fake.requests) == 3 and llm.metrics()["retries"] == 2
+    assert llm.breaker.state == "closed"
+
+def test_bad_request_not_retried(llm):
+    with FakeLLM(fail_status=400) as fake:
+        try:
+            asyncio.run(complete(llm))
+            assert False, "expected the API error"
+        except Exception as e:
+            assert not isinstance(e, llm.LLMUnavailable)
+    assert len(fake.requests) == 1 and llm.breaker.state == "closed"
+
+def test_deadline(llm, monkeypatch):
+    configure(monkeypatch, llm, LLM_TIMEOUT=0.2, LLM_MAX_ATTEMPTS=1)
+    started = time.perf_counter()
+    with FakeLLM(delay=2.0):
+        try:
+            asyncio.run(complete(llm))
+            assert False, "expected a timeout"
+        except asyncio.TimeoutError:
+            pass
+    assert time.perf_counter() - started < 1.5 and llm.metrics()["timeouts"] == 1
+
+def test_stream_deadline_is_to_first_token(llm, monkeypatch):
+    configure(monkeypatch, llm, LLM_TIMEOUT=0.3, LLM_MAX_ATTEMPTS=1)
+    async def collect():
+        return "".join([text async for text in llm.stream_completion(MESSAGES, 100, 0.0)])
+    with FakeLLM(reply="one two three four five six", delay=0.1):
+        assert asyncio.run(collect()) == "one two three four five six"  # 0.6s in total, 0.1s to the first token
+    with FakeLLM(delay=1.0):
+        try:
+            asyncio.run(collect())
+            assert False, "expected a timeout"
+        except asyncio.TimeoutError:
+            pass
+
+def test_breaker_opens_and_recovers(llm, monkeypatch):
+    configure(monkeypatch, llm, LLM_MAX_ATTEMPTS=1, failures=3, reset=0.3)
+    with FakeLLM(fail_status=503) as fake:
+        for _ in range(3):
+            try:
+                asyncio.run(complete(llm))
+            except Exception as e:
+                assert not isinstance(e, llm.LLMUnavailable)
+        assert llm.breaker.state == "open"
+        started = time.perf_counter()
+        try:
+            asyncio.run(complete(llm))
+            assert False, "expected the breaker to refuse"
+        except llm.LLMUnavailable:
+            pass
+        assert len(fake.requests) == 3 and time.perf_counter() - started < 0.1
+
+    time.sleep(0.35)
+    assert llm.breaker.state == "half-open"
+    with FakeLLM(reply="Back.") as fake:
+        assert asyncio.run(complete(llm)) == "Back."
+    assert llm.breaker.state == "closed"
+
+def test_interpret_falls_back_at_once_when_breaker_open(llm, monkeypatch, well_id, client):
+    configure(monkeypatch, llm, LLM_MAX_ATTEMPTS=1, failures=1, reset=60)
+    request = {"well_id": well_id, "depth_from": 8665, "depth_to": 9000, "curves": ["TOTAL_GAS"]}
+    with FakeLLM(fail_status=503) as fake:
+        client.post("/interpret", json=request)  # opens the breaker
+        started = time.perf_counter()
+        result = client.post("/interpret", json={**request, "depth_to": 8900}).json()
+    assert "rules-based summary" in result["interpretation"] and len(fake.requests) == 1
+    assert time.perf_counter() - started < 0.5
+    assert client.get("/check/llm").json()["breaker"] == "open"
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
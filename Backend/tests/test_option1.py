@@ -1,6 +1,7 @@
 import requests
 import sys
 import os
+import time
 
 def test_upload(filename):
     url = "http://localhost:8000/wells/upload"
@@ -16,9 +17,19 @@ def test_upload(filename):
         try:
             response = requests.post(url, files=files)
             print(f"Status Code: {response.status_code}")
-            if response.status_code == 200:
-                data = response.json()
-                print(f"✅ Success! Created Well: {data.get('well_name')}")
+            if response.status_code == 202:
+                # Ingest runs in the background; poll the job until it finishes
+                job = response.json()
+                while not job["finished"]:
+                    time.sleep(0.5)
+                    job = requests.get(f"http://localhost:8000/wells/jobs/{job['job_id']}").json()
+                if job["stage"] == "done":
+                    data = job["result"]
+                    print(f"✅ Success! Created Well: {data.get('well_name')}")
+                    if data["ingest"].get("deduplicated_from"):
+                        print(f"   Same content as well {data['ingest']['deduplicated_from']}, data shared")
+                else:
+                    print(f"❌ Failed! {job['error']}")
             else:
                 print(f"❌ Failed! {response.text}")
         except Exception as e:
@@ -0,0 +1,115 @@
+"""S3 upload path of StorageService against moto (pip install moto); no AWS account needed"""
+import os
+import sys
+import hashlib
+from pathlib import Path
+
+import pytest
+from botocore.exceptions import ClientError
+
+def stream(service, content: bytes, chunk_size: int = 1024 * 1024) -> dict:
+    """Write content the way ingest does: in chunks through an UploadWriter"""
+    writer = service.open_writer("test.las")
+    for start in range(0, len(content), chunk_size):
+        writer.write(content[start:start + chunk_size])
+    return writer.close()
+
+def stored_keys(service) -> list:
+    return [o["Key"] for o in service.s3_client.list_objects_v2(Bucket=service.bucket_name).get("Contents", [])]
+
+def open_uploads(service) -> list:
+    return service.s3_client.list_multipart_uploads(Bucket=service.bucket_name).get("Uploads", [])
+
+def fail_parts(service, failures: int):
+    """Make the first `failures` UploadPart calls fail with a 503"""
+    upload_part = service.s3_client.upload_part
+    calls = {"n": 0}
+
+    def flaky(**kwargs):
+        calls["n"] += 1
+        if calls["n"] <= failures:
+            raise ClientError({"Error": {"Code": "ServiceUnavailable"}, "ResponseMetadata": {"HTTPStatusCode": 503}},
+                              "UploadPart")
+        return upload_part(**kwargs)
+    service.s3_client.upload_part = flaky
+    return calls
+
+def test_small_file_single_put(s3_service):
+    service = s3_service
+    content = b"~Version\n" * 1000
+    result = stream(service, content)
+    key = f"las-files/{hashlib.sha256(content).hexdigest()}.las"
+    assert result["s3_stored"] and result["s3_key"] == f"s3://{service.bucket_name}/{key}"
+    assert service.s3_client.get_object(Bucket=service.bucket_name, Key=key)["Body"].read() == content
+    assert Path(result["local_path"]).read_bytes() == content
+
+def test_large_file_multipart(s3_service):
+    service = s3_service
+    content = os.urandom(12 * 1024 * 1024)  # 3 parts
+    result = stream(service, content)
+    key = f"las-files/{result['content_hash']}.las"
+    obj = service.s3_client.get_object(Bucket=service.bucket_name, Key=key)
+    assert obj["Body"].read() == content
+    assert stored_keys(service) == [key], "temporary key left behind"
+    assert open_uploads(service) == []
+    assert Path(result["local_path"]).read_bytes() == content
+
+def test_store_file_splits_into_parts(s3_service):
+    service = s3_service
+    calls = fail_parts(service, 0)
+    content = os.urandom(11 * 1024 * 1024)
+    result = service.store_file("test.las", content)
+    assert result["s3_stored"]
+    assert calls["n"] == 3
+
+def test_existing_object_not_uploaded_again(s3_service):
+    service = s3_service
+    content = os.urandom(6 * 1024 * 1024)
+    stream(service, content)
+    calls = fail_parts(service, 0)
+    result = stream(service, content)
+    assert result["s3_stored"]
+    assert len(stored_keys(service)) == 1
+    assert open_uploads(service) == []
+    assert calls["n"] == 1  # the streamed first part, aborted once the hash matched
+
+def test_known_hash_skips_parts(s3_service):
+    service = s3_service
+    content = os.urandom(11 * 1024 * 1024)
+    stream(service, content)
+    calls = fail_parts(service, 0)
+    result = service.store_file("test.las", content, hashlib.sha256(content).hexdigest())
+    assert result["s3_stored"]
+    assert calls["n"] == 0
+    assert open_uploads(service) == []
+
+def test_wrong_known_hash_still_uploads(s3_service):
+    service = s3_service
+    stored = os.urandom(6 * 1024 * 1024)
+    stream(service, stored)
+    content = os.urandom(6 * 1024 * 1024)
+    result = service.store_file("test.las", content, hashlib.sha256(stored).hexdigest())
+    assert result["s3_stored"] and result["content_hash"] == hashlib.sha256(content).hexdigest()
+    assert service.s3_client.get_object(Bucket=service.bucket_name, Key=f"las-files/{result['content_hash']}.las")["Body"].read() == content
+
+def test_transient_part_failure_retried(s3_service):
+    service = s3_service
+    calls = fail_parts(service, 2)
+    content = os.urandom(12 * 1024 * 1024)
+    result = stream(service, content)
+    assert result["s3_stored"]
+    assert calls["n"] == 3 + 2
+    assert service.s3_client.get_object(Bucket=service.bucket_name, Key=f"las-files/{result['content_hash']}.las")["Body"].read() == content
+
+def test_persistent_failure_keeps_local_copy(s3_service):
+    service = s3_service
+    fail_parts(service, 10 ** 6)
+    content = os.urandom(12 * 1024 * 1024)
+    result = stream(service, content)
+    assert not result["s3_stored"] and result["s3_key"] is None
+    assert Path(result["local_path"]).read_bytes() == content
+    assert open_uploads(service) == [], "multipart upload not aborted"
+    assert stored_keys(service) == []
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
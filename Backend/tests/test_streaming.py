@@ -0,0 +1,107 @@
+"""Streaming /interpret/stream and /chat/stream against a local fake LLM server (tests/fake_llm.py)"""
+import sys
+import json
+import time
+import socket
+import threading
+
+import httpx
+import pytest
+import uvicorn
+from fake_llm import FakeLLM
+
+def serve(app) -> str:
+    """Run the app on a real local server (TestClient buffers whole responses, so it can't show streaming)"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+@pytest.fixture(scope="module")
+def client(app):
+    """HTTP client of the app served by uvicorn (shadows the TestClient fixture)"""
+    with httpx.Client(base_url=serve(app), timeout=30) as http:
+        yield http
+
+REPLY = "Wet gas signature with a TOTAL_GAS peak near 8700 ft."
+
+def read_events(client, path: str, payload: dict) -> list:
+    """(event, data, seconds since the request) for every server-sent event"""
+    started = time.perf_counter()
+    events, event = [], None
+    with client.stream("POST", path, json=payload) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((event, json.loads(line[len("data: "):]), time.perf_counter() - started))
+    return events
+
+def interpret_request(well_id: int) -> dict:
+    return {"well_id": well_id, "depth_from": 8665, "depth_to": 9000, "curves": ["TOTAL_GAS", "HC1"]}
+
+def test_interpret_streams_tokens_and_saves(client, well_id):
+    with FakeLLM(reply=REPLY, delay=0.05) as llm:
+        events = read_events(client, "/interpret/stream", interpret_request(well_id))
+    kinds = [e for e, _, _ in events]
+    assert kinds[0] == "start" and kinds[-1] == "done"
+    deltas = [d for e, d, _ in events if e == "delta"]
+    assert len(deltas) == len(llm.chunks()) and "".join(d["text"] for d in deltas) == REPLY
+    # Tokens arrive as they are produced, not all at the end
+    first, last = events[1][2], events[-2][2]
+    assert last - first > 0.05 * (len(deltas) - 2)
+    assert llm.requests[0]["stream"] is True
+
+    done = events[-1][1]
+    assert done["interpretation"] == REPLY and done["stats"] == events[0][1]["stats"]
+    past = client.get(f"/interpret/wells/{well_id}/interpretations").json()["interpretations"]
+    assert past[0]["id"] == done["id"] and past[0]["interpretation"] == REPLY
+
+def test_interpret_falls_back_when_model_fails(client, well_id):
+    with FakeLLM(fail_status=400):
+        events = read_events(client, "/interpret/stream", interpret_request(well_id))
+    assert events[-1][0] == "done"
+    assert "rules-based summary" in events[-1][1]["interpretation"]
+
+def test_interpret_empty_range(client, well_id):
+    events = read_events(client, "/interpret/stream", {**interpret_request(well_id), "depth_from": 1, "depth_to": 2})
+    assert [e for e, _, _ in events] == ["error"]
+
+def test_chat_streams_and_saves_reply(client, well_id):
+    with FakeLLM(reply=REPLY) as llm:
+        events = read_events(client, "/chat/stream", {"well_id": well_id, "message": "Any gas shows?"})
+    assert events[-1] == ("done", {"role": "assistant", "reply": REPLY}, events[-1][2])
+    assert llm.requests[0]["messages"][-1] == {"role": "user", "content": "Any gas shows?"}
+    history = client.get(f"/chat/wells/{well_id}/chat/history").json()["messages"]
+    assert history[-2:] == [{"role": "user", "content": "Any gas shows?"}, {"role": "assistant", "content": REPLY}]
+
+def test_chat_keeps_partial_reply_when_stream_breaks(client, well_id):
+    with FakeLLM(reply=REPLY, fail_after=3) as llm:
+        events = read_events(client, "/chat/stream", {"well_id": well_id, "message": "Peak depth?"})
+        partial = "".join(llm.chunks()[:3])
+    assert "error" in [e for e, _, _ in events]
+    assert events[-1][1]["reply"] == partial
+    history = client.get(f"/chat/wells/{well_id}/chat/history").json()["messages"]
+    assert history[-1] == {"role": "assistant", "content": partial}
+
+def test_chat_saves_reply_when_client_disconnects(client, well_id):
+    with FakeLLM(reply=REPLY, delay=0.1) as llm:
+        with client.stream("POST", "/chat/stream", json={"well_id": well_id, "message": "Quick one"}) as response:
+            for line in response.iter_lines():
+                if line.startswith("event: delta"):
+                    break  # leave after the first token
+        time.sleep(0.1 * len(llm.chunks()))
+    history = client.get(f"/chat/wells/{well_id}/chat/history").json()["messages"]
+    assert history[-1]["role"] == "assistant" and REPLY.startswith(history[-1]["content"])
+    assert 0 < len(history[-1]["content"]) < len(REPLY)
+
+def test_chat_requires_message(client):
+    assert client.post("/chat/stream", json={"well_id": 1}).status_code == 400
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -1,18 +1,105 @@
 from app.database import engine
-from sqlalchemy import text
+from sqlalchemy import inspect, text
+
+# Indexes declared on the models; create_all() only adds them to new tables
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_well_data_well_depth ON well_data (well_id, depth);",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_curve_chunks_well_curve_chunk ON curve_chunks (well_id, curve_name, chunk_index);",
+    "CREATE INDEX IF NOT EXISTS ix_well_curves_well_id ON well_curves (well_id);",
+    "CREATE INDEX IF NOT EXISTS ix_wells_company ON wells (company);",
+    "CREATE INDEX IF NOT EXISTS ix_wells_field ON wells (field);",
+    "CREATE INDEX IF NOT EXISTS ix_wells_country ON wells (country);",
+    "CREATE INDEX IF NOT EXISTS ix_wells_content_hash ON wells (content_hash);",
+    "CREATE INDEX IF NOT EXISTS ix_wells_data_well_id ON wells (data_well_id);",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_wells_well_name ON wells (well_name);",
+    "CREATE INDEX IF NOT EXISTS ix_interpretations_prompt_hash ON interpretations (prompt_hash);",
+    "CREATE INDEX IF NOT EXISTS ix_chat_messages_well_created ON chat_messages (well_id, created_at);",
+]
+
+# Postgres-only table settings applied to new tables by the models' DDL hooks
+POSTGRES_SETTINGS = [
+    "ALTER TABLE curve_chunks ALTER COLUMN data SET STORAGE EXTERNAL;",
+    "ALTER TABLE curve_pyramid ALTER COLUMN data SET STORAGE EXTERNAL;",
+]
+
+# Columns added after the tables were first created
+COLUMNS = [
+    ("wells", "s3_key", "VARCHAR"),
+    ("wells", "content_hash", "VARCHAR"),
+    ("wells", "data_well_id", "INTEGER REFERENCES wells (id)"),
+    ("interpretations", "prompt_hash", "VARCHAR"),
+    ("curve_tile_stats", "mean", "FLOAT"),
+    ("curve_tile_stats", "m2", "FLOAT"),
+]
+
+# Tile stats stored before mean/M2 replaced total/total_sq (the old columns stay, unused)
+BACKFILL = [
+    "UPDATE curve_tile_stats SET mean = CASE WHEN count > 0 THEN total / count ELSE 0 END, "
+    "m2 = CASE WHEN count > 0 AND total_sq > total * total / count THEN total_sq - total * total / count ELSE 0 END "
+    "WHERE mean IS NULL;",
+]
 
 def update_db():
     with engine.connect() as conn:
-        print("Checking for s3_key column...")
-        try:
-            conn.execute(text("ALTER TABLE wells ADD COLUMN s3_key VARCHAR;"))
-            conn.commit()
-            print("Successfully added s3_key column to wells table.")
-        except Exception as e:
-            if "already exists" in str(e).lower():
-                print("Column s3_key already exists.")
-            else:
+        for table, name, ddl in COLUMNS:
+            print(f"Checking for {name} column...")
+            try:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl};"))
+                conn.commit()
+                print(f"Successfully added {name} column to {table} table.")
+            except Exception as e:
+                conn.rollback()
+                if "already exists" in str(e).lower() or "duplicate column" in str(e).lower():
+                    print(f"Column {name} already exists.")
+                else:
+                    print(f"Error: {e}")
+
+def backfill_columns():
+    if "total" not in {c["name"] for c in inspect(engine).get_columns("curve_tile_stats")}:
+        return  # created with mean/M2 already
+    with engine.connect() as conn:
+        for statement in BACKFILL:
+            try:
+                result = conn.execute(text(statement))
+                conn.commit()
+                print(f"OK: {statement} ({result.rowcount} rows)")
+            except Exception as e:
+                conn.rollback()
+                print(f"Error: {e}")
+
+def rename_duplicate_names():
+    """Older uploads could race to the same display name; the unique index needs them distinct"""
+    with engine.connect() as conn:
+        duplicates = conn.execute(text(
+            "SELECT id, well_name FROM wells w WHERE EXISTS "
+            "(SELECT 1 FROM wells o WHERE o.well_name = w.well_name AND o.id < w.id)"
+        )).all()
+        taken = set(conn.execute(text("SELECT well_name FROM wells")).scalars())
+        for well_id, name in duplicates:
+            # Skip names already in use, or building the unique index fails
+            new_name, n = f"{name} (Well {well_id})", 1
+            while new_name in taken:
+                n += 1
+                new_name = f"{name} (Well {well_id}, {n})"
+            taken.add(new_name)
+            conn.execute(text("UPDATE wells SET well_name = :name WHERE id = :id"), {"name": new_name, "id": well_id})
+            print(f"Renamed well {well_id}: {name!r} -> {new_name!r}")
+        conn.commit()
+
+def update_indexes():
+    statements = INDEXES + (POSTGRES_SETTINGS if engine.dialect.name == "postgresql" else [])
+    with engine.connect() as conn:
+        for statement in statements:
+            try:
+                conn.execute(text(statement))
+                conn.commit()
+                print(f"OK: {statement}")
+            except Exception as e:
+                conn.rollback()
                 print(f"Error: {e}")
 
 if __name__ == "__main__":
     update_db()
+    backfill_columns()
+    rename_duplicate_names()
+    update_indexes()
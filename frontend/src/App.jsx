@@ -19,9 +19,18 @@ export default function App() {
 
   const fetchWells = async () => {
     try {
-      const res = await fetch(`${API_BASE}/wells`);
-      const data = await res.json();
-      setWells(data.wells || []);
+      // The listing is paginated; follow next_cursor until the last page
+      const all = [];
+      let cursor = null;
+      do {
+        const params = new URLSearchParams({ limit: 1000 });
+        if (cursor !== null) params.set("after", cursor);
+        const res = await fetch(`${API_BASE}/wells?${params}`);
+        const data = await res.json();
+        all.push(...(data.wells || []));
+        cursor = data.next_cursor ?? null;
+      } while (cursor !== null);
+      setWells(all);
     } catch (error) {
       console.error("Failed to fetch wells:", error);
     }
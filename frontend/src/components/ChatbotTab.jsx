@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useRef } from "react";
 import { API_BASE } from "../App";
+import { readEventStream } from "../sse";
 import "./ChatbotTab.css";
 
 const STARTER_QUESTIONS = [
@@ -44,9 +45,17 @@ export default function ChatbotTab({ well }) {
     setError(null);
     setMessages((prev) => [...prev, { role: "user", content: msg }]);
     setLoading(true);
+    // Once the reply has started, a failure keeps what arrived and marks it
+    let started = false;
+    const failReply = (detail) =>
+      setMessages((prev) => [
+        ...prev.slice(0, -1),
+        { ...prev[prev.length - 1], error: detail },
+      ]);
 
     try {
-      const res = await fetch(`${API_BASE}/chat`, {
+      // Streamed: the reply grows token by token (saved once it ends)
+      const res = await fetch(`${API_BASE}/chat/stream`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ well_id: well.id, message: msg }),
@@ -54,14 +63,29 @@ export default function ChatbotTab({ well }) {
 
       if (!res.ok) throw new Error("Chat request failed");
 
-      const data = await res.json();
-      setMessages((prev) => [
-        ...prev,
-        { role: "assistant", content: data.reply },
-      ]);
+      const updateReply = (update) =>
+        setMessages((prev) => [
+          ...prev.slice(0, -1),
+          { role: "assistant", content: update(prev[prev.length - 1].content) },
+        ]);
+      await readEventStream(res, (event, data) => {
+        if (event === "start") {
+          started = true;
+          setMessages((prev) => [...prev, { role: "assistant", content: "" }]);
+        } else if (event === "delta") updateReply((text) => text + data.text);
+        else if (event === "done") updateReply(() => data.reply);
+        else if (event === "error") {
+          if (started) failReply(data.detail);
+          else setError(data.detail);
+        }
+      });
     } catch (e) {
-      setError(e.message);
-      setMessages((prev) => prev.slice(0, -1));
+      if (started) {
+        failReply(e.message);
+      } else {
+        setError(e.message);
+        setMessages((prev) => prev.slice(0, -1));
+      }
     } finally {
       setLoading(false);
     }
@@ -119,11 +143,16 @@ export default function ChatbotTab({ well }) {
         {messages.map((msg, i) => (
           <div key={i} className={`chat-msg ${msg.role}`}>
             <div className="chat-avatar">{msg.role === "user" ? "◇" : "◉"}</div>
-            <div className="chat-bubble">{msg.content}</div>
+            <div className="chat-bubble">
+              {msg.content}
+              {msg.error && (
+                <div className="chat-bubble-error">⚠ {msg.error}</div>
+              )}
+            </div>
           </div>
         ))}
 
-        {loading && (
+        {loading && messages[messages.length - 1]?.role === "user" && (
           <div className="chat-msg assistant">
             <div className="chat-avatar">◉</div>
             <div className="chat-bubble chat-loading">
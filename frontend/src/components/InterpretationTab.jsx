@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import { API_BASE } from "../App";
+import { readEventStream } from "../sse";
 import "./InterpretationTab.css";
 
 const DEFAULT_CURVES = ["HC1", "HC2", "HC3", "TOTAL_GAS"];
@@ -57,9 +58,10 @@ export default function InterpretationTab({ well }) {
       } catch (e) {}
     };
     fetchPast();
-  }, [well.id, result]);
+  }, [well.id, result?.id]);
 
-  const handleInterpret = async () => {
+  // refresh: run the model again instead of reusing the stored answer
+  const handleInterpret = async (refresh = false) => {
     if (!selectedCurves.length) {
       setError("Select at least one curve");
       return;
@@ -71,7 +73,8 @@ export default function InterpretationTab({ well }) {
     setViewingPast(null);
 
     try {
-      const res = await fetch(`${API_BASE}/interpret`, {
+      // Streamed: the text shows up as the model writes it (saved once it ends)
+      const res = await fetch(`${API_BASE}/interpret/stream`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -79,12 +82,22 @@ export default function InterpretationTab({ well }) {
           depth_from: depthFrom,
           depth_to: depthTo,
           curves: selectedCurves,
+          refresh,
         }),
       });
 
       if (!res.ok) throw new Error("Interpretation failed");
 
-      setResult(await res.json());
+      await readEventStream(res, (event, data) => {
+        if (event === "start") setResult({ ...data, interpretation: "" });
+        else if (event === "delta")
+          setResult((prev) => ({
+            ...prev,
+            interpretation: prev.interpretation + data.text,
+          }));
+        else if (event === "done") setResult(data);
+        else if (event === "error") setError(data.detail);
+      });
     } catch (e) {
       setError(e.message);
     } finally {
@@ -164,7 +177,7 @@ export default function InterpretationTab({ well }) {
 
             <button
               className="btn-primary w-full"
-              onClick={handleInterpret}
+              onClick={() => handleInterpret()}
               disabled={loading}
             >
               {loading ? "Analyzing..." : "✦ Interpret with AI"}
@@ -212,7 +225,7 @@ export default function InterpretationTab({ well }) {
 
       {/* Result Panel */}
       <div className="interp-result-area">
-        {loading && (
+        {loading && !result && (
           <div className="interp-result">
             <div className="thinking-indicator">
               <div className="thinking-dots">
@@ -225,7 +238,7 @@ export default function InterpretationTab({ well }) {
           </div>
         )}
 
-        {!loading && displayResult && (
+        {displayResult && (
           <div className="interp-result">
             <div className="interp-result-header">
               <div>
@@ -235,9 +248,22 @@ export default function InterpretationTab({ well }) {
                   {(displayResult.curves || []).join(", ")}
                 </div>
               </div>
-              <span className="interp-result-badge">
-                {displayResult.model || "AI"}
-              </span>
+              <div className="interp-result-actions">
+                {displayResult.cached && !viewingPast && (
+                  <button
+                    className="btn-secondary"
+                    onClick={() => handleInterpret(true)}
+                    disabled={loading}
+                    title="Stored answer for identical statistics; run the model again"
+                  >
+                    ↻ Regenerate
+                  </button>
+                )}
+                <span className="interp-result-badge">
+                  {displayResult.model || "AI"}
+                  {displayResult.cached ? " · cached" : ""}
+                </span>
+              </div>
             </div>
 
             {displayResult.stats &&
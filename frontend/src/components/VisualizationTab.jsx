@@ -26,6 +26,39 @@ const CURVE_COLORS = [
 
 const DEFAULT_CURVES = ["HC1", "HC2", "HC3", "TOTAL_GAS"];
 
+// Typed-array chart data (see wells.py, BINARY CHART FORMAT):
+// "WDAT" | uint32 header length | JSON header | 8-byte aligned arrays
+const BINARY_MEDIA_TYPE = "application/vnd.onegeo.well-data";
+
+function parseBinaryChartData(buffer) {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  if (magic !== "WDAT") throw new Error("Unexpected chart data format");
+  const headerLength = view.getUint32(4, true);
+  const header = JSON.parse(
+    new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)),
+  );
+  const start = Math.ceil((8 + headerLength) / 8) * 8;
+
+  const column = (entry) => {
+    if (!entry) return null;
+    const [offset, dtype] = entry;
+    if (dtype === "<f4") {
+      // float32 holds 7 significant digits; read 0.1 back as 0.1, not 0.100000001
+      const values = new Float32Array(buffer, start + offset, header.points);
+      return Array.from(values, (v) => (Number.isNaN(v) ? null : Number(v.toPrecision(7))));
+    }
+    const values = new Float64Array(buffer, start + offset, header.points);
+    return Array.from(values, (v) => (Number.isNaN(v) ? null : v));
+  };
+
+  const curves = {};
+  for (const [name, entry] of Object.entries(header.curves)) {
+    curves[name] = column(entry);
+  }
+  return { depths: column(header.depth), curves, stats: header.stats };
+}
+
 function CustomTooltip({ active, payload }) {
   if (!active || !payload?.length) return null;
   return (
@@ -60,7 +93,7 @@ export default function VisualizationTab({ well }) {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [curveSearch, setCurveSearch] = useState("");
-  const [downsample, setDownsample] = useState(2);
+  const [maxPoints, setMaxPoints] = useState(2000);
 
   const fetchData = useCallback(async () => {
     if (!selectedCurves.length) return;
@@ -73,13 +106,18 @@ export default function VisualizationTab({ well }) {
         curves: selectedCurves.join(","),
         depth_from: depthFrom,
         depth_to: depthTo,
-        downsample,
       });
-      const res = await fetch(`${API_BASE}/wells/${well.id}/data?${params}`);
+      // Server picks a min/max pyramid level so peaks survive decimation
+      if (maxPoints) params.set("max_points", maxPoints);
+      const res = await fetch(`${API_BASE}/wells/${well.id}/data?${params}`, {
+        headers: { Accept: `${BINARY_MEDIA_TYPE}, application/json` },
+      });
 
       if (!res.ok) throw new Error("Failed to fetch data");
 
-      const data = await res.json();
+      const data = res.headers.get("content-type")?.startsWith(BINARY_MEDIA_TYPE)
+        ? parseBinaryChartData(await res.arrayBuffer())
+        : await res.json();
 
       const flat = data.depths.map((d, i) => {
         const row = { depth: d };
@@ -96,7 +134,7 @@ export default function VisualizationTab({ well }) {
     } finally {
       setLoading(false);
     }
-  }, [well.id, selectedCurves, depthFrom, depthTo, downsample]);
+  }, [well.id, selectedCurves, depthFrom, depthTo, maxPoints]);
 
   useEffect(() => {
     fetchData();
@@ -151,15 +189,15 @@ export default function VisualizationTab({ well }) {
 
             <div className="input-wrap mt-8">
               <div className="input-mini-label">
-                Downsample (every Nth point)
+                Resolution (max points)
               </div>
               <select
-                value={downsample}
-                onChange={(e) => setDownsample(Number(e.target.value))}
+                value={maxPoints}
+                onChange={(e) => setMaxPoints(Number(e.target.value))}
               >
-                {[1, 2, 5, 10, 20].map((n) => (
+                {[500, 1000, 2000, 5000, 0].map((n) => (
                   <option key={n} value={n}>
-                    {n}x {n === 1 ? "(all data)" : ""}
+                    {n ? n.toLocaleString() : "All data"}
                   </option>
                 ))}
               </select>
@@ -5,6 +5,15 @@ import Header from "../components/Header";
 import Sidebar from "../components/Sidebar";
 import "./UploadPage.css";
 
+// Progress bar position and label per ingest job stage
+const STAGE_PROGRESS = {
+  queued: [20, "Queued..."],
+  parsing: [30, "Parsing LAS file..."],
+  loading: [50, "Loading data..."],
+  storing: [80, "Storing file..."],
+  summarizing: [90, "Building summary..."],
+};
+
 export default function UploadPage({
   onWellUploaded,
   wells,
@@ -39,23 +48,34 @@ export default function UploadPage({
     formData.append("file", file);
 
     try {
-      setProgress(30);
-      setProgressLabel("Parsing LAS file...");
-
       const res = await fetch(`${API_BASE}/wells/upload`, {
         method: "POST",
         body: formData,
       });
 
-      setProgress(70);
-      setProgressLabel("Storing data...");
-
       if (!res.ok) {
         const err = await res.json();
         throw new Error(err.detail || "Upload failed");
       }
 
-      const data = await res.json();
+      // The file is ingested in the background; poll the job until it finishes
+      let job = await res.json();
+      while (!job.finished) {
+        const [percent, label] = STAGE_PROGRESS[job.stage] || [30, "Processing..."];
+        setProgress(percent);
+        setProgressLabel(
+          job.rows ? `${label} ${job.rows.toLocaleString()} rows` : label,
+        );
+        await new Promise((resolve) => setTimeout(resolve, 500));
+        const poll = await fetch(`${API_BASE}/wells/jobs/${job.job_id}`);
+        job = await poll.json();
+      }
+
+      if (job.stage === "failed") {
+        throw new Error(job.error || "Upload failed");
+      }
+
+      const data = job.result;
       setProgress(100);
       setProgressLabel("Complete!");
       setResult(data);